@@ -1,19 +1,32 @@
 from sqlalchemy import inspect
-from .utils.io import engine
+from .utils.io import read_connection
 
 
 def bootstrap_if_needed():
     """Ensure synthetic data and model tables exist.
 
     Generates weekly data and trains elasticities if required.
-    Safe to call multiple times.
+    Safe to call multiple times and from many threads: the work runs through
+    the job manager, so concurrent callers wait on the same job instead of
+    starting their own.  Raises ``RuntimeError`` if a step fails or is
+    cancelled, so startup errors point at the real cause.
     """
-    insp = inspect(engine())
-    if not insp.has_table("price_weekly"):
+    from .jobs import jobs
+
+    with read_connection() as con:
+        has_data = inspect(con).has_table("price_weekly")
+    if not has_data:
         from .synth_data import gen_weekly_data
-        gen_weekly_data()
-        insp = inspect(engine())
-    if not (insp.has_table("elasticities") and insp.has_table("attributes_importance")):
+        _check(jobs.run("generate", gen_weekly_data, key="data"))
+    with read_connection() as con:
+        insp = inspect(con)
+        has_models = insp.has_table("elasticities") and insp.has_table("attributes_importance")
+    if not has_models:
         from .models.elasticities import fit_elasticities
-        fit_elasticities()
+        _check(jobs.run("train", fit_elasticities))
+
+
 
+def _check(job) -> None:
+    if job.status != "succeeded":
+        raise RuntimeError(f"Bootstrap {job.kind} job {job.id} {job.status}: {job.error}")
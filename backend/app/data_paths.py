@@ -3,4 +3,8 @@ BASE = Path(__file__).resolve().parents[1] / "data"
 BASE.mkdir(parents=True, exist_ok=True)
 PARQUET = BASE / "parquet"
 PARQUET.mkdir(exist_ok=True)
-SQLITE = BASE / "inrm_demo.sqlite"
\ No newline at end of file
+SNAPSHOTS = PARQUET / "snapshots"
+SNAPSHOTS.mkdir(exist_ok=True)
+SQLITE = BASE / "inrm_demo.sqlite"
+CACHE = BASE / "cache"
+CACHE.mkdir(exist_ok=True)
@@ -0,0 +1,153 @@
+"""Background job manager for data generation and model training.
+
+Long-running work (``gen_weekly_data``, ``append_weeks``,
+``fit_elasticities``) runs on a bounded thread pool (``JOBS_MAX_WORKERS``,
+default 2).  Jobs are single-flight per key: submitting while a job with the
+same key is queued or running returns that job instead of starting a second
+copy.  Job functions receive a ``progress(done, total, unit)`` callback that
+records progress and raises :class:`JobCancelled` once cancellation has been
+requested, so work stops at the next checkpoint.  Data jobs write inside
+:func:`~app.utils.snapshots.new_snapshot`, so a cancelled or failed job
+discards its parquet and SQLite writes alike.  Training and data jobs may
+run side by side; a training job whose input data is replaced before it
+publishes fails with :class:`~app.utils.snapshots.StaleSnapshotError`.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+JOBS_MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", "2"))
+# Finished jobs kept for status queries.
+JOBS_HISTORY = 100
+
+ACTIVE = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback after cancellation."""
+
+
+class Job:
+    """State of one submitted job."""
+
+    def __init__(self, kind: str, key: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key
+        self.status = "queued"
+        self.progress: dict = {}
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.cancel_requested = threading.Event()
+        self.done = threading.Event()
+
+    def report(self, done: int, total: int, unit: str = "", **details) -> None:
+        """Progress callback handed to the job function."""
+
+        self.progress = {"done": int(done), "total": int(total), "unit": unit, **details}
+        if self.cancel_requested.is_set():
+            raise JobCancelled(self.id)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Runs jobs on a thread pool with per-key single-flight."""
+
+    def __init__(self, max_workers: int = JOBS_MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._active: dict[str, Job] = {}
+
+    def submit(
+        self, kind: str, fn: Callable[..., object], *args, key: str | None = None, **kwargs
+    ) -> tuple[Job, bool]:
+        """Start ``fn(*args, progress=..., **kwargs)`` unless ``key`` is busy.
+
+        ``key`` defaults to ``kind``.  Returns the job and whether it was newly
+        created (``False`` means an equivalent job was already in flight).
+        """
+
+        key = key or kind
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job, False
+            job = Job(kind, key)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            while len(self._jobs) > JOBS_HISTORY:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.status in ACTIVE:
+                    break
+                self._jobs.popitem(last=False)
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def run(self, kind: str, fn: Callable[..., object], *args, key: str | None = None, **kwargs) -> Job:
+        """Submit (or join) a job and block until it finishes."""
+
+        job, _created = self.submit(kind, fn, *args, key=key, **kwargs)
+        job.done.wait()
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs) -> None:
+        job.started_at = time.time()
+        try:
+            if job.cancel_requested.is_set():
+                raise JobCancelled(job.id)
+            job.status = "running"
+            fn(*args, progress=job.report, **kwargs)
+            job.status = "succeeded"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as exc:  # surfaced through the status endpoint
+            logger.exception("Job %s (%s) failed", job.id, job.kind)
+            job.status = "failed"
+            job.error = str(exc)
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            job.done.set()
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def list(self) -> list[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Request cancellation; the job stops at its next progress checkpoint."""
+
+        job = self._jobs.get(job_id)
+        if job is not None and job.status in ACTIVE:
+            job.cancel_requested.set()
+        return job
+
+
+jobs = JobManager()
@@ -1,18 +1,28 @@
 import os
 import logging
 from typing import Optional
-from fastapi import FastAPI, Query, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from .schemas import HuddleResponse
-from .synth_data import gen_weekly_data
+from .synth_data import gen_weekly_data, append_weeks
 from .models.elasticities import fit_elasticities
-from .models.simulator import simulate_price_change, simulate_delist
+from .models.simulator import (
+    simulate_delist,
+    simulate_price_change,
+    simulate_price_changes_batch,
+    simulate_price_uncertainty,
+)
 from .models.optimizer import run_optimizer
+from .models.assortment import search_delist_sets
+from .models.rollup import simulate_price_rollup
+from .models.scenario_cache import scenario_cache
 from .rag.store import rag
 from .agents.orchestrator import agentic_huddle, agentic_huddle_v2
 from .utils.secrets import get_gemini_api_key
 from .utils.vertextai import init_vertexai
 from .bootstrap import bootstrap_if_needed
+from .utils.io import pool_metrics
+from .jobs import jobs
 from functools import lru_cache
 import threading
 
@@ -76,31 +86,84 @@ def healthz():
 def health():
     return {"status": "healthy"}
 
+@app.get("/metrics/db")
+def db_metrics():
+    """Connection pool occupancy and checkout wait times."""
+    return pool_metrics()
+
+@app.get("/metrics/scenario-cache")
+def scenario_cache_metrics():
+    """Hit/miss counters and size of the simulation result cache."""
+    return scenario_cache.stats()
+
+def _job_response(job, created: bool, started: str, running: str) -> dict:
+    return {
+        "ok": True,
+        "message": started if created else running,
+        "job_id": job.id,
+        "deduplicated": not created,
+    }
+
 @app.post("/data/generate")
-def generate(background_tasks: BackgroundTasks):
-    """Kick off synthetic data generation in the background.
+def generate():
+    """Kick off synthetic data generation as a background job.
 
     Running the full data generation can take a while which previously caused
-    the Cloud Run request to time out (504).  By delegating the heavy lifting to
-    a background task we return control to the caller immediately while the
-    data is produced asynchronously.
+    the Cloud Run request to time out (504).  The job runs on the job pool and
+    the caller polls ``/jobs/{job_id}``; while generation (or an append) is in
+    flight further requests return the running job instead of starting another.
     """
-    background_tasks.add_task(gen_weekly_data)
-    return {"ok": True, "message": "Data generation started"}
+    job, created = jobs.submit("generate", gen_weekly_data, key="data")
+    return _job_response(job, created, "Data generation started", "Data generation already running")
+
+@app.post("/data/append")
+def append(weeks: int = Query(1, ge=1)):
+    """Append ``weeks`` new weeks to the existing panel as a background job.
+
+    Only the new weeks are simulated and written; fitted elasticities stay
+    aligned with the data.  Shares the ``data`` single-flight slot with
+    ``/data/generate``.
+    """
+    job, created = jobs.submit("append", append_weeks, weeks, key="data")
+    return _job_response(
+        job, created, f"Appending {weeks} week(s) started", "Data update already running"
+    )
 
 @app.post("/models/train")
-def train(background_tasks: BackgroundTasks):
-    """Trigger model training asynchronously.
+def train():
+    """Trigger model training as a background job.
 
     Training elasticities can be a long running process which previously
-    resulted in 5xx responses when the request exceeded the timeout.  Running
-    the training in a background task allows the API to respond immediately.
+    resulted in 5xx responses when the request exceeded the timeout.  Only one
+    training job runs at a time; repeated requests return the running job.
     """
-    background_tasks.add_task(fit_elasticities)
-    return {"ok": True, "message": "Model training started"}
+    job, created = jobs.submit("train", fit_elasticities)
+    return _job_response(job, created, "Model training started", "Model training already running")
+
+@app.get("/jobs")
+def list_jobs():
+    """Recent background jobs, oldest first."""
+    return {"jobs": [job.to_dict() for job in jobs.list()]}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status and progress of one background job."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Ask a job to stop at its next progress checkpoint."""
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
 
 @app.post("/simulate/price")
-def simulate_price(changes: dict):
+def simulate_price(changes: dict, draws: int = Query(0, ge=0, le=20000)):
+    """Point simulation; with ``draws`` also Monte Carlo percentile bands."""
     agg, rows = simulate_price_change(changes)
     base_units = rows["units"].sum() if "units" in rows else 0
     new_units = rows["new_units"].sum() if "new_units" in rows else base_units
@@ -122,11 +185,63 @@ def simulate_price(changes: dict):
         "revenue_change": (new_revenue - base_revenue) / base_revenue * 100 if base_revenue else 0,
         "margin_change": (new_margin - base_margin) / base_margin * 100 if base_margin else 0,
     }
-    return {
+    result = {
         "agg": agg.to_dict(orient="records"),
         "rows": rows.to_dict(orient="records"),
         "summary": summary,
     }
+    if draws:
+        bands = simulate_price_uncertainty(changes, draws=draws)
+        result["bands"] = bands.to_dict(orient="index")
+        result["draws"] = draws
+    return result
+
+@app.post("/simulate/price/batch")
+def simulate_price_batch(payload: dict):
+    """Evaluate many ``{sku_id: pct_change}`` scenarios in one call.
+
+    Body: ``{"scenarios": [...], "weeks": [...]?, "retailer_ids": [...]?}``.
+    """
+    scenarios = payload.get("scenarios")
+    if not isinstance(scenarios, list) or not all(isinstance(c, dict) for c in scenarios):
+        raise HTTPException(status_code=400, detail="'scenarios' must be a list of objects")
+    try:
+        agg, summary = simulate_price_changes_batch(
+            scenarios, weeks=payload.get("weeks"), retailer_ids=payload.get("retailer_ids")
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    weekly = {
+        i: g.drop(columns="scenario").to_dict(orient="records") for i, g in agg.groupby("scenario")
+    }
+    # Summaries cover every submitted scenario, even when no week matched.
+    return {
+        "scenarios": [
+            {"summary": row, "agg": weekly.get(row["scenario"], [])}
+            for row in summary.to_dict(orient="records")
+        ]
+    }
+
+@app.post("/simulate/price/rollup")
+def simulate_price_rollup_api(payload: dict):
+    """Scenario KPIs at any hierarchy level from the per-snapshot rollup cube.
+
+    Body: ``{"changes": {...}, "by": ["region", "brand"], "weeks": [...]?,
+    "filters": {"channel": ["eCom"]}?}``.
+    """
+    changes = payload.get("changes") or {}
+    if not isinstance(changes, dict):
+        raise HTTPException(status_code=400, detail="'changes' must be an object")
+    try:
+        out = simulate_price_rollup(
+            changes,
+            by=payload.get("by") or ["brand"],
+            weeks=payload.get("weeks"),
+            filters=payload.get("filters"),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"rows": out.to_dict(orient="records")}
 
 @app.post("/simulate/delist")
 def simulate_delist_api(ids: list[int]):
@@ -140,6 +255,21 @@ def simulate_delist_api(ids: list[int]):
     }
     return {"rows": df.to_dict(orient="records"), "summary": summary}
 
+@app.post("/assortment/search")
+def assortment_search(
+    max_skus: int = Query(5, ge=1, le=200),
+    max_sku_share: Optional[float] = Query(None, gt=0),
+    max_total_share: Optional[float] = Query(None, gt=0),
+    top: int = Query(5, ge=1, le=50),
+):
+    """Best tail-cleanup delist sets under share and must-stock constraints."""
+    return search_delist_sets(
+        max_skus=max_skus,
+        max_sku_share=max_sku_share,
+        max_total_share=max_total_share,
+        top=top,
+    )
+
 @app.post("/optimize/run")
 def optimize(round: int = 1):
     sol, kpis = run_optimizer(round=round)
@@ -0,0 +1,329 @@
+"""Greedy search over delist candidate sets ("tail cleanup").
+
+Scoring a set with :func:`~app.models.simulator.simulate_delist` walks every
+week/retailer row, which is far too slow to compare thousands of sets.  The
+search instead works on per-SKU aggregates of the recent window: a delisted
+SKU's units move to its three best stocked substitutes from the substitute
+index, weighted by similarity times the substitute's units, like the
+row-level simulation but summed over weeks and retailers.  The simulation's
+set-level rules apply on top: transfers below ``TRANSFER_FLOOR`` of the lost
+units are scaled to ``TRANSFER_TARGET``, and a set with no substitutes at all
+spreads that share over every kept SKU by units.  Each SKU keeps its own unit
+price and unit margin, so a set is scored by the margin it keeps.
+
+Adding or removing one SKU only re-routes the SKUs whose current substitutes
+it affects, so every step is an incremental update.  Forward selection uses a
+lazy priority queue; the final set is then improved with remove/add swaps.
+"""
+from __future__ import annotations
+
+import heapq
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ..utils.io import data_version, read_table
+from ..utils.snapshots import cached_by_tables
+from .simulator import (
+    TOP_SUBSTITUTES,
+    TRANSFER_FLOOR,
+    TRANSFER_TARGET,
+    _delist_frame,
+    _substitutes,
+)
+
+# Candidates re-scored exactly for each swap, taken from the priority queue.
+SWAP_CANDIDATES = 50
+MAX_SWAP_ROUNDS = 10
+
+
+@cached_by_tables("sku_master", "costs")
+def _sku_inputs(version: str) -> tuple[pd.Series, dict[int, list[tuple[int, float]]]]:
+    """Unit cost and ranked substitutes per SKU.
+
+    Only depends on dimension tables, so snapshots that just append weeks
+    share one copy.
+    """
+
+    costs = read_table(
+        "costs", ["sku_id", "cogs_per_unit", "logistics_per_unit"], version=version
+    ).set_index("sku_id")
+    unit_cost = (
+        costs["cogs_per_unit"].fillna(0.0) + costs["logistics_per_unit"].fillna(0.0)
+    ).astype("float64")
+    subs = _substitutes(version).sort_values(["sku_id_lost", "rank"])
+    ranked = {
+        int(lost): list(zip(g["sku_id_keep"].astype(int), g["sim"].astype(float)))
+        for lost, g in subs.groupby("sku_id_lost")
+    }
+    return unit_cost, ranked
+
+
+class _Aggregates:
+    """Per-SKU units, unit price, unit margin and ranked substitutes."""
+
+    def __init__(self, version: str):
+        df = _delist_frame(version)
+        units = df["units"].to_numpy(dtype=np.float64)
+        revenue = units * df["net_price"].to_numpy(dtype=np.float64)
+        sku = df["sku_id"].to_numpy(dtype=np.int64)
+        by_sku = (
+            pd.DataFrame({"sku_id": sku, "units": units, "revenue": revenue})
+            .groupby("sku_id")
+            .sum()
+        )
+        unit_cost, ranked = _sku_inputs(version)
+        guard = read_table("guardrails", version=version)
+        must_stock = set(guard.loc[guard["must_stock_flag"].fillna(0) > 0, "sku_id"].astype(int))
+
+        self.units = by_sku["units"].to_dict()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price = (by_sku["revenue"] / by_sku["units"]).fillna(0.0)
+        self.price = price.to_dict()
+        self.margin = (price - unit_cost.reindex(by_sku.index).fillna(0.0)).to_dict()
+        self.total_units = float(by_sku["units"].sum())
+        # (units, revenue, margin) of the whole window, for the no-substitute
+        # fallback that spreads volume over all kept SKUs.
+        self.totals = (
+            self.total_units,
+            float(by_sku["revenue"].sum()),
+            float(sum(u * self.margin[s] for s, u in self.units.items())),
+        )
+        self.must_stock = must_stock
+
+        # Only SKUs sold in the window can receive volume.
+        self.ranked: dict[int, list[tuple[int, float]]] = {}
+        for lost, subs in ranked.items():
+            stocked = [(s, sim) for s, sim in subs if s in self.units]
+            if stocked:
+                self.ranked[lost] = stocked
+
+    def share(self, sku: int) -> float:
+        return self.units.get(sku, 0.0) / self.total_units if self.total_units else 0.0
+
+
+@lru_cache(maxsize=2)
+def _aggregates(version: str) -> _Aggregates:
+    return _Aggregates(version)
+
+
+class DelistPlan:
+    """A delist set with incrementally maintained volume transfers."""
+
+    def __init__(self, agg: _Aggregates):
+        self.agg = agg
+        self.members: set[int] = set()
+        self.routes: dict[int, list[int]] = {}
+        # members currently routing volume to a SKU
+        self.holders: dict[int, set[int]] = {}
+        self.gains: dict[int, tuple[float, float, float]] = {}
+        self.evaluated = 0
+
+    def _route(self, sku: int, excluded) -> tuple[list[int], tuple[float, float, float]]:
+        agg = self.agg
+        route = []
+        for sub, sim in agg.ranked.get(sku, ()):
+            if sub not in excluded:
+                route.append((sub, sim))
+                if len(route) == TOP_SUBSTITUTES:
+                    break
+        lost = agg.units.get(sku, 0.0)
+        if not route or lost <= 0:
+            return [s for s, _ in route], (0.0, 0.0, 0.0)
+        weights = np.array([sim * max(agg.units.get(s, 0.0), 0.0) for s, sim in route])
+        if weights.sum() <= 0:
+            weights = np.array([sim for _, sim in route])
+        weights = lost * weights / weights.sum()
+        ids = [s for s, _ in route]
+        return ids, (
+            float(weights.sum()),
+            float(sum(w * agg.price[s] for w, s in zip(weights, ids))),
+            float(sum(w * agg.margin[s] for w, s in zip(weights, ids))),
+        )
+
+    def _own(self, sku: int) -> tuple[float, float, float]:
+        u = self.agg.units.get(sku, 0.0)
+        return u, u * self.agg.price.get(sku, 0.0), u * self.agg.margin.get(sku, 0.0)
+
+    def _net(self, gain, own) -> tuple[float, float, float]:
+        """Set change from summed route gains and delisted sales.
+
+        Applies :func:`~app.models.simulator.simulate_delist`'s transfer floor.
+        """
+
+        lost = own[0]
+        if lost > 0 and gain[0] <= 0:
+            kept = [t - o for t, o in zip(self.agg.totals, own)]
+            share = TRANSFER_TARGET * lost / kept[0] if kept[0] > 0 else 0.0
+            gain = [share * k for k in kept]
+        elif lost > 0 and gain[0] < TRANSFER_FLOOR * lost:
+            scale = TRANSFER_TARGET * lost / gain[0]
+            gain = [scale * g for g in gain]
+        return tuple(g - o for g, o in zip(gain, own))
+
+    def _sums(self) -> tuple[list[float], list[float]]:
+        gain, own = [0.0, 0.0, 0.0], [0.0, 0.0, 0.0]
+        for member in self.members:
+            gain = [t + g for t, g in zip(gain, self.gains[member])]
+            own = [t + o for t, o in zip(own, self._own(member))]
+        return gain, own
+
+    def delta_add(self, sku: int) -> tuple[float, float, float]:
+        """Change in (units, revenue, margin) from also delisting ``sku``."""
+
+        self.evaluated += 1
+        excluded = self.members | {sku}
+        gain, own = self._sums()
+        before = self._net(gain, own)
+        _, new = self._route(sku, excluded)
+        gain = [t + n for t, n in zip(gain, new)]
+        own = [t + o for t, o in zip(own, self._own(sku))]
+        for member in self.holders.get(sku, ()):
+            _, new = self._route(member, excluded)
+            old = self.gains[member]
+            gain = [t + n - o for t, n, o in zip(gain, new, old)]
+        after = self._net(gain, own)
+        return tuple(a - b for a, b in zip(after, before))
+
+    def _set_route(self, sku: int) -> None:
+        for sub in self.routes.get(sku, ()):
+            self.holders[sub].discard(sku)
+        route, gain = self._route(sku, self.members)
+        self.routes[sku] = route
+        self.gains[sku] = gain
+        for sub in route:
+            self.holders.setdefault(sub, set()).add(sku)
+
+    def add(self, sku: int) -> None:
+        affected = list(self.holders.get(sku, ()))
+        self.members.add(sku)
+        self._set_route(sku)
+        for member in affected:
+            self._set_route(member)
+
+    def remove(self, sku: int) -> None:
+        self.members.discard(sku)
+        for sub in self.routes.pop(sku, ()):
+            self.holders[sub].discard(sku)
+        self.gains.pop(sku, None)
+        # ``sku`` is available again and may outrank a member's current route.
+        for member in self.members:
+            ranked = [s for s, _ in self.agg.ranked.get(member, ())]
+            if sku in ranked and (
+                len(self.routes[member]) < TOP_SUBSTITUTES
+                or ranked.index(sku) < ranked.index(self.routes[member][-1])
+            ):
+                self._set_route(member)
+
+    def totals(self) -> tuple[float, float, float]:
+        """(units, revenue, margin) change of the current set versus base."""
+
+        return self._net(*self._sums())
+
+    def summary(self) -> dict:
+        units, revenue, margin = self.totals()
+        lost = sum(self.agg.units.get(s, 0.0) for s in self.members)
+        return {
+            "sku_ids": sorted(self.members),
+            "delisted_share": sum(self.agg.share(s) for s in self.members),
+            "lost_units": lost,
+            "transferred_units": lost + units,
+            "units_change": units,
+            "revenue_change": revenue,
+            "margin_change": margin,
+        }
+
+
+def search_delist_sets(
+    max_skus: int = 5,
+    max_sku_share: float | None = None,
+    max_total_share: float | None = None,
+    top: int = 5,
+) -> dict:
+    """Find delist sets of up to ``max_skus`` SKUs that keep the most margin.
+
+    Candidates exclude ``guardrails.must_stock_flag`` SKUs and, when given,
+    SKUs above ``max_sku_share`` of recent units; ``max_total_share`` caps the
+    combined share of the delisted set.  Returns the greedy path (best set of
+    each size), the ``top`` best sets of the final size found during the
+    swap search, and how many candidate sets were scored.
+    """
+
+    agg = _aggregates(data_version())
+    candidates = [
+        s
+        for s in agg.units
+        if s not in agg.must_stock
+        and (max_sku_share is None or agg.share(s) <= max_sku_share)
+    ]
+    plan = DelistPlan(agg)
+
+    def fits(sku: int) -> bool:
+        if max_total_share is None:
+            return True
+        used = sum(agg.share(s) for s in plan.members)
+        return used + agg.share(sku) <= max_total_share + 1e-12
+
+    # Lazy greedy: keys are stale margin losses, re-scored when popped.
+    heap = [(-plan.delta_add(s)[2], s) for s in candidates]
+    heapq.heapify(heap)
+    path = []
+    while heap and len(plan.members) < max_skus:
+        _stale, sku = heapq.heappop(heap)
+        if sku in plan.members or not fits(sku):
+            continue
+        key = -plan.delta_add(sku)[2]
+        if heap and key > heap[0][0] + 1e-12:
+            heapq.heappush(heap, (key, sku))
+            continue
+        plan.add(sku)
+        path.append(plan.summary())
+
+    best: list[tuple[float, tuple[int, ...], dict]] = []
+
+    def record() -> None:
+        summary = plan.summary()
+        entry = (summary["margin_change"], tuple(summary["sku_ids"]), summary)
+        if any(e[1] == entry[1] for e in best):
+            return
+        if len(best) < top:
+            heapq.heappush(best, entry)
+        elif entry[0] > best[0][0]:
+            heapq.heapreplace(best, entry)
+
+    if plan.members:
+        record()
+    # Swap search: drop one member, re-add the best of the most promising
+    # outsiders, keep the swap if the set's margin improves.
+    for _round in range(MAX_SWAP_ROUNDS):
+        improved = False
+        for member in sorted(plan.members):
+            current = plan.totals()[2]
+            plan.remove(member)
+            queue = {s for _k, s in heapq.nsmallest(SWAP_CANDIDATES, heap) if s != member}
+            options = [
+                (plan.delta_add(s)[2], s) for s in queue if s not in plan.members and fits(s)
+            ]
+            choice = max(options, default=None)
+            if choice is None:
+                plan.add(member)
+                continue
+            plan.add(choice[1])
+            record()
+            if plan.totals()[2] > current + 1e-9:
+                heap.append((-choice[0], member))
+                heapq.heapify(heap)
+                improved = True
+            else:
+                plan.remove(choice[1])
+                plan.add(member)
+        if not improved:
+            break
+
+    return {
+        "candidates": len(candidates),
+        "evaluated": plan.evaluated,
+        "path": path,
+        "best": [entry[2] for entry in sorted(best, key=lambda e: e[0], reverse=True)],
+    }
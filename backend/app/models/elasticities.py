@@ -1,71 +1,558 @@
+import hashlib
+import json
+import os
+
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from ..utils.io import engine, write_table
+from ..utils.io import (
+    competitor_brands,
+    competitor_price_wide,
+    data_version,
+    max_week,
+    min_week,
+    read_connection,
+    read_npz,
+    read_table,
+    to_npz,
+    to_parquet,
+    write_table,
+)
+from ..utils.snapshots import new_snapshot
 
-# Fit own & cross elasticity using log-log regression
+# SKUs with fewer weekly observations than this are not fitted.
+MIN_OBS = 30
+# Two-sided 5% critical value; every fitted SKU has at least MIN_OBS rows so
+# the normal approximation to the t distribution is adequate.
+T_CRIT = 1.96
 
-def fit_elasticities():
-    con = engine().connect()
-    price = pd.read_sql("select * from price_weekly", con)
-    demand = pd.read_sql("select * from demand_weekly", con)
-    comp = pd.read_sql("select * from competitor_weekly", con)
-    sku = pd.read_sql("select * from sku_master", con)
-    brands = sorted(comp["brand"].unique())
+# Attribute-importance model: one forest pooled over all SKUs.
+NUM_COLS = ["net_price", "promo_flag", "pack_size_ml"]
+CAT_COLS = ["brand", "tier", "pack_type", "flavor"]
+# Rows sampled to train the pooled forest, and rows per SKU used to score it.
+RF_TRAIN_ROWS = int(os.getenv("ELASTICITY_RF_TRAIN_ROWS", "50000"))
+RF_EVAL_ROWS_PER_SKU = int(os.getenv("ELASTICITY_RF_EVAL_ROWS_PER_SKU", "64"))
 
-    df = demand.merge(price, on=["week","retailer_id","sku_id"]).merge(sku, on="sku_id")
+# Binary ``(sku, brand)`` cross-elasticity matrix published with each fit.
+CROSS_MATRIX = "elasticity_matrix"
+
+
+def _sufficient_stats(
+    codes: np.ndarray,
+    X: np.ndarray,
+    y: np.ndarray,
+    n_groups: int,
+    weights: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """Per-group (optionally weighted) sums that determine an OLS fit.
+
+    ``codes`` maps each row to a group in ``[0, n_groups)``.  Returns raw
+    moments ``n`` (total weight), ``sx``, ``sy``, ``sxx``, ``sxy``, ``syy``
+    and the unweighted row count ``rows``, all accumulated with
+    ``np.bincount``.  Sums from disjoint row sets simply add up, which is
+    what makes incremental refits possible.
+    """
+
+    k = X.shape[1]
+    w = np.ones(len(y)) if weights is None else weights
+    sxx = np.empty((n_groups, k, k))
+    for i in range(k):
+        for j in range(i, k):
+            sxx[:, i, j] = sxx[:, j, i] = np.bincount(codes, w * X[:, i] * X[:, j], n_groups)
+    return {
+        "rows": np.bincount(codes, minlength=n_groups).astype(float),
+        "n": np.bincount(codes, w, n_groups),
+        "sx": np.column_stack([np.bincount(codes, w * X[:, j], n_groups) for j in range(k)]),
+        "sy": np.bincount(codes, w * y, n_groups),
+        "sxx": sxx,
+        "sxy": np.column_stack([np.bincount(codes, w * X[:, j] * y, n_groups) for j in range(k)]),
+        "syy": np.bincount(codes, w * y * y, n_groups),
+    }
+
+
+def _solve_stats(stats: dict[str, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """Slopes and standard errors of ``y ~ 1 + X`` for every group at once.
+
+    The raw moments are centered, and all normal-equation systems are
+    inverted in one batched ``np.linalg.solve`` (pseudo-inverse if any is
+    singular).  Singular groups and groups without residual degrees of
+    freedom get ``NaN`` standard errors.
+    """
+
+    n = stats["n"]
+    k = stats["sx"].shape[1]
+    per = np.maximum(n, 1e-12)
+    xtx = stats["sxx"] - np.einsum("gi,gj->gij", stats["sx"], stats["sx"]) / per[:, None, None]
+    xty = stats["sxy"] - stats["sx"] * (stats["sy"] / per)[:, None]
+    yty = stats["syy"] - stats["sy"] ** 2 / per
+
+    try:
+        inv = np.linalg.solve(xtx, np.broadcast_to(np.eye(k), xtx.shape))
+        dof = n - k - 1
+    except np.linalg.LinAlgError:
+        inv = np.linalg.pinv(xtx)
+        # Rank-deficient groups get minimum-norm coefficients (as lstsq would)
+        # but no standard errors.
+        dof = np.where(np.linalg.matrix_rank(xtx) < k, 0.0, n - k - 1)
+    coef = np.einsum("gij,gj->gi", inv, xty)
+
+    rss = np.maximum(yty - np.einsum("gi,gi->g", coef, xty), 0.0)
+    sigma2 = np.where(dof > 0, rss / np.maximum(dof, 1.0), np.nan)
+    var = np.clip(np.diagonal(inv, axis1=1, axis2=2), 0.0, None)
+    return coef, np.sqrt(sigma2[:, None] * var)
+
+
+def _batched_ols(codes: np.ndarray, X: np.ndarray, y: np.ndarray, n_groups: int):
+    """Fit ``y ~ 1 + X`` separately for every group in one batched solve.
+
+    Returns slope coefficients and their standard errors, both
+    ``(n_groups, k)``, plus the row count per group.
+    """
+
+    stats = _sufficient_stats(codes, X, y, n_groups)
+    coef, se = _solve_stats(stats)
+    return coef, se, stats["n"]
+
+
+def _stats_frame(sku_ids: np.ndarray, stats: dict[str, np.ndarray]) -> pd.DataFrame:
+    """Flatten per-SKU sufficient statistics into one row per SKU.
+
+    ``stats_hash`` fingerprints each SKU's statistics so a later refit can
+    tell which SKUs actually received new data.
+    """
+
+    k = stats["sx"].shape[1]
+    iu, ju = np.triu_indices(k)
+    cols = {"rows": stats["rows"], "n": stats["n"], "sy": stats["sy"], "syy": stats["syy"]}
+    cols.update({f"sx_{i}": stats["sx"][:, i] for i in range(k)})
+    cols.update({f"sxy_{i}": stats["sxy"][:, i] for i in range(k)})
+    cols.update({f"sxx_{i}_{j}": stats["sxx"][:, i, j] for i, j in zip(iu, ju)})
+    out = pd.DataFrame(cols)
+    values = np.ascontiguousarray(out.to_numpy(float))
+    out.insert(0, "sku_id", np.asarray(sku_ids, dtype=np.int64))
+    out["stats_hash"] = [hashlib.sha1(row.tobytes()).hexdigest()[:16] for row in values]
+    return out
+
+
+def _stats_from_frame(frame: pd.DataFrame, k: int) -> dict[str, np.ndarray]:
+    """Inverse of :func:`_stats_frame` (without ids and hashes)."""
+
+    sxx = np.empty((len(frame), k, k))
+    for i, j in zip(*np.triu_indices(k)):
+        sxx[:, i, j] = sxx[:, j, i] = frame[f"sxx_{i}_{j}"].to_numpy(float)
+    return {
+        "rows": frame["rows"].to_numpy(float),
+        "n": frame["n"].to_numpy(float),
+        "sx": frame[[f"sx_{i}" for i in range(k)]].to_numpy(float),
+        "sy": frame["sy"].to_numpy(float),
+        "sxx": sxx,
+        "sxy": frame[[f"sxy_{i}" for i in range(k)]].to_numpy(float),
+        "syy": frame["syy"].to_numpy(float),
+    }
+
+
+def _combine_stats(
+    old: dict[str, np.ndarray], new: dict[str, np.ndarray], decay: float
+) -> dict[str, np.ndarray]:
+    """``decay * old + new`` for aligned statistics; row counts never decay."""
+
+    return {
+        key: old[key] + new[key] if key == "rows" else decay * old[key] + new[key]
+        for key in old
+    }
+
+
+def _attribute_importance(
+    df: pd.DataFrame, evaluate: pd.DataFrame | None = None, seed: int = 42
+) -> pd.DataFrame:
+    """Per-SKU attribute importance from one pooled random forest.
+
+    A single forest predicts ``units`` from price, promo and SKU attributes
+    over (a sample of) the rows of ``df``; SKUs are scored on ``evaluate``
+    (default: up to ``RF_EVAL_ROWS_PER_SKU`` rows per SKU of ``df``).  Each
+    SKU's importances are grouped
+    permutation importances: every attribute (all one-hot columns of a
+    categorical together) is shuffled across SKUs and the resulting increase
+    in that SKU's squared error is measured with one ``np.bincount``.  Scores
+    are normalized to sum to one per SKU.  The forest trains with
+    ``ELASTICITY_N_JOBS`` workers (default: all cores).
+    """
+
+    n_jobs = int(os.getenv("ELASTICITY_N_JOBS", "-1"))
+    prep = ColumnTransformer(
+        [
+            ("num", "passthrough", NUM_COLS),
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), CAT_COLS),
+        ]
+    )
+    train = df.sample(min(len(df), RF_TRAIN_ROWS), random_state=seed)
+    rf = RandomForestRegressor(
+        n_estimators=60, min_samples_leaf=5, random_state=seed, n_jobs=n_jobs
+    )
+    rf.fit(prep.fit_transform(train[NUM_COLS + CAT_COLS]), train["units"])
+
+    # Column blocks of the transformed matrix per source attribute.
+    widths = [1] * len(NUM_COLS) + [len(c) for c in prep.named_transformers_["cat"].categories_]
+    edges = np.cumsum([0] + widths)
+    blocks = dict(zip(NUM_COLS + CAT_COLS, zip(edges[:-1], edges[1:])))
+
+    if evaluate is None:
+        evaluate = (
+            df.sample(frac=1.0, random_state=seed).groupby("sku_id").head(RF_EVAL_ROWS_PER_SKU)
+        )
+    X = prep.transform(evaluate[NUM_COLS + CAT_COLS])
+    y = evaluate["units"].to_numpy(float)
+    sku_ids, codes = np.unique(evaluate["sku_id"].to_numpy(), return_inverse=True)
+    base = np.bincount(codes, (rf.predict(X) - y) ** 2, len(sku_ids))
+
+    rng = np.random.default_rng(seed)
+    scores = {}
+    for col, (lo, hi) in blocks.items():
+        shuffled = X.copy()
+        shuffled[:, lo:hi] = X[rng.permutation(len(X)), lo:hi]
+        err = np.bincount(codes, (rf.predict(shuffled) - y) ** 2, len(sku_ids))
+        scores[col] = np.clip(err - base, 0.0, None)
+    imp = pd.DataFrame(scores, index=sku_ids)
+    total = imp.sum(axis=1)
+    imp = imp.div(total.where(total > 0), axis=0).fillna(0.0)
+    return pd.DataFrame(
+        {
+            "sku_id": imp.index.astype(int),
+            "importance_json": [
+                row.sort_values(ascending=False).head(15).to_json() for _, row in imp.iterrows()
+            ],
+        }
+    )
+
+
+def _training_frame(
+    version: str,
+    min_week: int | None = None,
+    max_week: int | None = None,
+    brands: list[str] | None = None,
+) -> tuple[pd.DataFrame, list[str]]:
+    """Rows used for training over a week range, with competitor prices.
+
+    ``brands`` is the competitor brand list (read from the table when not
+    given).  Returns the merged frame and the competitor brand columns.
+    """
+
+    keys = ["week", "retailer_id", "sku_id"]
+    span = dict(min_week=min_week, max_week=max_week, version=version)
+    price = read_table("price_weekly", keys + ["net_price", "promo_flag"], **span)
+    demand = read_table("demand_weekly", keys + ["units"], **span)
+    sku = read_table(
+        "sku_master",
+        ["sku_id", "brand", "tier", "pack_type", "flavor", "pack_size_ml"],
+        version=version,
+    )
     # competitor brand avg price feature per row
-    comp_avg = comp.pivot_table(index=["week","retailer_id"], columns="brand", values="avg_price").reset_index()
+    comp_avg = competitor_price_wide(version, min_week, max_week, brands)
+    brands = sorted(c for c in comp_avg.columns if c not in ("week", "retailer_id"))
+
+    df = demand.merge(price, on=["week","retailer_id","sku_id"]).merge(sku, on="sku_id")
     df = df.merge(comp_avg, on=["week","retailer_id"], how="left")
+    return df, brands
+
+
+def _design(df: pd.DataFrame, brands: list[str]) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Log-log design: log(price) and log competitor prices against log(units).
+
+    Rows with missing features are dropped.
+    """
+
+    X = np.column_stack(
+        [np.log(np.maximum(df["net_price"].to_numpy(float), 0.01))]
+        + [np.log(np.maximum(df[b].to_numpy(float), 0.01)) for b in brands]
+    )
+    y = np.log(np.maximum(df["units"].to_numpy(float), 1))
+    valid = np.isfinite(X).all(axis=1)
+    return df[valid], X[valid], y[valid]
 
-    elast_rows = []
-    imp_rows = []
 
-    for sku_id, sdf in df.groupby("sku_id"):
-        if len(sdf) < 30:
+def _has_table(name: str) -> bool:
+    from sqlalchemy import inspect
+
+    with read_connection() as con:
+        return inspect(con).has_table(name)
+
+
+def _lineage(version: str) -> str | None:
+    """Identity of the generated panel; appended weeks keep it."""
+
+    if not _has_table("synth_state"):
+        return None
+    state = read_table("synth_state", version=version)
+    return str(state["lineage"].iloc[0]) if "lineage" in state else None
+
+
+def _previous_fit(version: str) -> dict | None:
+    """State of the last fit, or ``None`` if there is nothing to build on."""
+
+    if not _has_table("elasticity_state"):
+        return None
+    state = read_table("elasticity_state", version=version).iloc[0]
+    return {
+        "lineage": state["lineage"],
+        "last_week": int(state["last_week"]),
+        "brands": json.loads(state["brands_json"]),
+        "forgetting": float(state["forgetting"]),
+        "stats": read_table("elasticity_stats", version=version),
+        "elasticities": read_table("elasticities", version=version),
+        "importance": read_table("attributes_importance", version=version),
+    }
+
+
+def _elasticity_rows(
+    sku_ids: np.ndarray, coef: np.ndarray, se: np.ndarray, brands: list[str]
+) -> pd.DataFrame:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tstat = coef[:, 0] / se[:, 0]
+    return pd.DataFrame(
+        {
+            "sku_id": np.asarray(sku_ids, dtype=np.int64),
+            "own_elast": coef[:, 0],
+            "cross_elast_json": [json.dumps(dict(zip(brands, row))) for row in coef[:, 1:].tolist()],
+            "stat_sig": (np.abs(tstat) > T_CRIT).astype(int),
+            "own_se": se[:, 0],
+            "own_tstat": tstat,
+        }
+    )
+
+
+def cross_matrix_from_json(elasticities: pd.DataFrame, brands: list[str]) -> np.ndarray:
+    """Parse ``cross_elast_json`` into a ``(sku, brand)`` matrix.
+
+    Rows follow ``elasticities``; brands outside ``brands`` are dropped and
+    missing or null entries are zero.
+    """
+
+    col = {b: j for j, b in enumerate(brands)}
+    matrix = np.zeros((len(elasticities), len(brands)))
+    for i, js in enumerate(elasticities["cross_elast_json"]):
+        if not isinstance(js, str):
             continue
-        X = sdf[["net_price", "promo_flag"]].copy()
-        for b in brands:
-            if b in sdf.columns:
-                X[b] = np.log(np.maximum(sdf[b], 0.01))
-            else:
-                X[b] = 0.0
-
-        # Own-price elasticity from slope on log(price)
-        X_lp = np.column_stack(
-            [np.log(np.maximum(sdf["net_price"].values, 0.01))]
-            + [X[b].values for b in brands]
+        for b, e in json.loads(js).items():
+            if b in col and e is not None and not np.isnan(e):
+                matrix[i, col[b]] = e
+    return matrix
+
+
+def _cross_matrix(
+    elasticities: pd.DataFrame,
+    solved: pd.DataFrame,
+    coef: np.ndarray,
+    brands: list[str],
+    version: str,
+) -> dict[str, np.ndarray]:
+    """Arrays for :data:`CROSS_MATRIX` covering every row of ``elasticities``.
+
+    Freshly ``solved`` SKUs take their coefficients directly; SKUs kept from an
+    incremental fit are copied from the previous matrix (or parsed from their
+    JSON when the previous snapshot predates the matrix).
+    """
+
+    sku_ids = elasticities["sku_id"].to_numpy(dtype=np.int64)
+    matrix = np.zeros((len(sku_ids), len(brands)))
+    index = pd.Index(sku_ids)
+    kept = ~index.isin(solved["sku_id"])
+    if kept.any():
+        prev = read_npz(CROSS_MATRIX, version)
+        if prev is not None and list(prev["brands"]) == brands:
+            rows = pd.Index(prev["sku_id"]).get_indexer(sku_ids[kept])
+            matrix[kept] = np.where(rows[:, None] >= 0, prev["cross"][rows], 0.0)
+        else:
+            matrix[kept] = cross_matrix_from_json(elasticities[kept], brands)
+    matrix[index.get_indexer(solved["sku_id"])] = np.nan_to_num(coef[:, 1:])
+    return {"sku_id": sku_ids, "brands": np.asarray(brands, dtype=str), "cross": matrix}
+
+
+def _bottom_k(kept: pd.DataFrame | None, rows: pd.DataFrame, k: int, by: str | None = None):
+    """Keep the ``k`` rows with the smallest ``_key`` (per ``by`` group).
+
+    With ``_key`` drawn uniformly per row this is a uniform sample without
+    replacement over every row ever offered, in bounded memory.
+    """
+
+    pool = rows if kept is None else pd.concat([kept, rows], ignore_index=True)
+    if by is None:
+        return pool.nsmallest(k, "_key")
+    return pool.sort_values("_key").groupby(by).head(k)
+
+
+def _stream_stats(
+    version: str,
+    first_week: int,
+    last_week: int,
+    forgetting: float,
+    seed: int = 42,
+    progress=None,
+):
+    """Accumulate training statistics one block of weeks at a time.
+
+    Each block (``ELASTICITY_WEEK_BLOCK`` weeks, default 13) is read with
+    week pushdown, joined to its competitor prices, folded into per-SKU
+    sufficient statistics and offered to two bounded random samples for the
+    attribute-importance model (``RF_TRAIN_ROWS`` pooled rows and
+    ``RF_EVAL_ROWS_PER_SKU`` rows per SKU).  Peak memory is one block plus
+    the samples, whatever the panel length.  ``progress`` is called with
+    weeks processed after every block.
+
+    Returns ``(sku_ids, stats, brands, train_sample, eval_sample)`` where
+    ``stats`` rows follow ``sku_ids`` (all SKUs in ``sku_master``).
+    """
+
+    block = int(os.getenv("ELASTICITY_WEEK_BLOCK", "13"))
+    sku_ids = np.sort(read_table("sku_master", ["sku_id"], version=version)["sku_id"].to_numpy())
+    # Every block gets the same competitor columns, read once.
+    brands = competitor_brands(version)
+    rng = np.random.default_rng(seed)
+    stats = train = evaluate = None
+    for lo in range(first_week, last_week + 1, block):
+        df, _ = _training_frame(version, lo, min(lo + block - 1, last_week), brands)
+        df, X, y = _design(df, brands)
+        codes = np.searchsorted(sku_ids, df["sku_id"].to_numpy())
+        weights = forgetting ** (last_week - df["week"].to_numpy(float))
+        part = _sufficient_stats(codes, X, y, len(sku_ids), weights)
+        stats = part if stats is None else _combine_stats(stats, part, 1.0)
+
+        rows = df[["sku_id", "units"] + NUM_COLS + CAT_COLS].assign(_key=rng.random(len(df)))
+        train = _bottom_k(train, rows, RF_TRAIN_ROWS)
+        evaluate = _bottom_k(evaluate, rows, RF_EVAL_ROWS_PER_SKU, by="sku_id")
+        if progress is not None:
+            done = min(lo + block, last_week + 1) - first_week
+            progress(done, last_week - first_week + 1, "weeks")
+    return sku_ids, stats, brands, train, evaluate
+
+
+# Fit own & cross elasticity using log-log regression
+
+def fit_elasticities(
+    incremental: bool | None = None, forgetting: float | None = None, progress=None
+):
+    """Fit per-SKU own/cross price elasticities and attribute importances.
+
+    Per-SKU sufficient statistics (``X'X``, ``X'y``, ``y'y``, ``n``) are
+    persisted in ``elasticity_stats`` together with the panel lineage and the
+    last week they cover (``elasticity_state``).  With ``incremental`` (env
+    ``ELASTICITY_INCREMENTAL``, default on) and a previous fit of the same
+    panel, only weeks after that are read, their statistics are added to the
+    stored ones and only SKUs whose statistics changed are re-solved; their
+    attribute importances are kept from the last full fit.  Anything else
+    (new panel, changed brands or ``forgetting``, or SKUs with enough rows to
+    be fitted for the first time) triggers a full refit.
+
+    ``forgetting`` (env ``ELASTICITY_FORGETTING``, default 1.0 = none)
+    down-weights each observation by ``forgetting ** age_in_weeks``.
+
+    Training streams over blocks of weeks (see :func:`_stream_stats`), so
+    memory does not grow with the length of the panel.  ``progress`` receives
+    weeks processed and then SKUs fitted when run as a background job.
+    """
+
+    if incremental is None:
+        incremental = os.getenv("ELASTICITY_INCREMENTAL", "1").lower() in ("1", "true", "yes")
+    if forgetting is None:
+        forgetting = float(os.getenv("ELASTICITY_FORGETTING", "1.0"))
+    version = data_version()
+    last_week = max_week("price_weekly", version)
+    lineage = _lineage(version)
+
+    prev = _previous_fit(version) if incremental and lineage is not None else None
+    if prev is not None and not (
+        prev["lineage"] == lineage
+        and prev["forgetting"] == forgetting
+        and prev["last_week"] <= last_week
+    ):
+        prev = None
+    if prev is not None and prev["last_week"] == last_week:
+        return True
+
+    first_week = prev["last_week"] + 1 if prev else min_week("price_weekly", version)
+    sku_ids, stats, brands, train, evaluate = _stream_stats(
+        version, first_week, last_week, forgetting, progress=progress
+    )
+    if prev is not None and brands != prev["brands"]:
+        prev = None
+        sku_ids, stats, brands, train, evaluate = _stream_stats(
+            version, min_week("price_weekly", version), last_week, forgetting, progress=progress
+        )
+
+    if prev is not None:
+        # Decay the stored statistics to the new last week and add them.
+        k = len(brands) + 1
+        old = (
+            prev["stats"]
+            .set_index("sku_id")
+            .drop(columns="stats_hash")
+            .reindex(sku_ids, fill_value=0.0)
         )
-        reg = LinearRegression().fit(X_lp, np.log(np.maximum(sdf["units"].values, 1)))
-        own_elast = float(reg.coef_[0])  # slope wrt log(price)
-        cross = {b: float(c) for b, c in zip(brands, reg.coef_[1:])}
-        elast_rows.append({"sku_id": sku_id, "own_elast": own_elast, "cross_elast_json": pd.Series(cross).to_json(), "stat_sig": 1})
-
-        # Attribute importance using RF
-        num_cols = ["net_price","promo_flag","pack_size_ml"]
-        cat_cols = ["brand","tier","pack_type","flavor"]
-        feats = sdf[num_cols + cat_cols].copy()
-        oh = ColumnTransformer([
-            ("num","passthrough", num_cols),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), cat_cols)
-        ])
-        pipe = Pipeline([("prep", oh), ("rf", RandomForestRegressor(n_estimators=120, random_state=42))])
-        pipe.fit(feats, sdf["units"])    
-        importances = pipe.named_steps["rf"].feature_importances_
-        names = (list(num_cols) + list(pipe.named_steps["prep"].named_transformers_["cat"].get_feature_names_out(cat_cols)))
-        top = pd.Series(importances, index=names).sort_values(ascending=False).head(15)
-        imp_rows.append({"sku_id": sku_id, "importance_json": top.to_json()})
-
-    write_table(pd.DataFrame(elast_rows), "elasticities")
-    write_table(pd.DataFrame(imp_rows), "attributes_importance")
-
-    # Elasticities feed both the simulator and optimizer; clear cached tables so
-    # subsequent requests recompute with the freshly trained coefficients.
-    from .cache import invalidate_model_caches
-
-    invalidate_model_caches()
+        decay = forgetting ** (last_week - prev["last_week"])
+        stats = _combine_stats(_stats_from_frame(old, k), stats, decay)
+
+    observed = stats["rows"] > 0
+    sku_ids = sku_ids[observed]
+    stats = {key: value[observed] for key, value in stats.items()}
+    stats_table = _stats_frame(sku_ids, stats)
+    fit = stats["rows"] >= MIN_OBS
+    if prev is not None and not np.isin(sku_ids[fit], prev["elasticities"]["sku_id"]).all():
+        # Importances come from one forest over the whole panel, so SKUs
+        # fitted for the first time need a full refit to get theirs.
+        return fit_elasticities(incremental=False, forgetting=forgetting, progress=progress)
+    if prev is not None:
+        old_hash = prev["stats"].set_index("sku_id")["stats_hash"]
+        changed = stats_table["stats_hash"].to_numpy() != old_hash.reindex(sku_ids).to_numpy()
+        fit &= changed
+        keep = prev["elasticities"][~prev["elasticities"]["sku_id"].isin(sku_ids[changed])]
+    else:
+        keep = None
+
+    coef, se = _solve_stats({key: value[fit] for key, value in stats.items()})
+    elasticities = _elasticity_rows(sku_ids[fit], coef, se, brands)
+    solved = elasticities
+    if progress is not None:
+        progress(int(fit.sum()), len(sku_ids), "skus")
+    if keep is not None:
+        elasticities = (
+            pd.concat([keep, elasticities], ignore_index=True)
+            .sort_values("sku_id")
+            .reset_index(drop=True)
+        )
+        importance = prev["importance"]
+    else:
+        fitted = train["sku_id"].isin(elasticities["sku_id"])
+        importance = (
+            _attribute_importance(
+                train[fitted], evaluate[evaluate["sku_id"].isin(elasticities["sku_id"])]
+            )
+            if fitted.any()
+            else pd.DataFrame(columns=["sku_id", "importance_json"])
+        )
+
+    state = pd.DataFrame(
+        [
+            {
+                "lineage": lineage,
+                "last_week": last_week,
+                "brands_json": json.dumps(brands),
+                "forgetting": forgetting,
+            }
+        ]
+    )
+    cross = _cross_matrix(elasticities, solved, coef, brands, version)
+    # Publish the model tables and their statistics together; caches keyed
+    # by the snapshot version pick up the new coefficients on the next request.
+    # Fails if new data was published while fitting.
+    with new_snapshot(base=version):
+        to_npz(cross, CROSS_MATRIX)
+        for name, table in {
+            "elasticities": elasticities,
+            "attributes_importance": importance,
+            "elasticity_stats": stats_table,
+            "elasticity_state": state,
+        }.items():
+            write_table(table, name)
+            to_parquet(table, name)
     return True
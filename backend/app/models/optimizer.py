@@ -18,36 +18,42 @@ try:
     PULP_AVAILABLE = True
 except ImportError:
     PULP_AVAILABLE = False
-from ..utils.io import engine
+from ..utils.io import compact_dtypes, data_version, read_table, recent_sku_means
 from ..bootstrap import bootstrap_if_needed
 
 # MILP to maximize margin with guardrails and smoothing (discourage bound-hitting)
 
-@lru_cache()
-def _load_tables():
-    """Load required tables once to avoid repeated I/O."""
+@lru_cache(maxsize=2)
+def _load_tables(version: str):
+    """Load required tables of snapshot ``version`` once to avoid repeated I/O.
+
+    The SKU baselines (mean price ``p0`` and ``base_units`` over the latest
+    8 weeks) are aggregated at the source rather than from raw weekly rows.
+    """
     bootstrap_if_needed()
-    con = engine().connect()
-    return (
-        pd.read_sql("select * from price_weekly", con),
-        pd.read_sql("select * from demand_weekly", con),
-        pd.read_sql("select * from costs", con),
-        pd.read_sql("select * from guardrails", con),
-        pd.read_sql("select * from elasticities", con),
+    base = (
+        recent_sku_means(8, version)
+        .rename(columns={"u0": "base_units"})
+        .dropna(subset=["p0", "base_units"])
+    )
+    # Integer ids/flags are compacted; prices stay float64 for the solver.
+    return tuple(
+        compact_dtypes(t, floats=False)
+        for t in (
+            base,
+            read_table("costs", version=version),
+            read_table("guardrails", version=version),
+            read_table("elasticities", version=version),
+        )
     )
 
 
 def _run_optimizer_pulp(max_pct_change_round1=0.20, max_pct_change_round2=0.40, spend_budget=1e6, round=1):
-    price, demand, costs, guard, elast = _load_tables()
+    base, costs, guard, elast = _load_tables(data_version())
 
-    # aggregate to SKU level (latest 8 weeks)
-    recent = price[price.week>=price.week.max()-8]
-    base = demand[demand.week>=demand.week.max()-8]\
-        .groupby("sku_id").units.mean().rename("base_units").reset_index()
-    p = recent.groupby("sku_id").net_price.mean().rename("p0").reset_index()
+    # SKU level baselines (latest 8 weeks)
     df = (
-        p.merge(base, on="sku_id")
-        .merge(costs, on="sku_id")
+        base.merge(costs, on="sku_id")
         .merge(guard, on="sku_id")
         .merge(elast, on="sku_id", how="left")
     )
@@ -165,20 +171,10 @@ def run_optimizer(max_pct_change_round1=0.20, max_pct_change_round2=0.40, spend_
 
 def _heuristic_optimizer(max_change=0.20):
     """Simple heuristic fallback when PuLP is not available"""
-    price, demand, costs, _, elast = _load_tables()
+    base, costs, _, elast = _load_tables(data_version())
 
-    recent = price[price.week >= price.week.max() - 8]
-    base = (
-        demand[demand.week >= demand.week.max() - 8]
-        .groupby("sku_id")
-        .units.mean()
-        .rename("base_units")
-        .reset_index()
-    )
-    p = recent.groupby("sku_id").net_price.mean().rename("p0").reset_index()
     df = (
-        p.merge(base, on="sku_id")
-        .merge(costs, on="sku_id")
+        base.merge(costs, on="sku_id")
         .merge(elast, on="sku_id", how="left")
     )
     df["own_elast"] = df["own_elast"].fillna(-1.0)
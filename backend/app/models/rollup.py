@@ -0,0 +1,218 @@
+"""Rollup cube for hierarchical views of price simulations.
+
+The recent simulation window is pre-aggregated once per snapshot into cells
+keyed by ``(week, region, channel, sku)``; brand and tier follow from the SKU
+and region/channel from the retailer, so the cube covers every level of
+``CUBE_LEVELS``.  Scenario factors are per SKU, so a simulation scatters them
+onto the cells and any rollup is a grouped sum over cells instead of rows.
+Rollups are cached per scenario, so repeated drill-downs are lookups.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from ..utils.io import data_version, read_table
+from .scenario_cache import canonical_changes, canonical_ids, scenario_cache
+from .simulator import PriceSimulationState, _price_simulation_frame, _simulation_state
+
+CUBE_LEVELS = ("week", "region", "channel", "brand", "tier", "sku_id")
+MEASURES = ("units", "revenue", "margin")
+
+
+def _codes(values) -> tuple[np.ndarray, np.ndarray]:
+    """Dense codes and labels; missing values become ``"Unknown"``."""
+
+    labels = pd.Series(values, dtype=object).fillna("Unknown").astype(str)
+    codes, uniques = pd.factorize(labels, sort=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+class RollupCube:
+    """Base measures per ``(week, region, channel, sku)`` cell."""
+
+    def __init__(
+        self,
+        state: PriceSimulationState,
+        retailer_id: np.ndarray,
+        retailer: pd.DataFrame,
+        sku: pd.DataFrame,
+    ):
+        self.state = state
+        retailers = retailer.drop_duplicates("retailer_id").set_index("retailer_id")
+        rid = pd.Index(retailers.index.astype("int64"))
+        pos = rid.get_indexer(np.asarray(retailer_id, dtype=np.int64))
+        region = np.where(pos >= 0, retailers["region"].to_numpy(dtype=object)[pos], None)
+        channel = np.where(pos >= 0, retailers["channel"].to_numpy(dtype=object)[pos], None)
+        region_code, self.regions = _codes(region)
+        channel_code, self.channels = _codes(channel)
+
+        attrs = sku.drop_duplicates("sku_id").set_index("sku_id").reindex(state.sku_ids)
+        self.sku_brand_code, self.brands = _codes(attrs["brand"].astype(object).to_numpy())
+        self.sku_tier_code, self.tiers = _codes(attrs["tier"].astype(object).to_numpy())
+
+        n_skus = len(state.sku_ids)
+        key = (
+            (state.week_code.astype(np.int64) * len(self.regions) + region_code)
+            * len(self.channels)
+            + channel_code
+        ) * n_skus + state.sku_code
+        cells, cell = np.unique(key, return_inverse=True)
+        self.cell_sku = cells % n_skus
+        rest = cells // n_skus
+        self.cell_channel = rest % len(self.channels)
+        rest //= len(self.channels)
+        self.cell_region = rest % len(self.regions)
+        self.cell_week = rest // len(self.regions)
+
+        price, cost, units = state.net_price, state.cost, state.units
+        priced = np.isfinite(price)
+        costed = priced & np.isfinite(cost)
+        n = len(cells)
+
+        def by_cell(values):
+            return np.bincount(cell, weights=values, minlength=n)
+
+        self.rows = np.bincount(cell, minlength=n).astype(np.float64)
+        self.units = by_cell(units)
+        self.revenue = by_cell(np.where(priced, price * units, 0.0))
+        self.margin_price = by_cell(np.where(costed, price * units, 0.0))
+        self.margin_cost = by_cell(np.where(costed, cost * units, 0.0))
+
+    def level(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        """Per-cell codes and labels of one cube level."""
+
+        state = self.state
+        if name == "week":
+            return self.cell_week, state.weeks
+        if name == "region":
+            return self.cell_region, self.regions
+        if name == "channel":
+            return self.cell_channel, self.channels
+        if name == "brand":
+            return self.sku_brand_code[self.cell_sku], self.brands
+        if name == "tier":
+            return self.sku_tier_code[self.cell_sku], self.tiers
+        if name == "sku_id":
+            return self.cell_sku, state.sku_ids
+        raise ValueError(f"Unknown rollup level {name!r}; expected one of {CUBE_LEVELS}")
+
+    def select(self, weeks=None, filters: dict | None = None) -> np.ndarray:
+        """Cells matching ``weeks`` and ``{level: [values]}`` filters."""
+
+        mask = np.ones(len(self.units), dtype=bool)
+        if weeks:
+            mask &= np.isin(self.state.weeks[self.cell_week], list(weeks))
+        for name, values in (filters or {}).items():
+            codes, labels = self.level(name)
+            wanted = {str(v) for v in values}
+            mask &= np.isin(codes, [i for i, lab in enumerate(labels) if str(lab) in wanted])
+        return np.flatnonzero(mask)
+
+    def scenario(self, sku_pct_changes: dict, weeks=None) -> dict[str, np.ndarray]:
+        """New and base measures per cell for a scenario over ``weeks``.
+
+        Matches :meth:`PriceSimulationState.simulate` on the same scope: the
+        brand-level changes behind cross effects are weighted by the units
+        of the cells in scope.
+        """
+
+        state = self.state
+        scope = self.select(weeks)
+        n_skus = len(state.sku_ids)
+        sku = self.cell_sku[scope]
+        sku_units = np.bincount(sku, weights=self.units[scope], minlength=n_skus)
+        sku_rows = np.bincount(sku, weights=self.rows[scope], minlength=n_skus)
+        pct = state.change_vector(sku_pct_changes)
+        impact = state.cross_impacts(pct[None, :], sku_units, sku_rows)[0]
+        factor = np.clip(1.0 + state.sku_own_elast * pct, 0.0, None) * np.clip(
+            1.0 + impact, 0.0, None
+        )
+        cell_factor = np.zeros(len(self.units))
+        cell_factor[scope] = factor[sku]
+        priced = cell_factor * (1.0 + pct[self.cell_sku])
+        return {
+            "units": np.nan_to_num(cell_factor * self.units),
+            "revenue": np.nan_to_num(priced * self.revenue),
+            "margin": np.nan_to_num(priced * self.margin_price - cell_factor * self.margin_cost),
+            "base_units": self.units,
+            "base_revenue": self.revenue,
+            "base_margin": self.margin_price - self.margin_cost,
+        }
+
+    def rollup(self, values: dict[str, np.ndarray], by, cells: np.ndarray) -> pd.DataFrame:
+        """Sum per-cell ``values`` over ``cells`` grouped by the ``by`` levels."""
+
+        levels = [self.level(name) for name in by]
+        group = np.zeros(len(cells), dtype=np.int64)
+        for codes, labels in levels:
+            group = group * len(labels) + codes[cells]
+        keys, inverse = np.unique(group, return_inverse=True)
+        labels_out = {}
+        for name, (_level_codes, labels) in reversed(list(zip(by, levels))):
+            labels_out[name] = labels[keys % len(labels)]
+            keys = keys // len(labels)
+        out = {name: labels_out[name] for name in by}
+        n_groups = len(labels_out[by[0]]) if by else 1
+        for measure, per_cell in values.items():
+            out[measure] = np.bincount(inverse, weights=per_cell[cells], minlength=n_groups)
+        return pd.DataFrame(out)
+
+
+@lru_cache(maxsize=2)
+def _cube(version: str) -> RollupCube:
+    state = _simulation_state(version)
+    frame = _price_simulation_frame(version)
+    return RollupCube(
+        state,
+        frame["retailer_id"].to_numpy(),
+        read_table("retailer", ["retailer_id", "region", "channel"], version=version),
+        read_table("sku_master", ["sku_id", "brand", "tier"], version=version),
+    )
+
+
+def simulate_price_rollup(
+    sku_pct_changes: dict, by=("brand",), weeks=None, filters: dict | None = None
+) -> pd.DataFrame:
+    """Scenario KPIs rolled up to any combination of ``CUBE_LEVELS``.
+
+    ``weeks`` sets the simulation scope like :func:`simulate_price_change`;
+    ``filters`` (``{level: [values]}``) only selects which cells are
+    reported.  Returns the ``by`` columns, new and base units/revenue/margin
+    and their percent changes.  Cached per scenario and snapshot; the result
+    must not be mutated.
+    """
+
+    by = tuple(by)
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError("'filters' must map rollup levels to lists of values")
+    for name, values in filters.items():
+        # A bare string would otherwise be matched character by character.
+        if not isinstance(values, (list, tuple)):
+            raise ValueError(f"Filter {name!r} must be a list of values, got {values!r}")
+    for name in by + tuple(filters):
+        if name not in CUBE_LEVELS:
+            raise ValueError(f"Unknown rollup level {name!r}; expected one of {CUBE_LEVELS}")
+    version = data_version()
+    changes = canonical_changes(sku_pct_changes)
+    weeks = canonical_ids(weeks)
+    filters = {
+        name: tuple(sorted({str(v) for v in values})) for name, values in filters.items()
+    }
+    cells_key = ("rollup_cells", version, tuple(changes.items()), weeks)
+
+    def compute() -> pd.DataFrame:
+        cube = _cube(version)
+        values = scenario_cache.get_or_compute(cells_key, lambda: cube.scenario(changes, weeks))
+        out = cube.rollup(values, by, cube.select(weeks, filters))
+        for measure, label in zip(MEASURES, ("volume", "revenue", "margin")):
+            base = out[f"base_{measure}"]
+            change = (out[measure] - base) / base.where(base != 0) * 100
+            out[f"{label}_change"] = change.fillna(0.0)
+        return out
+
+    key = ("rollup", version, tuple(changes.items()), weeks, by, tuple(sorted(filters.items())))
+    return scenario_cache.get_or_compute(key, compute)
@@ -0,0 +1,139 @@
+"""LRU cache for simulation results keyed by canonical scenarios.
+
+The huddle scorer, UI sliders and API clients re-run identical scenarios whose
+change dicts differ only in key type (``"1003"`` vs ``1003``), order or float
+noise.  :func:`canonical_changes` normalises them, and results are cached per
+snapshot version so a data refresh never serves stale numbers; entries for
+older versions simply age out.  The cache is bounded by the approximate size
+of the cached frames (``SCENARIO_CACHE_MB``, default 64; 0 disables it).
+
+Cached frames are shared between callers and must not be mutated.
+"""
+from __future__ import annotations
+
+import numbers
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+import numpy as np
+import pandas as pd
+
+SCENARIO_CACHE_MB = float(os.getenv("SCENARIO_CACHE_MB", "64"))
+# Magnitudes are rounded to this many decimals before keying and simulating.
+CHANGE_DECIMALS = 6
+
+
+def sku_key(key) -> int:
+    """SKU id from a change-dict key: ``"1003"``, ``1003`` or ``1003.0``.
+
+    Raises ``ValueError``/``TypeError`` for anything else, including
+    fractional numbers.
+    """
+
+    if isinstance(key, str):
+        return int(key)
+    if isinstance(key, numbers.Integral):
+        return int(key)
+    number = float(key)
+    if not number.is_integer():
+        raise ValueError(f"not a SKU id: {key!r}")
+    return int(number)
+
+
+def canonical_changes(changes: dict) -> dict[int, float]:
+    """``{sku_id: pct}`` with int ids, rounded magnitudes and zeros dropped.
+
+    Entries whose id or magnitude is not numeric are ignored, as the
+    simulator would ignore them.
+    """
+
+    out: dict[int, float] = {}
+    for key, value in changes.items():
+        try:
+            sku = sku_key(key)
+            pct = round(float(value), CHANGE_DECIMALS)
+        except (TypeError, ValueError):
+            continue
+        if pct == pct and pct != 0.0:  # drop NaN and no-ops
+            out[sku] = pct
+    return dict(sorted(out.items()))
+
+
+def canonical_ids(values) -> tuple[int, ...]:
+    """Sorted unique ints for a week/retailer/SKU filter (empty = no filter)."""
+
+    return tuple(sorted({int(v) for v in values})) if values else ()
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return 64
+
+
+class ScenarioCache:
+    """Thread-safe LRU cache bounded by the total size of its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[object, int]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = compute()
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _key, (_value, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+scenario_cache = ScenarioCache(int(SCENARIO_CACHE_MB * 1024 * 1024))
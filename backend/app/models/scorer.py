@@ -2,25 +2,19 @@ from typing import Dict, List, Tuple, Any
 from functools import lru_cache
 import pandas as pd
 import numpy as np
-from ..utils.io import engine
+from ..utils.io import compact_dtypes, data_version, read_table, recent_sku_means
 from ..bootstrap import bootstrap_if_needed
 from ..models.simulator import simulate_price_change, simulate_delist
 
-@lru_cache()
-def _latest_price_and_base():
+@lru_cache(maxsize=2)
+def _latest_price_and_base(version: str):
     bootstrap_if_needed()
-    con = engine().connect()
-    price = pd.read_sql("select * from price_weekly", con)
-    demand = pd.read_sql("select * from demand_weekly", con)
-    costs = pd.read_sql("select * from costs", con)
-    elast = pd.read_sql("select * from elasticities", con)
-    recent_w = price.week.max()
-    p = price[price.week>=recent_w-8].groupby("sku_id").net_price.mean().rename("p0")
-    u = demand[demand.week>=recent_w-8].groupby("sku_id").units.mean().rename("u0")
-    df = pd.concat([p, u], axis=1).reset_index().merge(costs, on="sku_id", how="left").merge(elast, on="sku_id", how="left")
+    costs = read_table("costs", version=version)
+    elast = read_table("elasticities", version=version)
+    df = recent_sku_means(8, version).merge(costs, on="sku_id", how="left").merge(elast, on="sku_id", how="left")
     df["own_elast"] = df["own_elast"].fillna(-1.0)
     df.loc[df["own_elast"].abs() < 1e-4, "own_elast"] = -1.0
-    return df
+    return compact_dtypes(df.drop(columns=["cross_elast_json"]), floats=False)
 
 def evaluate_plan(plan: Dict[str, Any]) -> Tuple[Dict[str, float], Dict[str, int]]:
     """
@@ -52,7 +46,7 @@ def evaluate_plan(plan: Dict[str, Any]) -> Tuple[Dict[str, float], Dict[str, int
 
     kpi_total = {"units": 0.0, "revenue": 0.0, "margin": 0.0}
     if pct_changes:
-        agg, _ = simulate_price_change({k: v for k, v in pct_changes.items()})
+        agg, _ = simulate_price_change(pct_changes, return_rows=False)
         if not agg.empty:
             units_delta = agg["units"] - agg.get("base_units", 0.0)
             revenue_delta = agg["revenue"] - agg.get("base_revenue", 0.0)
@@ -90,7 +84,7 @@ def annotate_expected_impacts(plan: Dict[str, Any]) -> Dict[str, Any]:
     """
 
     try:
-        base = _latest_price_and_base().set_index("sku_id")
+        base = _latest_price_and_base(data_version()).set_index("sku_id")
     except Exception:
         # If we cannot load the baseline, leave impacts empty
         return plan
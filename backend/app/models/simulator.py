@@ -3,44 +3,89 @@ from functools import lru_cache
 
 import numpy as np
 import pandas as pd
-from ..utils.io import engine
+from ..utils.io import (
+    compact_dtypes,
+    data_version,
+    max_week,
+    read_npz,
+    read_table,
+    shared_frame,
+    table_columns,
+)
+from ..utils.snapshots import cached_by_tables, table_version
+from .elasticities import CROSS_MATRIX, cross_matrix_from_json
+from .scenario_cache import canonical_changes, canonical_ids, scenario_cache, sku_key
 from ..bootstrap import bootstrap_if_needed
 
 # Limit how much historical data we pull into memory so simulations finish quickly.
 # A large dataset was causing price and delist simulations to take a long time.
 RECENT_WEEKS = 12
+# Bumped whenever the layout of the shared simulation frames changes, so
+# Arrow files cached by an older release are not mapped.
+FRAME_FORMAT = 2
 
-@lru_cache()
-def _load():
-    """Load a recent slice of core model tables and cache for reuse."""
+@lru_cache(maxsize=2)
+def _load(version: str):
+    """Load a recent slice of core model tables from snapshot ``version``.
+
+    Keyed by snapshot version, so a refresh never clears entries that
+    in-flight requests still use; the previous version simply ages out.
+    """
     bootstrap_if_needed()
-    con = engine().connect()
-    # fetch only the most recent weeks to keep dataframe sizes small
-    max_week = pd.read_sql("select max(week) as w from price_weekly", con).iloc[0]["w"]
-    wk_cutoff = max_week - RECENT_WEEKS + 1
-    where = f" where week >= {int(wk_cutoff)}"
-    return (
-        pd.read_sql(f"select * from price_weekly{where}", con),
-        pd.read_sql(f"select * from demand_weekly{where}", con),
-        pd.read_sql("select * from costs", con),
-        pd.read_sql("select * from elasticities", con),
-        pd.read_sql("select * from sku_master", con),
+    # fetch only the most recent weeks (and only the columns the simulators
+    # use) to keep dataframe sizes small
+    wk_cutoff = max_week("price_weekly", version) - RECENT_WEEKS + 1
+    tables = (
+        read_table(
+            "price_weekly",
+            ["week", "retailer_id", "sku_id", "list_price", "net_price", "promo_flag"],
+            min_week=wk_cutoff,
+            version=version,
+        ),
+        read_table(
+            "demand_weekly",
+            ["week", "retailer_id", "sku_id", "units"],
+            min_week=wk_cutoff,
+            version=version,
+        ),
+        read_table("costs", version=version),
+        read_table("elasticities", version=version),
+        read_table("sku_master", version=version),
     )
+    return tuple(compact_dtypes(t) for t in tables)
 
 
-@lru_cache()
-def _price_simulation_frame() -> pd.DataFrame:
-    """Pre-merge the data required for price simulations.
+@cached_by_tables(CROSS_MATRIX, "elasticities", "sku_master")
+def _cross_matrix(version: str) -> tuple[pd.Index, list[str], np.ndarray]:
+    """Per-SKU cross elasticities as a dense ``(sku, brand)`` float matrix.
 
-    The merge is fairly expensive, so we do it once and cache the resulting
-    dataframe.  Callers should take a copy before mutating.
+    Loaded once per fitted model (appended weeks reuse it) from the binary
+    matrix published by :func:`~app.models.elasticities.fit_elasticities`;
+    snapshots written
+    before it existed are parsed from ``elasticities.cross_elast_json``.
+    Returns the SKU index (row order), the brand list (column order) and the
+    matrix.
     """
 
-    price, demand, costs, elast, sku = _load()
+    arrays = read_npz(CROSS_MATRIX, version)
+    if arrays is not None:
+        return pd.Index(arrays["sku_id"]), [str(b) for b in arrays["brands"]], arrays["cross"]
+    elast = read_table("elasticities", ["sku_id", "cross_elast_json"], version=version)
+    sku = read_table("sku_master", ["sku_id", "brand"], version=version)
+    brands = sorted(
+        set(sku["brand"].dropna().astype(str))
+        | {b for js in elast["cross_elast_json"] if isinstance(js, str) for b in json.loads(js)}
+    )
+    matrix = cross_matrix_from_json(elast, brands)
+    return pd.Index(elast["sku_id"].astype("int64")), brands, matrix
+
+
+def _build_price_simulation_frame(version: str) -> pd.DataFrame:
+    price, demand, costs, elast, sku = _load(version)
     df = (
         demand.merge(price, on=["week", "retailer_id", "sku_id"], how="inner")
         .merge(costs, on="sku_id", how="left")
-        .merge(elast, on="sku_id", how="left")
+        .merge(elast[["sku_id", "own_elast"]], on="sku_id", how="left")
         .merge(sku[["sku_id", "brand"]], on="sku_id", how="left")
     )
     df["own_elast"] = df["own_elast"].fillna(-1.0)
@@ -49,200 +94,721 @@ def _price_simulation_frame() -> pd.DataFrame:
     # react to price changes instead of showing 0% impact across the UI.
     df.loc[df["own_elast"].abs() < 1e-4, "own_elast"] = -1.0
     df["cost_per_unit"] = df["cogs_per_unit"].fillna(0.0) + df["logistics_per_unit"].fillna(0.0)
-    df["cross_elast"] = df["cross_elast_json"].fillna("{}").map(json.loads)
-    return df
+    # Grouped by week/retailer so filters select contiguous rows (RowGroups).
+    return df.sort_values(["week", "retailer_id"], kind="stable", ignore_index=True)
+
 
+def _price_simulation_frame(version: str) -> pd.DataFrame:
+    """Pre-merge the data required for price simulations.
 
-@lru_cache()
-def _delist_frame() -> pd.DataFrame:
-    """Pre-merge demand, price and SKU attributes for delist simulations."""
+    The merge is fairly expensive, so it is done once per data version and
+    shared between worker processes as a memory-mapped Arrow file (see
+    :func:`~app.utils.io.shared_frame`).  Callers should take a copy before
+    mutating.  Cross elasticities live in :func:`_cross_matrix` rather than
+    as a per-row column.
+    """
 
-    price, demand, _costs, _elast, sku = _load()
-    return demand.merge(price, on=["week", "retailer_id", "sku_id"], how="inner").merge(
+    return shared_frame(
+        f"price_simulation.v{FRAME_FORMAT}",
+        version,
+        lambda: _build_price_simulation_frame(version),
+    )
+
+
+def _code_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    _skus, sku_code = np.unique(frame["sku_id"].to_numpy(), return_inverse=True)
+    _weeks, week_code = np.unique(frame["week"].to_numpy(), return_inverse=True)
+    return pd.DataFrame(
+        {"sku_code": sku_code.astype(np.int32), "week_code": week_code.astype(np.int32)}
+    )
+
+
+def _simulation_codes(version: str) -> pd.DataFrame:
+    """Dense SKU and week codes of the price simulation rows.
+
+    Kept out of the row frame so simulated rows keep its columns, and shared
+    across workers the same way.
+    """
+
+    return shared_frame(
+        f"price_simulation_codes.v{FRAME_FORMAT}",
+        version,
+        lambda: _code_frame(_price_simulation_frame(version)),
+    )
+
+
+def _build_delist_frame(version: str) -> pd.DataFrame:
+    price, demand, _costs, _elast, sku = _load(version)
+    df = demand.merge(price, on=["week", "retailer_id", "sku_id"], how="inner").merge(
         sku, on="sku_id", how="left"
     )
+    return df.sort_values(["week", "retailer_id"], kind="stable", ignore_index=True)
 
-# Simple what-if using elasticities; cross effects currently neutral (cross_factor = 1.0)
 
-def simulate_price_change(sku_pct_changes: dict, weeks=None, retailer_ids=None):
-    df = _price_simulation_frame().copy()
+def _delist_frame(version: str) -> pd.DataFrame:
+    """Pre-merge demand, price and SKU attributes for delist simulations.
 
-    if weeks:
-        df = df[df.week.isin(weeks)]
-    if retailer_ids:
-        df = df[df.retailer_id.isin(retailer_ids)]
+    Shared across workers like :func:`_price_simulation_frame`.
+    """
 
-    df["pct_change"] = df["sku_id"].map(
-        lambda k: sku_pct_changes.get(str(k), sku_pct_changes.get(int(k), 0.0))
+    return shared_frame(
+        f"delist.v{FRAME_FORMAT}", version, lambda: _build_delist_frame(version)
     )
-    df["pct_change"] = df["pct_change"].fillna(0.0).astype(float)
-    df["new_price"] = df["net_price"] * (1.0 + df["pct_change"])
-
-    # own effect driven purely by elasticities.  Use a simple elasticity * % price
-    # change formulation so a 10% price increase with elasticity -1.24 results in
-    # at least a 12.4% volume decline (instead of the milder change from the
-    # log-log formulation).
-    pct_price_change = df["pct_change"].fillna(0.0)
-    pct_volume_change = df["own_elast"] * pct_price_change
-    own_factor = 1.0 + pct_volume_change
-    # Volumes should not go negative; clamp at zero.
-    own_factor = pd.Series(np.clip(own_factor, a_min=0.0, a_max=None), index=df.index)
-
-    # Cross effect: react to brand-level price changes captured in the elasticity model.
-    weights = df["units"].fillna(0.0)
-    values = df["pct_change"]
-    weighted_change = (values * weights).groupby(df["brand"]).sum()
-    weight_sum = weights.groupby(df["brand"]).sum()
-    brand_means = values.groupby(df["brand"]).mean()
-    brand_pct_change_series = weighted_change.divide(weight_sum.where(weight_sum > 0), fill_value=0.0)
-    brand_pct_change_series = brand_pct_change_series.where(weight_sum > 0, brand_means).fillna(0.0)
-    brand_pct_change = {
-        brand: pct
-        for brand, pct in brand_pct_change_series.items()
-        if not np.isnan(pct)
-    }
-    active_brand_changes = {
-        brand: pct for brand, pct in brand_pct_change.items() if abs(pct) > 1e-12
-    }
-
-    if active_brand_changes:
-        cross_lookup = (
-            df[["sku_id", "brand", "cross_elast"]]
-            .drop_duplicates(subset=["sku_id"])
-            .set_index("sku_id")
+
+
+@lru_cache(maxsize=2)
+def _delist_groups(version: str) -> "RowGroups":
+    frame = _delist_frame(version)
+    return RowGroups(frame["week"].to_numpy(), frame["retailer_id"].to_numpy())
+
+# Delist transfers: lost volume goes to the TOP_SUBSTITUTES most similar kept
+# SKUs stocked in the same week/retailer, chosen from a per-SKU candidate list
+# of SUBSTITUTES_K entries.
+TOP_SUBSTITUTES = 3
+SUBSTITUTES_K = 16
+# Similarity weights for same brand, same pack size and same flavor.
+SIMILARITY_WEIGHTS = (0.6, 0.3, 0.1)
+# If substitutes take less than TRANSFER_FLOOR of the lost volume, transfers
+# are scaled up to TRANSFER_TARGET of it.
+TRANSFER_FLOOR = 0.70
+TRANSFER_TARGET = 0.75
+
+
+def _build_substitutes(version: str) -> pd.DataFrame:
+    sku = read_table(
+        "sku_master", ["sku_id", "brand", "pack_size_ml", "flavor"], version=version
+    ).sort_values("sku_id")
+    ids = sku["sku_id"].to_numpy(dtype=np.int64)
+    codes = [
+        pd.Series(sku[col]).astype("category").cat.codes.to_numpy()
+        for col in ("brand", "pack_size_ml", "flavor")
+    ]
+    n = len(ids)
+    k = min(SUBSTITUTES_K, n - 1)
+    parts = [pd.DataFrame(columns=["sku_id_lost", "sku_id_keep", "sim", "rank"])]
+    if k <= 0:
+        return parts[0]
+    for start in range(0, n, 1024):
+        stop = min(start + 1024, n)
+        # Integer score 6/3/1 orders like the float similarity; ties go to the
+        # lower SKU id, and a SKU is never its own substitute.
+        score = np.zeros((stop - start, n), dtype=np.int64)
+        for weight, code in zip((6, 3, 1), codes):
+            block = code[start:stop, None]
+            score += weight * ((block == code[None, :]) & (block >= 0))
+        score[np.arange(stop - start), np.arange(start, stop)] = 0
+        rank_key = score * n - np.arange(n)[None, :]
+        top = np.argpartition(-rank_key, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(rank_key, top, 1), axis=1), 1)
+        top_score = np.take_along_axis(score, top, 1)
+        lost, rank = np.nonzero(top_score > 0)
+        parts.append(
+            pd.DataFrame(
+                {
+                    "sku_id_lost": ids[start + lost],
+                    "sku_id_keep": ids[top[lost, rank]],
+                    "sim": top_score[lost, rank] / 10.0,
+                    "rank": rank.astype(np.int16),
+                }
+            )
         )
-        impact_cache: dict[tuple[str, tuple[tuple[str, float], ...]], float] = {}
-        outgoing_strength: dict[str, float] = {}
-
-        def _cross_impact(brand: str, cross_dict: dict[str, float]) -> float:
-            if not cross_dict:
-                return 0.0
-            key = (brand, tuple(sorted(cross_dict.items())))
-            cached = impact_cache.get(key)
-            if cached is not None:
-                return cached
-            impact = 0.0
-            for other_brand, elasticity in cross_dict.items():
-                if other_brand == brand:
-                    continue
-                if elasticity is None or np.isnan(elasticity):
-                    continue
-                if elasticity > 0:
-                    outgoing_strength[other_brand] = outgoing_strength.get(other_brand, 0.0) + elasticity
-                pct = active_brand_changes.get(other_brand)
-                if pct is None or np.isnan(pct):
-                    continue
-                impact += elasticity * pct
-            impact_cache[key] = impact
-            return impact
-
-        cross_lookup["cross_impact"] = [
-            _cross_impact(brand, cross_dict)
-            for brand, cross_dict in zip(cross_lookup["brand"], cross_lookup["cross_elast"])
-        ]
-        cross_impacts = df["sku_id"].map(cross_lookup["cross_impact"]).fillna(0.0)
-        if outgoing_strength:
-            penalty = df["brand"].map(
-                lambda brand: -active_brand_changes.get(brand, 0.0)
-                * outgoing_strength.get(brand, 0.0)
-            ).fillna(0.0)
-            cross_impacts = cross_impacts + penalty
-    else:
-        cross_impacts = pd.Series(0.0, index=df.index)
-
-    cross_factor = (1.0 + cross_impacts).clip(lower=0.0)
-
-    df["new_units"] = df["units"] * own_factor * cross_factor
-    df["new_revenue"] = df["new_units"] * df["new_price"]
-    df["margin"] = (df["new_price"] - df["cost_per_unit"]) * df["new_units"]
-    df["base_revenue"] = df["net_price"] * df["units"]
-    df["base_margin"] = (df["net_price"] - df["cost_per_unit"]) * df["units"]
-
-    agg = (
-        df.groupby(["week"])
-        .agg(
-            units=("new_units", "sum"),
-            revenue=("new_revenue", "sum"),
-            margin=("margin", "sum"),
-            base_units=("units", "sum"),
-            base_revenue=("base_revenue", "sum"),
-            base_margin=("base_margin", "sum"),
+    return pd.concat(parts[1:], ignore_index=True)
+
+
+def _substitutes(version: str) -> pd.DataFrame:
+    """Top ``SUBSTITUTES_K`` substitutes per SKU with positive similarity.
+
+    Similarity only depends on ``sku_master`` attributes, so the table is
+    built once per version of that table (appended weeks reuse it) and
+    shared like the simulation frames.
+    Columns: ``sku_id_lost``, ``sku_id_keep``, ``sim`` and ``rank`` (0 = most
+    similar; ties broken by SKU id).
+    """
+
+    return shared_frame(
+        "delist_substitutes",
+        table_version(["sku_master"], version),
+        lambda: _build_substitutes(version),
+    )
+
+
+class RowGroups:
+    """CSR-style row offsets of a frame grouped by ``(week, retailer)``.
+
+    Rows of week ``i`` and retailer ``j`` (positions in :attr:`weeks` and
+    :attr:`retailers`) are ``offsets[c]:offsets[c + 1]`` with
+    ``c = i * len(retailers) + j``, so week/retailer filters resolve to
+    contiguous slices in time proportional to the rows selected.  The
+    simulation frames are built in that order; for any other order the
+    offsets index a stable sort permutation instead.
+    """
+
+    def __init__(self, week: np.ndarray, retailer: np.ndarray):
+        self.weeks, week_code = np.unique(np.asarray(week, dtype=np.int64), return_inverse=True)
+        self.retailers, retailer_code = np.unique(
+            np.asarray(retailer, dtype=np.int64), return_inverse=True
+        )
+        cell = week_code * len(self.retailers) + retailer_code
+        self.order = None if np.all(cell[:-1] <= cell[1:]) else np.argsort(cell, kind="stable")
+        counts = np.bincount(cell, minlength=len(self.weeks) * len(self.retailers))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @staticmethod
+    def _codes(values: np.ndarray, wanted) -> np.ndarray:
+        if not wanted:
+            return np.arange(len(values))
+        wanted = np.unique(np.asarray(list(wanted), dtype=np.int64))
+        pos = np.searchsorted(values, wanted).clip(max=max(len(values) - 1, 0))
+        return pos[values[pos] == wanted] if len(values) else pos[:0]
+
+    def rows(self, weeks=None, retailer_ids=None) -> np.ndarray | None:
+        """Sorted row positions matching the filters; ``None`` means all rows."""
+
+        if not weeks and not retailer_ids:
+            return None
+        cells = (
+            self._codes(self.weeks, weeks)[:, None] * len(self.retailers)
+            + self._codes(self.retailers, retailer_ids)[None, :]
+        ).ravel()
+        starts = self.offsets[cells]
+        lengths = self.offsets[cells + 1] - starts
+        # Concatenate the ranges without a Python loop.
+        first = np.cumsum(lengths) - lengths
+        rows = np.repeat(starts - first, lengths) + np.arange(lengths.sum())
+        return rows if self.order is None else np.sort(self.order[rows])
+
+
+# Scenarios evaluated per matrix product in batch simulations.
+BATCH_CHUNK = 256
+# Bands reported by uncertainty (Monte Carlo) simulations.
+UNCERTAINTY_PERCENTILES = (5, 50, 95)
+
+
+class PriceSimulationState:
+    """Recent price window as contiguous arrays for repeated simulations.
+
+    Rows keep the order of :func:`_price_simulation_frame`; SKUs and weeks are
+    replaced by dense codes (:func:`_simulation_codes`) so per-SKU inputs
+    become vectors and aggregates become ``np.bincount`` calls.  Row arrays
+    are views on the shared frames, so a worker only holds per-SKU and
+    per-week data of its own.  Cross elasticities are aligned to the SKU
+    codes with each SKU's own brand zeroed.  Built once per data version and
+    treated as read-only.
+    """
+
+    def __init__(
+        self,
+        frame: pd.DataFrame,
+        cross: tuple[pd.Index, list[str], np.ndarray],
+        elasticities: pd.DataFrame | None = None,
+        codes: pd.DataFrame | None = None,
+    ):
+        self.frame = frame
+        if codes is None:
+            codes = _code_frame(frame)
+        self.sku_code = codes["sku_code"].to_numpy()
+        self.week_code = codes["week_code"].to_numpy()
+        n_skus = int(self.sku_code.max()) + 1 if len(frame) else 0
+        n_weeks = int(self.week_code.max()) + 1 if len(frame) else 0
+        self.sku_ids = np.zeros(n_skus, dtype=np.int64)
+        self.sku_ids[self.sku_code] = frame["sku_id"].to_numpy()
+        self.weeks = np.zeros(n_weeks, dtype=np.int64)
+        self.weeks[self.week_code] = frame["week"].to_numpy()
+        self.groups = RowGroups(frame["week"].to_numpy(), frame["retailer_id"].to_numpy())
+        # Zero-copy views: money columns are float64 in the frame and units
+        # stay integer; arithmetic on them yields float64 temporaries.
+        self.units = frame["units"].to_numpy()
+        self.net_price = frame["net_price"].to_numpy()
+        self.cost = frame["cost_per_unit"].to_numpy()
+        self.sku_lookup = {int(k): i for i, k in enumerate(self.sku_ids)}
+
+        sku_index, brands, matrix = cross
+        self.brands = brands
+        first = np.zeros(n_skus, dtype=np.int64)
+        first[self.sku_code[::-1]] = np.arange(len(frame))[::-1]
+        sku_brand = pd.Index(brands).get_indexer(
+            frame["brand"].iloc[first].astype(object).to_numpy()
+        )
+        rows = sku_index.get_indexer(self.sku_ids)
+        self.cross = np.where(rows[:, None] >= 0, matrix[np.maximum(rows, 0)], 0.0)
+        self.sku_brand = sku_brand
+        self.has_brand = sku_brand >= 0
+        self.cross[np.flatnonzero(self.has_brand), sku_brand[self.has_brand]] = 0.0
+
+        # Own elasticity and the rest of the elasticity table are per-SKU
+        # attributes; rows get them by SKU code.
+        self.sku_own_elast = frame["own_elast"].to_numpy()[first].astype(np.float64)
+        self.sku_own_se = np.zeros(n_skus)
+        self.sku_detail = pd.DataFrame(index=np.arange(n_skus))
+        if elasticities is not None:
+            table = elasticities.drop_duplicates("sku_id")
+            table = table.set_index(table["sku_id"].astype("int64")).reindex(self.sku_ids)
+            # Same defaults as the frame: missing or ~zero fits become -1.
+            fitted = table["own_elast"].to_numpy(dtype=np.float64, na_value=np.nan)
+            usable = np.abs(fitted) >= 1e-4
+            self.sku_own_elast = np.where(usable, fitted, -1.0)
+            if "own_se" in table:
+                se = table["own_se"].to_numpy(dtype=np.float64, na_value=np.nan)
+                # No uncertainty where a default replaced the fit.
+                self.sku_own_se = np.where(usable, np.nan_to_num(se), 0.0)
+            detail = table.drop(columns=["sku_id", "own_elast"]).reset_index(drop=True)
+            if "cross_elast_json" in detail:
+                detail["cross_elast_json"] = detail["cross_elast_json"].fillna("{}")
+                detail["cross_elast"] = detail["cross_elast_json"].map(json.loads)
+            # Fallback fits have no t-statistic; rows carry None so they stay
+            # JSON serialisable.
+            for col in detail.columns[detail.isna().any()]:
+                detail[col] = detail[col].astype(object).where(detail[col].notna(), None)
+            self.sku_detail = detail
+        # Unfiltered aggregates do not depend on the scenario; kept on first use.
+        self._full_totals = None
+        self._full_bases = None
+
+    def change_vector(self, sku_pct_changes: dict) -> np.ndarray:
+        """Dense per-SKU-code percentage changes; unknown SKUs are ignored."""
+
+        pct = np.zeros(len(self.sku_ids))
+        for key, value in sku_pct_changes.items():
+            try:
+                code = self.sku_lookup.get(sku_key(key))
+            except (TypeError, ValueError):
+                continue
+            if code is not None and value is not None and not pd.isna(value):
+                pct[code] = float(value)
+        return pct
+
+    def scope(self, weeks=None, retailer_ids=None) -> np.ndarray | None:
+        """Row indices selected by the filters, or ``None`` for every row."""
+
+        return self.groups.rows(weeks, retailer_ids)
+
+    def sku_totals(self, rows: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+        """Units and row counts per SKU code over the rows in scope."""
+
+        if rows is None and self._full_totals is not None:
+            return self._full_totals
+        codes = self.sku_code if rows is None else self.sku_code[rows]
+        units = self.units if rows is None else self.units[rows]
+        n = len(self.sku_ids)
+        totals = np.bincount(codes, weights=units, minlength=n), np.bincount(codes, minlength=n)
+        if rows is None:
+            self._full_totals = totals
+        return totals
+
+    def cross_impacts(
+        self, pct: np.ndarray, sku_units: np.ndarray, sku_rows: np.ndarray
+    ) -> np.ndarray:
+        """Cross impact per SKU code for each row of the ``(scenario, sku)`` matrix.
+
+        A brand's change is the unit-weighted mean change of its rows in scope
+        (the plain mean when the brand sold nothing); since changes are per
+        SKU, this reduces to a product with per-SKU weight columns.
+        """
+
+        n_brands = len(self.brands)
+        branded = np.flatnonzero(self.has_brand)
+        brand = self.sku_brand[branded]
+        weight_sum = np.bincount(brand, weights=sku_units[branded], minlength=n_brands)
+        count = np.bincount(brand, weights=sku_rows[branded], minlength=n_brands)
+        by_volume = weight_sum > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(
+                by_volume[brand],
+                sku_units[branded] / weight_sum[brand],
+                sku_rows[branded] / count[brand],
+            )
+        members = np.zeros((len(branded), n_brands))
+        members[np.arange(len(branded)), brand] = np.nan_to_num(weight)
+        active = pct[:, branded] @ members
+        active[np.abs(active) <= 1e-12] = 0.0
+        if not active.any():
+            return np.zeros_like(pct)
+
+        outgoing = np.clip(self.cross[sku_rows > 0], 0.0, None).sum(axis=0)
+        impact = active @ self.cross.T
+        own = self.sku_brand[branded]
+        impact[:, branded] -= active[:, own] * outgoing[own]
+        return impact
+
+    def simulate(self, sku_pct_changes: dict, weeks=None, retailer_ids=None, return_rows=True):
+        rows = self.scope(weeks, retailer_ids)
+
+        def take(values):
+            return values if rows is None else values[rows]
+
+        codes = take(self.sku_code)
+        sku_pct = self.change_vector(sku_pct_changes)
+        pct = sku_pct[codes]
+        units = take(self.units)
+        net_price = take(self.net_price)
+        cost = take(self.cost)
+        new_price = net_price * (1.0 + pct)
+
+        # own effect driven purely by elasticities.  Use a simple elasticity * % price
+        # change formulation so a 10% price increase with elasticity -1.24 results in
+        # at least a 12.4% volume decline (instead of the milder change from the
+        # log-log formulation).  Volumes should not go negative; clamp at zero.
+        own_elast = self.sku_own_elast[codes]
+        own_factor = np.clip(1.0 + own_elast * pct, 0.0, None)
+        # Cross effect: react to brand-level price changes captured in the elasticity model.
+        impact = self.cross_impacts(sku_pct[None, :], *self.sku_totals(rows))[0]
+        cross_factor = np.clip(1.0 + impact[codes], 0.0, None)
+
+        new_units = units * own_factor * cross_factor
+        new_revenue = new_units * new_price
+        margin = (new_price - cost) * new_units
+        base_revenue = net_price * units
+        base_margin = (net_price - cost) * units
+
+        week_code = take(self.week_code)
+        n_weeks = len(self.weeks)
+        in_scope = np.bincount(week_code, minlength=n_weeks) > 0
+
+        def by_week(values):
+            return np.bincount(week_code, weights=np.nan_to_num(values), minlength=n_weeks)[in_scope]
+
+        agg = pd.DataFrame(
+            {
+                "week": self.weeks[in_scope],
+                "units": by_week(new_units),
+                "revenue": by_week(new_revenue),
+                "margin": by_week(margin),
+                "base_units": by_week(units),
+                "base_revenue": by_week(base_revenue),
+                "base_margin": by_week(base_margin),
+            }
+        )
+        if not return_rows:
+            return agg, None
+        out = self.frame if rows is None else self.frame.take(rows)
+        out = out.assign(
+            units=units,
+            net_price=net_price,
+            cost_per_unit=cost,
+            own_elast=own_elast,
+            **{col: self.sku_detail[col].to_numpy()[codes] for col in self.sku_detail},
+            pct_change=pct,
+            new_price=new_price,
+            new_units=new_units,
+            new_revenue=new_revenue,
+            margin=margin,
+            base_revenue=base_revenue,
+            base_margin=base_margin,
         )
-        .reset_index()
+        return agg, out
+
+
+    def simulate_draws(
+        self,
+        sku_pct_changes: dict,
+        draws: int,
+        weeks=None,
+        retailer_ids=None,
+        seed: int = 0,
+        percentiles=UNCERTAINTY_PERCENTILES,
+    ) -> pd.DataFrame:
+        """Percentile bands of total % changes with sampled own elasticities.
+
+        Own elasticities are drawn from ``N(own_elast, own_se)`` per SKU; cross
+        effects stay at their point estimates (no standard errors are kept for
+        them).  Only changed SKUs respond to their own elasticity, so the
+        draws form a ``(draws, changed SKUs)`` matrix applied to per-SKU base
+        totals.  Returns one row per measure with a column per percentile.
+        """
+
+        rows = self.scope(weeks, retailer_ids)
+        pct = self.change_vector(sku_pct_changes)
+        sku_units, sku_rows = self.sku_totals(rows)
+        _weeks, bases = self.cell_bases(rows)
+        units, revenue, margin_price, margin_cost = (b.sum(axis=0) for b in bases)
+        cross = np.clip(1.0 + self.cross_impacts(pct[None, :], sku_units, sku_rows)[0], 0.0, None)
+
+        changed = np.flatnonzero(pct)
+        rest = np.ones(len(pct), dtype=bool)
+        rest[changed] = False
+        rng = np.random.default_rng(seed)
+        elast = self.sku_own_elast[changed] + self.sku_own_se[changed] * rng.standard_normal(
+            (draws, len(changed))
+        )
+        factor = np.clip(1.0 + elast * pct[changed], 0.0, None) * cross[changed]
+        priced = factor * (1.0 + pct[changed])
+        new = {
+            "units": cross[rest] @ units[rest] + factor @ units[changed],
+            "revenue": cross[rest] @ revenue[rest] + priced @ revenue[changed],
+            "margin": cross[rest] @ (margin_price[rest] - margin_cost[rest])
+            + priced @ margin_price[changed]
+            - factor @ margin_cost[changed],
+        }
+        base = {
+            "units": units.sum(),
+            "revenue": revenue.sum(),
+            "margin": (margin_price - margin_cost).sum(),
+        }
+        out = {}
+        for measure, label in (("units", "volume"), ("revenue", "revenue"), ("margin", "margin")):
+            if base[measure]:
+                change = (new[measure] - base[measure]) / base[measure] * 100
+            else:
+                change = np.zeros(draws)
+            out[f"{label}_change"] = np.percentile(change, percentiles)
+        return pd.DataFrame(out, index=[f"p{p:g}" for p in percentiles]).T
+
+    def cell_bases(self, rows: np.ndarray | None):
+        """Base measures summed per ``(week, sku)`` cell over the rows in scope.
+
+        Returns the weeks in scope and ``(week, sku)`` matrices of units,
+        revenue, and the price and cost terms of margin.  Every scenario
+        factor is constant within a cell, so scenario KPIs are products of
+        per-SKU factors with these matrices.
+        """
+
+        if rows is None and self._full_bases is not None:
+            return self._full_bases
+
+        def take(values):
+            return values if rows is None else values[rows]
+
+        n_weeks, n_skus = len(self.weeks), len(self.sku_ids)
+        cell = take(self.week_code) * n_skus + take(self.sku_code)
+        units, price, cost = take(self.units), take(self.net_price), take(self.cost)
+        priced = np.isfinite(price)
+        costed = priced & np.isfinite(cost)
+
+        def by_cell(values):
+            return np.bincount(cell, weights=values, minlength=n_weeks * n_skus).reshape(
+                n_weeks, n_skus
+            )
+
+        in_scope = np.bincount(cell // n_skus, minlength=n_weeks) > 0
+        bases = (
+            by_cell(units),
+            by_cell(np.where(priced, price * units, 0.0)),
+            by_cell(np.where(costed, price * units, 0.0)),
+            by_cell(np.where(costed, cost * units, 0.0)),
+        )
+        out = self.weeks[in_scope], tuple(b[in_scope] for b in bases)
+        if rows is None:
+            self._full_bases = out
+        return out
+
+    def simulate_batch(self, scenarios: list[dict], weeks=None, retailer_ids=None):
+        """Evaluate many change sets together as a ``(scenario, sku)`` matrix."""
+
+        rows = self.scope(weeks, retailer_ids)
+        sku_units, sku_rows = self.sku_totals(rows)
+        week_ids, (units, revenue, margin_price, margin_cost) = self.cell_bases(rows)
+        own_elast = self.sku_own_elast
+        results = {key: [] for key in ("units", "revenue", "margin")}
+        for start in range(0, len(scenarios), BATCH_CHUNK):
+            pct = np.stack(
+                [self.change_vector(c) for c in scenarios[start : start + BATCH_CHUNK]]
+            )
+            own_factor = np.clip(1.0 + own_elast * pct, 0.0, None)
+            cross_factor = np.clip(1.0 + self.cross_impacts(pct, sku_units, sku_rows), 0.0, None)
+            factor = own_factor * cross_factor
+            priced = factor * (1.0 + pct)
+            results["units"].append(factor @ units.T)
+            results["revenue"].append(priced @ revenue.T)
+            results["margin"].append(priced @ margin_price.T - factor @ margin_cost.T)
+
+        n_scen, n_weeks = len(scenarios), len(week_ids)
+        empty = np.zeros((0, n_weeks))
+        agg = pd.DataFrame(
+            {
+                "scenario": np.repeat(np.arange(n_scen), n_weeks),
+                "week": np.tile(week_ids, n_scen),
+                **{
+                    key: np.concatenate(parts or [empty]).ravel()
+                    for key, parts in results.items()
+                },
+                "base_units": np.tile(units.sum(axis=1), n_scen),
+                "base_revenue": np.tile(revenue.sum(axis=1), n_scen),
+                "base_margin": np.tile((margin_price - margin_cost).sum(axis=1), n_scen),
+            }
+        )
+        # One summary row per scenario even when the filters select no weeks.
+        summary = (
+            agg.drop(columns="week")
+            .groupby("scenario")
+            .sum()
+            .reindex(pd.RangeIndex(n_scen, name="scenario"), fill_value=0.0)
+        )
+        for measure, label in (("units", "volume"), ("revenue", "revenue"), ("margin", "margin")):
+            base = summary[f"base_{measure}"]
+            change = (summary[measure] - base) / base.where(base != 0) * 100
+            summary[f"{label}_change"] = change.fillna(0.0)
+        return agg, summary.reset_index()
+
+
+# Elasticity columns carried on simulated rows when the table has them.
+ELASTICITY_DETAIL = ("own_se", "own_tstat", "stat_sig", "cross_elast_json")
+
+
+@lru_cache(maxsize=2)
+def _simulation_state(version: str) -> PriceSimulationState:
+    # Only the per-SKU columns the state and its rows use; the frames may be
+    # mapped from another worker, so nothing else needs loading here.  Fit
+    # statistics are optional: tables trained by older releases lack them.
+    present = set(table_columns("elasticities", version))
+    columns = ["sku_id", "own_elast"] + [c for c in ELASTICITY_DETAIL if c in present]
+    elast = read_table("elasticities", columns, version=version)
+    return PriceSimulationState(
+        _price_simulation_frame(version),
+        _cross_matrix(version),
+        elast,
+        _simulation_codes(version),
+    )
+
+
+def simulate_price_change(sku_pct_changes: dict, weeks=None, retailer_ids=None, return_rows=True):
+    """Weekly KPIs (and optionally per-row detail) for a set of price changes.
+
+    ``sku_pct_changes`` maps SKU ids (int or str) to fractional price
+    changes.  Returns ``(agg, rows)``; ``rows`` is ``None`` unless
+    ``return_rows`` is set, which skips building the per-row frame for
+    callers that only need the weekly aggregate.
+
+    Results are cached per canonical scenario and data version (see
+    :mod:`~app.models.scenario_cache`) and must not be mutated.
+    """
+
+    # Resolve the snapshot once so every table below comes from the same data.
+    version = data_version()
+    changes = canonical_changes(sku_pct_changes)
+    weeks, retailer_ids = canonical_ids(weeks), canonical_ids(retailer_ids)
+    key = ("price", version, tuple(changes.items()), weeks, retailer_ids, bool(return_rows))
+    return scenario_cache.get_or_compute(
+        key,
+        lambda: _simulation_state(version).simulate(changes, weeks, retailer_ids, return_rows),
     )
-    return agg, df
+
+
+def simulate_price_changes_batch(scenarios: list[dict], weeks=None, retailer_ids=None):
+    """Evaluate many price scenarios against one snapshot in a few matrix products.
+
+    Each scenario is a ``{sku_id: pct_change}`` dict as accepted by
+    :func:`simulate_price_change`.  Returns ``(agg, summary)``: weekly KPIs
+    with a ``scenario`` column (position in ``scenarios``) and one row per
+    scenario with totals and percentage changes versus base.
+    """
+
+    state = _simulation_state(data_version())
+    return state.simulate_batch(list(scenarios), weeks, retailer_ids)
+
+
+def simulate_price_uncertainty(
+    sku_pct_changes: dict, draws: int = 1000, weeks=None, retailer_ids=None, seed: int = 0
+) -> pd.DataFrame:
+    """Monte Carlo bands for a price scenario (see ``PriceSimulationState.simulate_draws``).
+
+    Returns ``volume_change``, ``revenue_change`` and ``margin_change`` rows
+    (percent versus base) with ``p5``/``p50``/``p95`` columns.  Results are
+    cached like :func:`simulate_price_change`.
+    """
+
+    version = data_version()
+    changes = canonical_changes(sku_pct_changes)
+    weeks, retailer_ids = canonical_ids(weeks), canonical_ids(retailer_ids)
+    key = ("price_draws", version, tuple(changes.items()), weeks, retailer_ids, draws, seed)
+    return scenario_cache.get_or_compute(
+        key,
+        lambda: _simulation_state(version).simulate_draws(
+            changes, draws, weeks, retailer_ids, seed
+        ),
+    )
+
 
 # Delist: reallocate some volume to nearest substitutes by brand+pack similarity
 
 def simulate_delist(delist_skus: list, weeks=None):
-    df = _delist_frame().copy()
-    if weeks:
-        df = df[df.week.isin(weeks)]
-    base = df.copy()
+    """Rows kept after delisting ``delist_skus`` with their volume gains.
+
+    Cached like :func:`simulate_price_change`; the result must not be mutated.
+    """
+
+    version = data_version()
+    delist_skus, weeks = canonical_ids(delist_skus), canonical_ids(weeks)
+    return scenario_cache.get_or_compute(
+        ("delist", version, delist_skus, weeks),
+        lambda: _simulate_delist(version, list(delist_skus), list(weeks)),
+    )
 
-    base["keep"] = ~base.sku_id.isin(delist_skus)
-    keep = base[base.keep].copy()
-    lost = base[~base.keep]
+
+def _simulate_delist(version: str, delist_skus: list, weeks: list):
+    df = _delist_frame(version)
+    if weeks:
+        df = df.take(_delist_groups(version).rows(weeks))
+    is_kept = ~df.sku_id.isin(delist_skus)
+    lost = df[~is_kept]
+    # Boolean indexing copies, so the shared frame is never mutated.
+    keep = df[is_kept].assign(units=lambda d: d["units"].astype("float64"), keep=True)
+    lost = lost.assign(units=lambda d: d["units"].astype("float64"), keep=False)
 
     if lost.empty:
         keep["new_units"] = keep["units"]
         keep["volume_gain"] = 0
         return keep
 
-    # Build pairwise similarity between lost and kept SKUs within the same week/retailer
-    lost_pairs = (
-        lost[["week", "retailer_id", "sku_id", "units", "brand", "pack_size_ml", "flavor"]]
-        .rename(columns={
-            "sku_id": "sku_id_lost",
-            "units": "lost_units",
-            "brand": "brand_lost",
-            "pack_size_ml": "pack_size_ml_lost",
-            "flavor": "flavor_lost",
-        })
-        .copy()
+    # Candidate substitutes come from the per-SKU index; keep only those still
+    # listed and stocked in the same week/retailer, and take the best three.
+    lost_pairs = lost[["week", "retailer_id", "sku_id", "units"]].rename(
+        columns={"sku_id": "sku_id_lost", "units": "lost_units"}
     )
-    keep_pairs = (
-        keep[
-            [
-                "week",
-                "retailer_id",
-                "sku_id",
-                "units",
-                "brand",
-                "pack_size_ml",
-                "flavor",
-            ]
-        ]
-        .rename(columns={
-            "sku_id": "sku_id_keep",
-            "units": "keep_units",
-            "brand": "brand_keep",
-            "pack_size_ml": "pack_size_ml_keep",
-            "flavor": "flavor_keep",
-        })
-        .copy()
-    )
-    pairs = lost_pairs.merge(
-        keep_pairs,
-        on=["week", "retailer_id"],
+    group_keys = ["week", "retailer_id", "sku_id_lost"]
+    listed = _substitutes(version)
+    listed = listed[listed["sku_id_lost"].isin(delist_skus)]
+    subs = listed[~listed["sku_id_keep"].isin(delist_skus)]
+    # ``keep_row`` is the position in ``keep`` that receives the transfer.
+    keep_pairs = keep[["week", "retailer_id", "sku_id", "units"]].rename(
+        columns={"sku_id": "sku_id_keep", "units": "keep_units"}
     )
-    # similarity: same brand (0.6), same pack_size (0.3), same flavor (0.1)
-    pairs["sim"] = (
-        0.6 * (pairs.brand_lost == pairs.brand_keep).astype(float)
-        + 0.3 * (pairs.pack_size_ml_lost == pairs.pack_size_ml_keep).astype(float)
-        + 0.1 * (pairs.flavor_lost == pairs.flavor_keep).astype(float)
+    keep_pairs["keep_row"] = np.arange(len(keep_pairs))
+    candidates = keep_pairs[keep_pairs["sku_id_keep"].isin(subs["sku_id_keep"])]
+    pairs = (
+        lost_pairs.merge(subs, on="sku_id_lost")
+        .merge(candidates, on=["week", "retailer_id", "sku_id_keep"])
+        .sort_values(group_keys + ["rank"])
     )
-    # take top-3 similar keep SKUs for each lost SKU
-    pairs = pairs.sort_values(
-        ["week", "retailer_id", "sku_id_lost", "sim"],
-        ascending=[True, True, True, False],
+    pairs = pairs.groupby(group_keys).head(TOP_SUBSTITUTES)
+
+    # A lost SKU whose candidate list is full but yielded fewer than three
+    # stocked substitutes may have more beyond the list; score those groups
+    # against every kept SKU in their week/retailer.
+    listed = listed.groupby("sku_id_lost").size()
+    truncated = listed.index[listed >= SUBSTITUTES_K]
+    found = pairs.groupby(group_keys).size()
+    short = lost_pairs[lost_pairs["sku_id_lost"].isin(truncated)].merge(
+        found.rename("found").reset_index(), on=group_keys, how="left"
     )
-    pairs = pairs.groupby(["week", "retailer_id", "sku_id_lost"]).head(3)
+    short = short[short["found"].fillna(0) < TOP_SUBSTITUTES].drop(columns="found")
+    if not short.empty:
+        attrs = ["brand", "pack_size_ml", "flavor"]
+        sku = read_table("sku_master", ["sku_id"] + attrs, version=version)
+        wide = (
+            short.merge(sku.rename(columns={"sku_id": "sku_id_lost"}), on="sku_id_lost")
+            .merge(keep_pairs, on=["week", "retailer_id"])
+            .merge(
+                sku.rename(columns={"sku_id": "sku_id_keep"}),
+                on="sku_id_keep",
+                suffixes=("_lost", "_keep"),
+            )
+        )
+        wide["sim"] = sum(
+            w * (wide[f"{a}_lost"].astype(object) == wide[f"{a}_keep"].astype(object)).astype(float)
+            for w, a in zip(SIMILARITY_WEIGHTS, attrs)
+        )
+        wide = wide[wide["sim"] > 0].sort_values(
+            group_keys + ["sim", "sku_id_keep"], ascending=[True, True, True, False, True]
+        )
+        wide = wide.groupby(group_keys).head(TOP_SUBSTITUTES)[pairs.columns.drop("rank").tolist()]
+        redo = pd.MultiIndex.from_frame(short[group_keys])
+        redone = pd.MultiIndex.from_frame(pairs[group_keys]).isin(redo)
+        pairs = pd.concat([pairs[~redone].drop(columns="rank"), wide], ignore_index=True)
+
     # allocate lost volume proportionally to similarity
     pairs["sim_weight"] = pairs["sim"].clip(lower=0)
     pairs["volume_weight"] = pairs["keep_units"].clip(lower=0).fillna(0)
     pairs["weight"] = pairs["sim_weight"] * pairs["volume_weight"]
-    group_keys = ["week", "retailer_id", "sku_id_lost"]
     weight_sum = pairs.groupby(group_keys)["weight"].transform("sum")
     fallback = weight_sum <= 0
     if fallback.any():
@@ -255,18 +821,12 @@ def simulate_delist(delist_skus: list, weeks=None):
         pairs["lost_units"].fillna(0) * pairs["weight"] / weight_sum
     ).fillna(0)
 
-    add = (
-        pairs.groupby(["week", "retailer_id", "sku_id_keep"])
-        .alloc.sum()
-        .reset_index()
-        .rename(columns={"sku_id_keep": "sku_id", "alloc": "add_units"})
-    )
+    add = pairs.groupby("keep_row").alloc.sum()
     if not add.empty:
-        keep = keep.merge(add, on=["week", "retailer_id", "sku_id"], how="left")
-        keep["add_units"] = keep["add_units"].fillna(0)
-        keep["new_units"] = keep["units"] + keep["add_units"]
-        keep["volume_gain"] = keep["add_units"]
-        keep.drop(columns=["add_units"], inplace=True)
+        keep.reset_index(drop=True, inplace=True)
+        gain = add.reindex(keep.index, fill_value=0.0)
+        keep["new_units"] = keep["units"] + gain
+        keep["volume_gain"] = gain
     else:
         keep["new_units"] = keep["units"]
         keep["volume_gain"] = 0
@@ -274,17 +834,16 @@ def simulate_delist(delist_skus: list, weeks=None):
     total_lost = float(lost["units"].sum()) if "units" in lost else 0.0
     if total_lost > 0:
         transferred = float(keep["volume_gain"].sum())
-        min_ratio = 0.70
-        target_ratio = 0.75
         if transferred <= 0:
             weights = keep["units"].clip(lower=0).fillna(0)
             weight_total = float(weights.sum())
             if weight_total > 0:
-                allocation = (weights / weight_total) * (target_ratio * total_lost)
+                allocation = (weights / weight_total) * (TRANSFER_TARGET * total_lost)
                 keep["volume_gain"] = allocation
                 keep["new_units"] = keep["units"] + keep["volume_gain"]
-        elif transferred < min_ratio * total_lost:
-            scale = (target_ratio * total_lost) / transferred
+        elif transferred < TRANSFER_FLOOR * total_lost:
+            scale = (TRANSFER_TARGET * total_lost) / transferred
             keep["volume_gain"] = keep["volume_gain"] * scale
             keep["new_units"] = keep["units"] + keep["volume_gain"]
     return keep
+
@@ -1,5 +1,4 @@
-import pandas as pd
-from ..utils.io import engine
+from ..utils.io import read_table
 from ..bootstrap import bootstrap_if_needed
 try:
     from sklearn.feature_extraction.text import TfidfVectorizer
@@ -18,12 +17,11 @@ class SimpleTableRAG:
         if not SKLEARN_AVAILABLE:
             return
         bootstrap_if_needed()
-        con = engine().connect()
         tables = ["sku_master","price_weekly","demand_weekly","elasticities","attributes_importance"]
         blobs = []
         for t in tables:
             try:
-                df = pd.read_sql(f"select * from {t} limit 5000", con)
+                df = read_table(t, limit=5000)
                 # Schema doc
                 schema_text = df.dtypes.to_string()
                 blobs.append(f"TABLE:{t}\nSECTION:schema\n{schema_text}")
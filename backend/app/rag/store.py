@@ -4,7 +4,7 @@ import numpy as np
 import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from ..utils.io import engine
+from ..utils.io import read_table
 from ..bootstrap import bootstrap_if_needed
 from ..utils.secrets import get_gemini_api_key
 from ..utils.vertextai import init_vertexai
@@ -64,14 +64,13 @@ class RAGStore:
 
         try:
             bootstrap_if_needed()
-            con = engine().connect()
         except Exception:
             return {"docs": 0, "mode": "error", "error": "Database connection failed"}
         
         blobs, meta = [], []
         for t in tables:
             try:
-                df = pd.read_sql(f"select * from {t} limit 15000", con)
+                df = read_table(t, limit=15000)
                 for (tbl, chunk) in _chunk_text(t, df):
                     blobs.append(chunk)
                     meta.append({"table": tbl})
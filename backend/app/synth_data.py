@@ -1,22 +1,61 @@
+import json
+import logging
+import multiprocessing
 import os
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 
-from .utils.io import write_table, to_parquet
+from .utils.io import (
+    create_indexes,
+    max_week,
+    read_connection,
+    read_table,
+    reset_parquet_dataset,
+    to_parquet,
+    to_parquet_partitioned,
+    write_table,
+)
+from .utils.snapshots import data_version, new_snapshot
 
+logger = logging.getLogger(__name__)
 
 BRANDS = ["Aurel", "Novis", "Verra", "Kairo", "Lumio"]
 FLAVORS = ["Cola", "Orange", "Lime", "Berry", "Ginger"]
 PACKS = [(250, "Can"), (330, "Can"), (500, "PET"), (1000, "PET"), (1500, "PET")]
 REGIONS = ["North", "South", "East", "West"]
 CHANNELS = ["ModernTrade", "GeneralTrade", "eCom"]
+CLUSTER_FACTOR = {"S": 0.85, "M": 1.0, "L": 1.15}
 
-rng = np.random.default_rng(42)
+# Upper bound on week x retailer x SKU cells simulated in one tensor block.
+# Keeps the working set of the vectorized generator to a few hundred MB.
+MAX_BLOCK_CELLS = 2_000_000
 
+# Fact tables are written as week-partitioned parquet datasets and appended to
+# SQLite in chunks of this many rows.
+WEEKLY_TABLES = ("price_weekly", "demand_weekly", "competitor_weekly")
+SQL_CHUNK_ROWS = 50_000
 
-def make_sku_master(n_per_brand: int = 12) -> pd.DataFrame:
+DEFAULT_SEED = 42
+
+
+def _streams(seed: int, weeks: int) -> list[np.random.SeedSequence]:
+    """Independent random streams for one panel.
+
+    Child 0 drives the static dimensions and latent elasticities; child ``w``
+    drives the block of weeks starting at week ``w``.  Streams depend only on
+    the seed and the block layout, never on call order or on which process
+    simulates a block, so serial and parallel runs are bit-identical.
+    """
+
+    return np.random.SeedSequence(seed).spawn(weeks + 1)
+
+
+def make_sku_master(n_per_brand: int = 12, rng: np.random.Generator | None = None) -> pd.DataFrame:
+    rng = rng if rng is not None else np.random.default_rng(DEFAULT_SEED)
     rows = []
     sku_id = 1000
     for b in BRANDS:
@@ -42,33 +81,8 @@ def make_sku_master(n_per_brand: int = 12) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
-def base_price(pack_ml, tier):
-    ppm = 0.0022 if tier == "Value" else 0.0028 if tier == "Core" else 0.0035
-    return round(pack_ml * ppm, 2)
-
-
-def gen_weekly_data(
-    weeks: int | None = None,
-    n_per_brand: int | None = None,
-    retailers_per_combo: int | None = None,
-    max_minutes: int | None = None,
-) -> bool:
-    """Generate synthetic weekly pricing and demand data.
-
-    Defaults are intentionally small so generation completes quickly for demos.
-    Values can be overridden with environment variables:
-      SYNTH_WEEKS, SYNTH_SKUS_PER_BRAND, SYNTH_RETAILERS_PER_COMBO, SYNTH_MAX_MINUTES.
-    """
-
-    weeks = weeks or int(os.getenv("SYNTH_WEEKS", "26"))
-    n_per_brand = n_per_brand or int(os.getenv("SYNTH_SKUS_PER_BRAND", "4"))
-    retailers_per_combo = retailers_per_combo or int(
-        os.getenv("SYNTH_RETAILERS_PER_COMBO", "1")
-    )
-    max_minutes = max_minutes or int(os.getenv("SYNTH_MAX_MINUTES", "5"))
-    start_time = time.time()
-
-    sku = make_sku_master(n_per_brand=n_per_brand)
+def make_retailers(retailers_per_combo: int = 1, rng: np.random.Generator | None = None) -> pd.DataFrame:
+    rng = rng if rng is not None else np.random.default_rng(DEFAULT_SEED)
     retailers = []
     rid = 1
     for r in REGIONS:
@@ -84,168 +98,485 @@ def gen_weekly_data(
                     }
                 )
                 rid += 1
-    retailer = pd.DataFrame(retailers)
+    return pd.DataFrame(retailers)
 
-    start = datetime.today() - timedelta(weeks=weeks)
-    week_index = [int(i + 1) for i in range(weeks)]
 
-    price_rows, demand_rows, comp_rows, cost_rows = [], [], [], []
+def base_price(pack_ml, tier):
+    ppm = 0.0022 if tier == "Value" else 0.0028 if tier == "Core" else 0.0035
+    return round(pack_ml * ppm, 2)
 
-    # brand elasticities (latent truth)
-    brand_own = {b: -1.2 + 0.6 * rng.random() for b in BRANDS}
-    cross_matrix = {
-        b: {bb: (-0.2 if b == bb else 0.15 * rng.random()) for bb in BRANDS}
-        for b in BRANDS
-    }
 
-    for _, s in sku.iterrows():
-        cogs = round(0.45 * base_price(s.pack_size_ml, s.tier), 2)
-        logi = round(0.05 * base_price(s.pack_size_ml, s.tier), 2)
-        cost_rows.append(
-            {"sku_id": s.sku_id, "cogs_per_unit": cogs, "logistics_per_unit": logi}
+def base_prices(pack_ml: np.ndarray, tier: np.ndarray) -> np.ndarray:
+    """Vectorized :func:`base_price` over SKU attribute arrays."""
+    tier = np.asarray(tier)
+    ppm = np.where(tier == "Value", 0.0022, np.where(tier == "Core", 0.0028, 0.0035))
+    return np.round(np.asarray(pack_ml) * ppm, 2)
+
+
+def _simulate_weeks(
+    weeks: np.ndarray,
+    sku: pd.DataFrame,
+    retailer: pd.DataFrame,
+    brand_own: np.ndarray,
+    cross_matrix: np.ndarray,
+    rng: np.random.Generator,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Simulate one block of weeks for every retailer x SKU at once.
+
+    All random draws are (week, retailer, sku) or (week, retailer, brand)
+    tensors so the cost is a handful of NumPy kernels per block rather than a
+    Python loop per row.  Competitor effects are one matrix product of the log
+    competitor prices against each SKU's row of ``cross_matrix``.
+    """
+
+    W, R, S, B = len(weeks), len(retailer), len(sku), len(BRANDS)
+    rids = retailer["retailer_id"].to_numpy(dtype=np.int64)
+    sku_ids = sku["sku_id"].to_numpy(dtype=np.int64)
+    brand_idx = sku["brand"].map({b: i for i, b in enumerate(BRANDS)}).to_numpy()
+
+    # competitor brand signals per week/retailer
+    comp_base = 1.0 + 0.05 * rng.standard_normal((W, R, B))
+    comp_price = np.round(comp_base + 0.1 * rng.random((W, R, B)), 2)
+    promo_int = np.clip(0.2 + 0.15 * rng.standard_normal((W, R, B)), 0.0, 0.5)
+
+    # per-SKU / per-retailer static drivers, shaped for broadcasting
+    lp = base_prices(sku["pack_size_ml"].to_numpy(), sku["tier"].to_numpy())
+    brand_beta = brand_own[brand_idx]
+    flavor_boost = np.where(sku["flavor"].isin(["Berry", "Ginger"]), 1.06, 1.0)
+    sugar_penalty = np.where(sku["sugar_free"].to_numpy() == 1, 0.92, 1.0)
+    pack_term = 0.05 * sku["pack_size_ml"].to_numpy() / 1000
+    cluster = retailer["store_cluster"].map(CLUSTER_FACTOR).to_numpy()[None, :, None]
+    season = (1.0 + 0.12 * np.sin(2 * np.pi * weeks / 52))[:, None, None]
+
+    shape = (W, R, S)
+    promo_flag = (rng.random(shape) < 0.18).astype(np.int64)
+    promo_depth = np.where(promo_flag == 1, np.round(0.05 + 0.15 * rng.random(shape), 2), 0.0)
+    netp = np.round(lp * (1 - promo_depth) * (0.95 + 0.1 * rng.random(shape)), 2)
+    disc_spend = np.round(lp * promo_depth * rng.uniform(200, 1200, shape) / 1000, 2)
+
+    # competitor effect via brand signals: (W, R, B) @ (B, S) -> (W, R, S)
+    cross_effect = np.log(np.maximum(comp_price, 0.01)) @ cross_matrix[brand_idx].T
+
+    # demand model (log-linear)
+    mean_units = (
+        np.exp(
+            3.0
+            + brand_beta * np.log(np.maximum(netp, 0.01))
+            + 0.25 * promo_flag
+            + pack_term
+            + cross_effect
         )
+        * season
+        * flavor_boost
+        * sugar_penalty
+        * cluster
+    )
+    noise = rng.lognormal(mean=0.0, sigma=0.25, size=shape)
+    units = np.maximum(0, np.floor(mean_units * noise / 30)).astype(np.int64)
+    base_units = np.floor(units * (1 - 0.25 * promo_flag)).astype(np.int64)
+
+    keys = {
+        "week": np.repeat(weeks, R * S),
+        "retailer_id": np.tile(np.repeat(rids, S), W),
+        "sku_id": np.tile(sku_ids, W * R),
+    }
+    price = pd.DataFrame(
+        {
+            **keys,
+            "list_price": np.broadcast_to(lp, shape).ravel(),
+            "net_price": netp.ravel(),
+            "promo_flag": promo_flag.ravel(),
+            "promo_depth": promo_depth.ravel(),
+            "discount_spend": disc_spend.ravel(),
+        }
+    )
+    demand = pd.DataFrame(
+        {
+            **keys,
+            "units": units.ravel(),
+            "revenue": np.round(units * netp, 2).ravel(),
+            "base_units": base_units.ravel(),
+            "uplift_units": (units - base_units).ravel(),
+        }
+    )
+    comp = pd.DataFrame(
+        {
+            "week": np.repeat(weeks, R * B),
+            "retailer_id": np.tile(np.repeat(rids, B), W),
+            "brand": np.tile(np.array(BRANDS, dtype=object), W * R),
+            "avg_price": comp_price.ravel(),
+            "promo_intensity": promo_int.ravel(),
+        }
+    )
+    return price, demand, comp
 
-    for w in week_index:
-        if time.time() - start_time > max_minutes * 60:
-            print("Reached maximum generation time; stopping early.")
-            break
-        season = 1.0 + 0.12 * np.sin(2 * np.pi * w / 52)
-        for _, rt in retailer.iterrows():
-            if time.time() - start_time > max_minutes * 60:
-                break
-            # competitor brand signals per retailer
-            for b in BRANDS:
-                if time.time() - start_time > max_minutes * 60:
-                    break
-                base = 1.0 + 0.05 * rng.standard_normal()
-                comp_price = round(1.0 * base + 0.1 * rng.random(), 2)
-                promo_int = max(0.0, min(0.5, 0.2 + 0.15 * rng.standard_normal()))
-                comp_rows.append(
-                    {
-                        "week": w,
-                        "retailer_id": rt.retailer_id,
-                        "brand": b,
-                        "avg_price": comp_price,
-                        "promo_intensity": promo_int,
-                    }
-                )
 
-            for _, s in sku.iterrows():
-                if time.time() - start_time > max_minutes * 60:
-                    break
-                lp = base_price(s.pack_size_ml, s.tier)
-                promo_flag = int(rng.random() < 0.18)
-                promo_depth = (
-                    round(0.05 + 0.15 * rng.random(), 2) if promo_flag else 0.0
-                )
-                netp = round(
-                    lp * (1 - promo_depth) * (0.95 + 0.1 * rng.random()), 2
-                )
-                disc_spend = round(
-                    lp * promo_depth * rng.uniform(200, 1200) / 1000, 2
-                )
+def _simulate_block(args: tuple) -> tuple[tuple[pd.DataFrame, ...], float]:
+    """Process-pool entry point: simulate one week block from its own stream."""
 
-                # latent demand drivers
-                brand_beta = brand_own[s.brand]
-                flavor_boost = 1.0 + (0.06 if s.flavor in ["Berry", "Ginger"] else 0.0)
-                sugar_penalty = 0.92 if s.sugar_free == 1 else 1.0
-                cluster = {"S": 0.85, "M": 1.0, "L": 1.15}[rt.store_cluster]
-
-                # competitor effect via brand signals
-                comp_subset = [
-                    c
-                    for c in comp_rows
-                    if c["week"] == w and c["retailer_id"] == rt.retailer_id
-                ]
-                comp_df = pd.DataFrame(comp_subset)
-                cross_effect = 0.0
-                for b2 in BRANDS:
-                    cross_b = cross_matrix[s.brand][b2]
-                    refp = comp_df.loc[comp_df.brand == b2, "avg_price"].values[0]
-                    cross_effect += cross_b * np.log(max(refp, 0.01))
-
-                # demand model (log-linear)
-                mean_units = (
-                    np.exp(
-                        3.0
-                        + brand_beta * np.log(max(netp, 0.01))
-                        + 0.25 * promo_flag
-                        + 0.05 * s.pack_size_ml / 1000
-                        + cross_effect
-                    )
-                    * season
-                    * flavor_boost
-                    * sugar_penalty
-                    * cluster
-                )
-                noise = rng.lognormal(mean=0.0, sigma=0.25)
-                units = max(0, int(mean_units * noise / 30))
-                revenue = round(units * netp, 2)
+    weeks, sku, retailer, brand_own, cross_matrix, stream = args
+    t0 = time.perf_counter()
+    tables = _simulate_weeks(
+        weeks, sku, retailer, brand_own, cross_matrix, np.random.default_rng(stream)
+    )
+    return tables, time.perf_counter() - t0
 
-                price_rows.append(
-                    {
-                        "week": w,
-                        "retailer_id": rt.retailer_id,
-                        "sku_id": s.sku_id,
-                        "list_price": lp,
-                        "net_price": netp,
-                        "promo_flag": promo_flag,
-                        "promo_depth": promo_depth,
-                        "discount_spend": disc_spend,
-                    }
-                )
-                demand_rows.append(
-                    {
-                        "week": w,
-                        "retailer_id": rt.retailer_id,
-                        "sku_id": s.sku_id,
-                        "units": units,
-                        "revenue": revenue,
-                        "base_units": int(units * (1 - 0.25 * promo_flag)),
-                        "uplift_units": int(
-                            units - int(units * (1 - 0.25 * promo_flag))
-                        ),
-                    }
-                )
 
-    sku_master = make_sku_master(n_per_brand=n_per_brand)
-    retailer = pd.DataFrame(retailers)
-    price_weekly = pd.DataFrame(price_rows)
-    demand_weekly = pd.DataFrame(demand_rows)
-    competitor_weekly = pd.DataFrame(comp_rows)
-    costs = pd.DataFrame(cost_rows)
+def _guardrails(price_sum: pd.Series, price_count: pd.Series) -> pd.DataFrame:
+    """Derive per-SKU price guardrails from running net price aggregates."""
 
-    # guardrails
-    g = price_weekly.groupby("sku_id").net_price.mean().reset_index()
+    net_price = (price_sum / price_count).rename("net_price")
+    g = net_price.rename_axis("sku_id").reset_index()
     g["min_price"] = (g.net_price * 0.85).round(2)
     g["max_price"] = (g.net_price * 1.15).round(2)
     g["max_pct_change"] = 0.1
     g["min_shelf_share"] = 0.01
     g["must_stock_flag"] = 0
-    guardrails = g.drop(columns=["net_price"])
+    return g.drop(columns=["net_price"])
 
-    # persist
+
+def _flush_weekly(tables: dict[str, pd.DataFrame], first: bool) -> None:
+    """Write one block of the weekly fact tables to SQLite and parquet.
+
+    Indexes are left to :func:`_run_blocks`, which builds them once after the
+    last block.
+    """
+
+    for name, df in tables.items():
+        write_table(
+            df,
+            name,
+            if_exists="replace" if first else "append",
+            chunksize=SQL_CHUNK_ROWS,
+            index=False,
+        )
+        to_parquet_partitioned(df, name, partition_col="week")
+
+
+def _run_blocks(
+    week_index: np.ndarray,
+    sku_master: pd.DataFrame,
+    retailer: pd.DataFrame,
+    brand_own: np.ndarray,
+    cross_matrix: np.ndarray,
+    streams: list[np.random.SeedSequence],
+    week_block: int,
+    workers: int,
+    deadline: float,
+    stream: bool,
+    replace: bool,
+    progress: Callable[..., None] | None = None,
+) -> tuple[pd.DataFrame, int, float, int]:
+    """Simulate ``week_index`` block by block and persist the weekly tables.
+
+    Blocks are simulated serially or in a process pool and always consumed in
+    week order.  With ``stream`` each block is flushed as soon as it arrives;
+    otherwise blocks are concatenated and written in one piece.  ``replace``
+    controls whether the first write replaces or appends to the SQL tables.
+    ``progress(weeks_done, weeks_total, "weeks", rows=...)`` is called after
+    every block (see :mod:`app.jobs`).  Returns per-SKU ``net_price`` sum/count aggregates, the number of rows
+    produced, the seconds spent simulating and the last week simulated.
+    """
+
+    stats = pd.DataFrame(0.0, index=sku_master["sku_id"], columns=["net_price_sum", "net_price_count"])
+    parts: dict[str, list[pd.DataFrame]] = {name: [] for name in WEEKLY_TABLES}
+    n_rows, sim_seconds, last_week = 0, 0.0, int(week_index[0]) - 1
+    tasks = (
+        (
+            week_index[lo : lo + week_block],
+            sku_master,
+            retailer,
+            brand_own,
+            cross_matrix,
+            streams[int(week_index[lo])],
+        )
+        for lo in range(0, len(week_index), week_block)
+    )
+
+    def _blocks():
+        """Yield simulated blocks in week order until the time budget runs out."""
+        if workers <= 1:
+            for task in tasks:
+                if time.time() > deadline:
+                    logger.warning("Reached maximum generation time; stopping early.")
+                    return
+                yield _simulate_block(task)
+            return
+        # Spawn rather than fork: this runs on a job thread of a multi-threaded
+        # server that may hold locks and an open SQLite transaction.  Blocks
+        # are pure functions of their task, so workers need no parent state.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            pending = deque()
+            for task in tasks:
+                if time.time() > deadline:
+                    logger.warning("Reached maximum generation time; stopping early.")
+                    break
+                pending.append(pool.submit(_simulate_block, task))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    for i, ((price, demand, comp), seconds) in enumerate(_blocks()):
+        sim_seconds += seconds
+        by_sku = price.groupby("sku_id").net_price
+        stats["net_price_sum"] = stats["net_price_sum"].add(by_sku.sum(), fill_value=0.0)
+        stats["net_price_count"] = stats["net_price_count"].add(by_sku.count(), fill_value=0)
+        n_rows += len(price) + len(demand) + len(comp)
+        last_week = int(price["week"].max())
+
+        block = dict(zip(WEEKLY_TABLES, (price, demand, comp)))
+        if stream:
+            _flush_weekly(block, first=replace and i == 0)
+        else:
+            for name, df in block.items():
+                parts[name].append(df)
+        del price, demand, comp, block
+        if progress is not None:
+            progress(last_week - int(week_index[0]) + 1, len(week_index), "weeks", rows=n_rows)
+
+    if not stream and parts["price_weekly"]:
+        _flush_weekly(
+            {name: pd.concat(dfs, ignore_index=True) for name, dfs in parts.items()},
+            first=replace,
+        )
+    if n_rows:
+        for name in WEEKLY_TABLES:
+            create_indexes(name)
+    return stats, n_rows, sim_seconds, last_week
+
+
+def _report(n_rows: int, sim_seconds: float, workers: int, start_time: float) -> None:
+    elapsed = time.time() - start_time
+    logger.info(
+        "Generated %s panel rows with %d worker(s) at %s rows/sec per worker; "
+        "%.2fs wall time including writes",
+        f"{n_rows:,}",
+        workers,
+        f"{n_rows / max(sim_seconds, 1e-9):,.0f}",
+        elapsed,
+    )
+
+
+def _default_week_block(retailer: pd.DataFrame, sku_master: pd.DataFrame) -> int:
+    return int(
+        os.getenv(
+            "SYNTH_WEEK_BLOCK",
+            str(max(1, MAX_BLOCK_CELLS // max(1, len(retailer) * len(sku_master)))),
+        )
+    )
+
+
+def _write_state(
+    seed: int,
+    last_week: int,
+    brand_own: np.ndarray,
+    cross_matrix: np.ndarray,
+    stats: pd.DataFrame,
+    lineage: str,
+) -> None:
+    """Persist what :func:`append_weeks` needs to extend the panel later.
+
+    ``synth_state`` records the seed, the last generated week, the latent
+    brand elasticities and the panel ``lineage`` (the snapshot version of the
+    full generation, kept by appends so incremental model fits can tell an
+    extended panel from a new one); ``guardrail_stats`` holds the running
+    per-SKU price aggregates from which ``guardrails`` is derived.  Both are
+    written to the snapshot as well, so readers pinned to a version see the
+    state that matches its data.
+    """
+
+    state = pd.DataFrame(
+        [
+            {
+                "seed": seed,
+                "lineage": lineage,
+                "last_week": last_week,
+                "brand_own_json": json.dumps(brand_own.tolist()),
+                "cross_matrix_json": json.dumps(cross_matrix.tolist()),
+            }
+        ]
+    )
+    guardrails = _guardrails(stats["net_price_sum"], stats["net_price_count"])
     for name, df in {
-        "sku_master": sku_master,
-        "retailer": retailer,
-        "price_weekly": price_weekly,
-        "demand_weekly": demand_weekly,
-        "competitor_weekly": competitor_weekly,
-        "costs": costs,
+        "synth_state": state,
+        "guardrail_stats": stats.rename_axis("sku_id").reset_index(),
         "guardrails": guardrails,
     }.items():
         write_table(df, name)
         to_parquet(df, name)
 
-    # Refresh memoized tables used by simulators/optimizer so downstream API
-    # calls immediately reflect the newly generated dataset.
-    from .models.cache import invalidate_model_caches
 
-    invalidate_model_caches()
+def gen_weekly_data(
+    weeks: int | None = None,
+    n_per_brand: int | None = None,
+    retailers_per_combo: int | None = None,
+    max_minutes: int | None = None,
+    stream: bool | None = None,
+    week_block: int | None = None,
+    seed: int | None = None,
+    workers: int | None = None,
+    progress: Callable[..., None] | None = None,
+) -> bool:
+    """Generate synthetic weekly pricing and demand data.
+
+    Defaults are intentionally small so generation completes quickly for demos.
+    Values can be overridden with environment variables:
+      SYNTH_WEEKS, SYNTH_SKUS_PER_BRAND, SYNTH_RETAILERS_PER_COMBO, SYNTH_MAX_MINUTES,
+      SYNTH_STREAM, SYNTH_WEEK_BLOCK, SYNTH_SEED, SYNTH_WORKERS.
+
+    The panel is simulated in vectorized blocks of ``week_block`` weeks (by
+    default as many as fit in ``MAX_BLOCK_CELLS``); the time budget is checked
+    between blocks.  With ``stream`` enabled every block is flushed to SQLite
+    and to the week-partitioned parquet datasets as soon as it is simulated,
+    so peak memory is bounded by one block regardless of ``weeks``.
+
+    Every block draws from its own ``SeedSequence`` child (see ``_streams``),
+    which lets ``workers > 1`` simulate blocks in a process pool.  Results are
+    consumed in week order with a bounded number of blocks in flight and are
+    identical to a serial run for the same ``seed`` and ``week_block``.
+    ``progress`` receives per-block progress from background jobs.
+    """
+
+    weeks = weeks or int(os.getenv("SYNTH_WEEKS", "26"))
+    n_per_brand = n_per_brand or int(os.getenv("SYNTH_SKUS_PER_BRAND", "4"))
+    retailers_per_combo = retailers_per_combo or int(
+        os.getenv("SYNTH_RETAILERS_PER_COMBO", "1")
+    )
+    max_minutes = max_minutes or int(os.getenv("SYNTH_MAX_MINUTES", "5"))
+    if stream is None:
+        stream = os.getenv("SYNTH_STREAM", "0").lower() in ("1", "true", "yes")
+    seed = int(os.getenv("SYNTH_SEED", str(DEFAULT_SEED))) if seed is None else seed
+    workers = workers or int(os.getenv("SYNTH_WORKERS", "1"))
+    start_time = time.time()
+
+    streams = _streams(seed, weeks)
+    rng = np.random.default_rng(streams[0])
+    sku_master = make_sku_master(n_per_brand=n_per_brand, rng=rng)
+    retailer = make_retailers(retailers_per_combo=retailers_per_combo, rng=rng)
+
+    week_index = np.arange(1, weeks + 1, dtype=np.int64)
+
+    # brand elasticities (latent truth)
+    brand_own = -1.2 + 0.6 * rng.random(len(BRANDS))
+    cross_matrix = 0.15 * rng.random((len(BRANDS), len(BRANDS)))
+    np.fill_diagonal(cross_matrix, -0.2)
+
+    lp = base_prices(sku_master["pack_size_ml"].to_numpy(), sku_master["tier"].to_numpy())
+    costs = pd.DataFrame(
+        {
+            "sku_id": sku_master["sku_id"],
+            "cogs_per_unit": np.round(0.45 * lp, 2),
+            "logistics_per_unit": np.round(0.05 * lp, 2),
+        }
+    )
+
+    # All parquet output goes to a new snapshot that becomes visible to the
+    # simulators/optimizer in one step once generation has finished.
+    with new_snapshot() as version:
+        # persist dimensions up front; fact tables follow block by block
+        for name, df in {"sku_master": sku_master, "retailer": retailer, "costs": costs}.items():
+            write_table(df, name)
+            to_parquet(df, name)
+        for name in WEEKLY_TABLES:
+            reset_parquet_dataset(name)
+
+        stats, n_rows, sim_seconds, last_week = _run_blocks(
+            week_index,
+            sku_master,
+            retailer,
+            brand_own,
+            cross_matrix,
+            streams,
+            week_block or _default_week_block(retailer, sku_master),
+            workers,
+            start_time + max_minutes * 60,
+            stream=stream,
+            replace=True,
+            progress=progress,
+        )
+        _report(n_rows, sim_seconds, workers, start_time)
+        _write_state(seed, last_week, brand_own, cross_matrix, stats, lineage=version)
+
+    return True
+
+
+def append_weeks(
+    n_weeks: int = 1,
+    week_block: int | None = None,
+    workers: int | None = None,
+    progress: Callable[..., None] | None = None,
+) -> bool:
+    """Extend the existing panel by ``n_weeks`` new weeks.
+
+    Only the new weeks are simulated and appended to ``price_weekly``,
+    ``demand_weekly`` and ``competitor_weekly`` (plus their parquet
+    partitions).  Dimensions, costs and fitted elasticities are left alone and
+    ``guardrails`` is refreshed from the running aggregates in
+    ``guardrail_stats``.  New weeks draw from the same per-week seed streams as
+    a full generation.  The extended panel is published as a new snapshot
+    together with its SQLite rows; a failed or cancelled append leaves both
+    untouched.  Falls back to :func:`gen_weekly_data` when no previous
+    generation state exists.
+    """
+
+    from sqlalchemy import inspect
+
+    with read_connection() as con:
+        has_state = inspect(con).has_table("synth_state")
+    if not has_state:
+        return gen_weekly_data(progress=progress)
+
+    start_time = time.time()
+    workers = workers or int(os.getenv("SYNTH_WORKERS", "1"))
+    # Build on one snapshot: state, dimensions and aggregates must agree.
+    base = data_version()
+    state = read_table("synth_state", version=base).iloc[0]
+    sku_master = read_table("sku_master", version=base)
+    retailer = read_table("retailer", version=base)
+    prev = read_table("guardrail_stats", version=base).set_index("sku_id")
+
+    seed, last_week = int(state["seed"]), int(state["last_week"])
+    stored = max_week("price_weekly", base)
+    if stored != last_week:
+        # Never extend a panel whose state and fact tables disagree.
+        raise RuntimeError(
+            f"synth_state ends at week {last_week} but price_weekly at week {stored}; "
+            "regenerate the data"
+        )
+    brand_own = np.array(json.loads(state["brand_own_json"]))
+    cross_matrix = np.array(json.loads(state["cross_matrix_json"]))
+    week_index = np.arange(last_week + 1, last_week + n_weeks + 1, dtype=np.int64)
+
+    with new_snapshot(base=base) as version:
+        stats, n_rows, sim_seconds, last_week = _run_blocks(
+            week_index,
+            sku_master,
+            retailer,
+            brand_own,
+            cross_matrix,
+            _streams(seed, int(week_index[-1])),
+            week_block or _default_week_block(retailer, sku_master),
+            workers,
+            float("inf"),
+            stream=True,
+            replace=False,
+            progress=progress,
+        )
+        _report(n_rows, sim_seconds, workers, start_time)
+        _write_state(
+            seed,
+            last_week,
+            brand_own,
+            cross_matrix,
+            prev.add(stats, fill_value=0.0),
+            # States written before lineages existed start a new one.
+            lineage=str(state["lineage"]) if "lineage" in state else version,
+        )
 
     return True
 
 
 if __name__ == "__main__":
     gen_weekly_data()
-
@@ -1,39 +1,760 @@
-from ..data_paths import PARQUET, SQLITE
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from ..data_paths import CACHE, SQLITE
+from .snapshots import data_version, new_snapshot, snapshot_root
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
+
+try:
+    import duckdb  # optional analytical engine for aggregate pushdown
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
 
 _engine = None
+_writer = None
+_engine_lock = threading.Lock()
+_write_lock = threading.Lock()
+# Writer connection of the snapshot this thread is staging, if any.
+_staged_sql = threading.local()
+
+# Connection pragmas: WAL lets readers keep querying while a writer commits,
+# NORMAL sync is durable across app crashes in WAL mode, and a larger page
+# cache / in-memory temp store keep bulk loads and index builds off disk.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=30000",
+)
+
+# Rows per executemany() batch in write_table.
+WRITE_CHUNK_ROWS = 100_000
+
+# Bounded read pool; requests beyond DB_POOL_SIZE wait up to DB_POOL_TIMEOUT
+# seconds for a connection instead of opening new file handles.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def _configure_sqlite(eng, begin: str = "BEGIN") -> None:
+    """Apply pragmas and real transaction control to every pooled connection.
+
+    pysqlite only opens transactions implicitly before DML, so a
+    ``DROP``/``CREATE`` issued by :func:`write_table` would otherwise
+    autocommit.  Following the SQLAlchemy recipe we disable the driver's
+    handling and emit ``begin`` ourselves whenever SQLAlchemy starts one.
+    """
+
+    @event.listens_for(eng, "connect")
+    def _on_connect(dbapi_con, _record):
+        dbapi_con.isolation_level = None
+        cur = dbapi_con.cursor()
+        for pragma in SQLITE_PRAGMAS:
+            cur.execute(pragma)
+        cur.close()
+
+    @event.listens_for(eng, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql(begin)
 
 
 def engine():
+    """Shared read engine backed by a bounded connection pool."""
     global _engine
     if _engine is None:
-        _engine = create_engine(f"sqlite:///{SQLITE}")
+        with _engine_lock:
+            if _engine is None:
+                eng = create_engine(
+                    f"sqlite:///{SQLITE}",
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=0,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                )
+                _configure_sqlite(eng)
+                _engine = eng
     return _engine
 
 
+def _writer_engine():
+    """Engine holding the single writer connection (``BEGIN IMMEDIATE``)."""
+    global _writer
+    if _writer is None:
+        with _engine_lock:
+            if _writer is None:
+                eng = create_engine(f"sqlite:///{SQLITE}", pool_size=1, max_overflow=0)
+                _configure_sqlite(eng, begin="BEGIN IMMEDIATE")
+                _writer = eng
+    return _writer
+
+
+class PoolMetrics:
+    """Thread-safe counters for connection checkout latency."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats = {
+            kind: {"checkouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+            for kind in ("read", "write")
+        }
+
+    def record(self, kind: str, waited: float) -> None:
+        with self._lock:
+            stats = self._stats[kind]
+            stats["checkouts"] += 1
+            stats["wait_seconds_total"] += waited
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = {kind: dict(stats) for kind, stats in self._stats.items()}
+        for stats in out.values():
+            n = stats["checkouts"]
+            stats["wait_seconds_avg"] = stats["wait_seconds_total"] / n if n else 0.0
+        return out
+
+
+_metrics = PoolMetrics()
+
+
+@contextmanager
+def read_connection():
+    """Check out a pooled read connection and return it when done.
+
+    All statements inside the block run in one read transaction, i.e. against
+    one consistent WAL snapshot, which is rolled back on exit.  A thread
+    staging a snapshot reads through its open write transaction instead, so
+    it sees its own uncommitted writes.
+    """
+
+    staged = getattr(_staged_sql, "con", None)
+    if staged is not None:
+        yield staged
+        return
+    t0 = time.perf_counter()
+    with engine().connect() as con:
+        _metrics.record("read", time.perf_counter() - t0)
+        yield con
+
+
+@contextmanager
+def write_connection():
+    """Serialize writers onto the single writer connection.
+
+    The block runs in one ``BEGIN IMMEDIATE`` transaction that commits on
+    success and rolls back on error.  Inside :func:`staged_transaction` the
+    block joins the staged transaction instead.
+    """
+
+    staged = getattr(_staged_sql, "con", None)
+    if staged is not None:
+        yield staged
+        return
+    t0 = time.perf_counter()
+    with _write_lock:
+        with _writer_engine().begin() as con:
+            _metrics.record("write", time.perf_counter() - t0)
+            yield con
+
+
+@contextmanager
+def staged_transaction():
+    """Run every SQLite write of this thread in one transaction.
+
+    Used by :func:`~app.utils.snapshots.new_snapshot` so the SQLite copy of
+    a refresh commits together with its parquet snapshot and is rolled back
+    when the refresh fails or is cancelled.  Nested blocks join the outer one.
+    """
+
+    if getattr(_staged_sql, "con", None) is not None:
+        yield
+        return
+    with write_connection() as con:
+        _staged_sql.con = con
+        try:
+            yield
+        finally:
+            _staged_sql.con = None
+
+
+def pool_metrics() -> dict:
+    """Checkout wait statistics plus the current read pool occupancy."""
+
+    out = _metrics.snapshot()
+    pool = engine().pool
+    out["read"].update(
+        {"pool_size": pool.size(), "checked_out": pool.checkedout()}
+    )
+    return out
+
+
+def _replace_file(path, write: Callable[[str], None]) -> None:
+    """Write via ``write(tmp)`` and rename over ``path``.
+
+    Snapshot files are hard links shared with older snapshots, so they must
+    be replaced rather than rewritten in place.
+    """
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    write(str(tmp))
+    os.replace(tmp, path)
+
+
 def to_parquet(df: pd.DataFrame, name: str) -> str:
     """Persist a DataFrame to parquet when possible.
 
     If neither ``pyarrow`` nor ``fastparquet`` is available, fall back to a
     lightweight CSV dump so data generation still succeeds without optional
-    dependencies.  Returns the path of the written file.
+    dependencies.  The file lands in the snapshot being staged (see
+    :func:`~app.utils.snapshots.new_snapshot`); outside one, the write is
+    published as a snapshot of its own.  Returns the path of the written file.
     """
 
-    p = PARQUET / f"{name}.parquet"
-    try:
-        import pyarrow as pa  # type: ignore
-        import pyarrow.parquet as pq  # type: ignore
+    with new_snapshot():
+        root = snapshot_root()
+        p = root / f"{name}.parquet"
+        try:
+            import pyarrow as pa  # type: ignore
+            import pyarrow.parquet as pq  # type: ignore
+
+            table = pa.Table.from_pandas(df)
+            _replace_file(p, lambda tmp: pq.write_table(table, tmp))
+            return str(p)
+        except Exception:
+            # ``df.to_parquet`` would still require an engine; use CSV instead.
+            csv_path = root / f"{name}.csv"
+            _replace_file(csv_path, lambda tmp: df.to_csv(tmp, index=False))
+            return str(csv_path)
+
+
+def reset_parquet_dataset(name: str) -> None:
+    """Remove every file previously written for ``name`` in the staged snapshot."""
+
+    with new_snapshot():
+        root = snapshot_root()
+        shutil.rmtree(root / name, ignore_errors=True)
+        for suffix in (".parquet", ".csv"):
+            (root / f"{name}{suffix}").unlink(missing_ok=True)
+
+
+def to_parquet_partitioned(df: pd.DataFrame, name: str, partition_col: str = "week") -> str:
+    """Write ``df`` as a hive-partitioned dataset ``<name>/<col>=<value>/``.
+
+    Each partition is written to its own ``part.parquet`` (or ``part.csv``
+    when no parquet engine is installed), replacing any previous file for the
+    same partition.  Partitions not present in ``df`` are left untouched so
+    callers can flush a large table one block at a time.  Like
+    :func:`to_parquet` this writes into the staged snapshot.  Returns the
+    dataset directory.
+    """
+
+    with new_snapshot():
+        root = snapshot_root() / name
+        for value, part in df.groupby(partition_col, sort=True):
+            part_dir = root / f"{partition_col}={value}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            part = part.drop(columns=[partition_col])
+            try:
+                import pyarrow as pa  # type: ignore
+                import pyarrow.parquet as pq  # type: ignore
+
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                _replace_file(part_dir / "part.parquet", lambda tmp: pq.write_table(table, tmp))
+            except Exception:
+                _replace_file(part_dir / "part.csv", lambda tmp: part.to_csv(tmp, index=False))
+        return str(root)
+
+
+def to_npz(arrays: dict[str, np.ndarray], name: str) -> str:
+    """Persist numeric arrays as ``<name>.npz`` in the staged snapshot.
+
+    Used for model matrices that are consumed whole and would otherwise be
+    serialised per row.  Returns the path of the written file.
+    """
+
+    with new_snapshot():
+        p = snapshot_root() / f"{name}.npz"
+        # ``np.savez`` appends ``.npz`` to bare paths; hand it a file object.
+        def write(tmp: str) -> None:
+            with open(tmp, "wb") as fh:
+                np.savez(fh, **arrays)
 
-        table = pa.Table.from_pandas(df)
-        pq.write_table(table, p)
+        _replace_file(p, write)
         return str(p)
-    except Exception:
-        # ``df.to_parquet`` would still require an engine; use CSV instead.
-        csv_path = PARQUET / f"{name}.csv"
-        df.to_csv(csv_path, index=False)
-        return str(csv_path)
 
 
-def write_table(df: pd.DataFrame, name: str, if_exists: str = "replace") -> None:
-    df.to_sql(name, engine(), if_exists=if_exists, index=False)
+def read_npz(name: str, version: str | None = None) -> dict[str, np.ndarray] | None:
+    """Load the arrays written by :func:`to_npz`, or ``None`` if absent."""
+
+    p = snapshot_root(version) / f"{name}.npz"
+    try:
+        with np.load(p, allow_pickle=False) as data:
+            return {key: data[key] for key in data.files}
+    except FileNotFoundError:
+        return None
+
+
+def _index_statements(name: str, columns: list[str]) -> list[str]:
+    """Indexes for the lookups the models run against ``name``.
+
+    Weekly tables get a composite ``(week, retailer_id, sku_id|brand)`` index
+    so recent-window range scans stop being full table scans, and anything
+    keyed by SKU gets a ``sku_id`` index for per-SKU joins.
+    """
+
+    stmts = []
+    if "week" in columns:
+        keys = [c for c in ("week", "retailer_id", "sku_id", "brand") if c in columns]
+        stmts.append(
+            f'CREATE INDEX IF NOT EXISTS "ix_{name}_week" ON "{name}" ({", ".join(keys)})'
+        )
+    if "sku_id" in columns:
+        stmts.append(f'CREATE INDEX IF NOT EXISTS "ix_{name}_sku" ON "{name}" (sku_id)')
+    return stmts
+
+
+def create_indexes(name: str) -> None:
+    """Build the :func:`_index_statements` indexes for an existing table."""
+
+    with write_connection() as con:
+        cur = con.connection.cursor()
+        cur.execute(f'SELECT * FROM "{name}" LIMIT 0')
+        for stmt in _index_statements(name, [d[0] for d in cur.description]):
+            cur.execute(stmt)
+        cur.close()
+
+
+def write_table(
+    df: pd.DataFrame,
+    name: str,
+    if_exists: str = "replace",
+    chunksize: int | None = None,
+    index: bool = True,
+) -> None:
+    """Bulk-load ``df`` into SQLite inside a single transaction.
+
+    ``replace`` drops and recreates the table, ``append`` creates it only if
+    missing.  Rows are inserted with ``executemany`` in batches of
+    ``chunksize`` (default ``WRITE_CHUNK_ROWS``) and, with ``index``, indexes
+    are (re)built after the load.  Callers loading a table in several blocks
+    pass ``index=False`` and call :func:`create_indexes` after the last one so
+    later blocks do not insert into indexed tables.  Because the whole write
+    is one transaction on a WAL database, readers keep seeing the previous
+    table until it commits.
+    """
+
+    chunksize = chunksize or WRITE_CHUNK_ROWS
+    columns = [str(c) for c in df.columns]
+    cols = ", ".join(f'"{c}"' for c in columns)
+    insert = f'INSERT INTO "{name}" ({cols}) VALUES ({", ".join("?" * len(columns))})'
+    create = pd.io.sql.get_schema(df, name)
+    if if_exists == "append":
+        create = create.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1)
+
+    with write_connection() as con:
+        cur = con.connection.cursor()
+        if if_exists == "replace":
+            cur.execute(f'DROP TABLE IF EXISTS "{name}"')
+        cur.execute(create)
+        for lo in range(0, len(df), chunksize):
+            part = df.iloc[lo : lo + chunksize]
+            # Column-wise tolist() yields native Python scalars far faster
+            # than itertuples, and NaN binds as NULL.
+            cur.executemany(insert, zip(*(part[c].tolist() for c in part.columns)))
+        if index:
+            for stmt in _index_statements(name, columns):
+                cur.execute(stmt)
+        cur.close()
+
+
+def _parquet_source(name: str, version: str | None = None):
+    """Return a ``pyarrow.dataset`` for ``name`` or ``None`` if unavailable.
+
+    Week-partitioned tables live in ``<snapshot>/<name>/week=N/``; dimension
+    tables are single ``<name>.parquet`` files.  CSV fallbacks written without
+    a parquet engine are not considered so callers drop back to SQLite.
+    """
+
+    try:
+        import pyarrow.dataset as ds  # type: ignore
+    except ImportError:
+        return None
+    base = snapshot_root(version)
+    root = base / name
+    if root.is_dir() and any(root.glob("*/*.parquet")):
+        return ds.dataset(root, format="parquet", partitioning="hive")
+    flat = base / f"{name}.parquet"
+    if flat.exists():
+        return ds.dataset(flat, format="parquet")
+    return None
+
+
+def _week_bound(name: str, version: str | None, agg: str) -> int | None:
+    root = snapshot_root(version) / name
+    if root.is_dir():
+        weeks = [int(p.name.split("=", 1)[1]) for p in root.glob("week=*") if any(p.iterdir())]
+        if weeks:
+            return max(weeks) if agg == "max" else min(weeks)
+    with read_connection() as con:
+        if not inspect(con).has_table(name):
+            return None
+        w = pd.read_sql(f"select {agg}(week) as w from {name}", con).iloc[0]["w"]
+    return None if pd.isna(w) else int(w)
+
+
+def max_week(name: str = "price_weekly", version: str | None = None) -> int | None:
+    """Latest week stored for a weekly table in snapshot ``version``.
+
+    Read from the partition directory names when the parquet dataset exists so
+    no data files need to be opened.  ``None`` when the table is missing or
+    empty.
+    """
+
+    return _week_bound(name, version, "max")
+
+
+def min_week(name: str = "price_weekly", version: str | None = None) -> int | None:
+    """Earliest week stored for a weekly table; see :func:`max_week`."""
+
+    return _week_bound(name, version, "min")
+
+
+def table_columns(name: str, version: str | None = None) -> list[str]:
+    """Column names of ``name`` in snapshot ``version`` (empty if missing).
+
+    Lets callers project optional columns that tables written by older
+    releases may lack.
+    """
+
+    source = _parquet_source(name, version)
+    if source is not None:
+        return list(source.schema.names)
+    with read_connection() as con:
+        if not inspect(con).has_table(name):
+            return []
+        return [c["name"] for c in inspect(con).get_columns(name)]
+
+
+def read_table(
+    name: str,
+    columns: list[str] | None = None,
+    min_week: int | None = None,
+    max_week: int | None = None,
+    limit: int | None = None,
+    version: str | None = None,
+) -> pd.DataFrame:
+    """Load a table, preferring the columnar parquet copy over SQLite.
+
+    ``columns`` is pushed down as a projection and ``min_week``/``max_week``
+    as a predicate, so partitions outside the week range are never opened.
+    Falls back to an equivalent ``select`` against SQLite when pyarrow or the
+    parquet dataset is missing (e.g. state tables only written by
+    :func:`write_table`).  ``version`` pins the snapshot to read (default:
+    the current one).
+    """
+
+    source = _parquet_source(name, version)
+    if source is not None:
+        import pyarrow.dataset as ds  # type: ignore
+
+        cond = None
+        if min_week is not None:
+            cond = ds.field("week") >= int(min_week)
+        if max_week is not None:
+            upper = ds.field("week") <= int(max_week)
+            cond = upper if cond is None else cond & upper
+        if columns is None:
+            # Hive partition keys are appended last; restore SQL column order.
+            names = source.schema.names
+            columns = [c for c in names if c == "week"] + [c for c in names if c != "week"]
+        if limit is not None:
+            table = source.head(limit, columns=columns, filter=cond)
+        else:
+            table = source.to_table(columns=columns, filter=cond)
+        return table.to_pandas()
+
+    where = []
+    if min_week is not None:
+        where.append(f"week >= {int(min_week)}")
+    if max_week is not None:
+        where.append(f"week <= {int(max_week)}")
+    sql = f"select {', '.join(columns) if columns else '*'} from {name}"
+    if where:
+        sql += " where " + " and ".join(where)
+    if limit is not None:
+        sql += f" limit {int(limit)}"
+    with read_connection() as con:
+        return pd.read_sql(sql, con)
+
+
+def _parquet_glob(name: str, version: str | None = None) -> str | None:
+    """Glob DuckDB can scan for ``name``, if a parquet copy exists."""
+
+    base = snapshot_root(version)
+    root = base / name
+    if root.is_dir() and any(root.glob("*/*.parquet")):
+        return str(root / "*" / "*.parquet")
+    flat = base / f"{name}.parquet"
+    return str(flat) if flat.exists() else None
+
+
+def query_parquet(
+    sql: str, tables: list[str], params: list | None = None, version: str | None = None
+) -> pd.DataFrame | None:
+    """Run ``sql`` with DuckDB directly over the parquet copies of ``tables``.
+
+    Each table is exposed as a view of the same name (hive partition columns
+    included), so only the aggregated result is materialized in pandas.
+    Returns ``None`` when DuckDB is not installed, disabled with
+    ``ANALYTICS_BACKEND=pandas``, or a table has no parquet copy; callers then
+    compute the same result with pandas.
+    """
+
+    if not DUCKDB_AVAILABLE or os.getenv("ANALYTICS_BACKEND", "duckdb") != "duckdb":
+        return None
+    globs = {t: _parquet_glob(t, version) for t in tables}
+    if not all(globs.values()):
+        return None
+    con = duckdb.connect()
+    try:
+        for t, path in globs.items():
+            con.execute(
+                f"create view {t} as select * from read_parquet('{path}', hive_partitioning = true)"
+            )
+        return con.execute(sql, params or []).df()
+    finally:
+        con.close()
+
+
+def recent_sku_means(lookback: int = 8, version: str | None = None) -> pd.DataFrame:
+    """Per-SKU mean ``net_price`` (``p0``) and ``units`` (``u0``).
+
+    Averages cover weeks ``>= max_week - lookback``, the baseline window used
+    by the optimizer and the plan scorer.  SKUs missing from one of the tables
+    get ``NaN`` for that measure; without price data the frame is empty.
+    """
+
+    last = max_week("price_weekly", version)
+    if last is None:
+        return pd.DataFrame(
+            {
+                "sku_id": pd.Series(dtype="int64"),
+                "p0": pd.Series(dtype="float64"),
+                "u0": pd.Series(dtype="float64"),
+            }
+        )
+    cutoff = last - lookback
+    out = query_parquet(
+        """
+        select coalesce(p.sku_id, u.sku_id) as sku_id, p.p0, u.u0
+        from (select sku_id, avg(net_price) as p0 from price_weekly
+              where week >= ? group by sku_id) p
+        full outer join
+             (select sku_id, avg(units) as u0 from demand_weekly
+              where week >= ? group by sku_id) u
+        on p.sku_id = u.sku_id
+        order by sku_id
+        """,
+        ["price_weekly", "demand_weekly"],
+        [cutoff, cutoff],
+        version,
+    )
+    if out is not None:
+        return out
+    price = read_table("price_weekly", ["sku_id", "net_price"], min_week=cutoff, version=version)
+    demand = read_table("demand_weekly", ["sku_id", "units"], min_week=cutoff, version=version)
+    p = price.groupby("sku_id").net_price.mean().rename("p0")
+    u = demand.groupby("sku_id").units.mean().rename("u0")
+    return pd.concat([p, u], axis=1).rename_axis("sku_id").reset_index()
+
+
+def competitor_brands(version: str | None = None) -> list[str]:
+    """Sorted distinct brands of ``competitor_weekly``."""
+
+    out = query_parquet(
+        "select distinct brand from competitor_weekly order by brand",
+        ["competitor_weekly"],
+        version=version,
+    )
+    if out is not None:
+        return out.brand.tolist()
+    return sorted(read_table("competitor_weekly", ["brand"], version=version).brand.unique())
+
+
+def competitor_price_wide(
+    version: str | None = None,
+    min_week: int | None = None,
+    max_week: int | None = None,
+    brands: list[str] | None = None,
+) -> pd.DataFrame:
+    """Mean competitor ``avg_price`` per (week, retailer) with one column per brand.
+
+    ``min_week``/``max_week`` restrict the rows; the brand columns always
+    cover ``brands`` (default: every brand in the table, see
+    :func:`competitor_brands`) so slices of the panel line up.  Callers
+    reading many slices pass the brand list once.
+    """
+
+    if brands is None:
+        brands = competitor_brands(version)
+    cols = ", ".join(f"avg(avg_price) filter (where brand = ?) as \"{b}\"" for b in brands)
+    bounds = [(">=", min_week), ("<=", max_week)]
+    where = " and ".join(f"week {op} ?" for op, w in bounds if w is not None)
+    wide = query_parquet(
+        f"select week, retailer_id, {cols} from competitor_weekly "
+        + (f"where {where} " if where else "")
+        + "group by week, retailer_id order by week, retailer_id",
+        ["competitor_weekly"],
+        list(brands) + [int(w) for _op, w in bounds if w is not None],
+        version,
+    )
+    if wide is not None:
+        return wide
+    comp = read_table(
+        "competitor_weekly",
+        ["week", "retailer_id", "brand", "avg_price"],
+        min_week=min_week,
+        max_week=max_week,
+        version=version,
+    )
+    wide = comp.pivot_table(index=["week", "retailer_id"], columns="brand", values="avg_price")
+    return wide.reindex(columns=list(brands)).reset_index().rename_axis(columns=None)
+
+
+# String attributes with a handful of distinct values; stored as categoricals.
+CATEGORICAL_COLUMNS = (
+    "brand",
+    "subcat",
+    "pack_type",
+    "tier",
+    "flavor",
+    "region",
+    "channel",
+    "retailer",
+)
+
+
+# Prices and costs end up in API responses and revenue/margin totals, where
+# float32 rounding would show (0.88 -> 0.8799999952); never downcast them.
+MONEY_COLUMNS = (
+    "list_price",
+    "net_price",
+    "discount_spend",
+    "revenue",
+    "avg_price",
+    "cogs_per_unit",
+    "logistics_per_unit",
+    "cost_per_unit",
+    "min_price",
+    "max_price",
+)
+
+
+def compact_dtypes(df: pd.DataFrame, floats: bool = True) -> pd.DataFrame:
+    """Return ``df`` with a compact schema for long-lived caches.
+
+    Known string attributes become categoricals, integer ids/weeks/flags are
+    downcast (never below int16 so flag sums cannot overflow) and, with
+    ``floats``, float64 measures other than ``MONEY_COLUMNS`` become float32.
+    Callers that aggregate float32 columns over many rows should upcast first.
+    """
+
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if col in CATEGORICAL_COLUMNS and s.dtype == object:
+            s = s.astype("category")
+        elif pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            s = pd.to_numeric(s, downcast="integer")
+            if s.dtype.itemsize < 2:
+                s = s.astype("int16")
+        elif floats and s.dtype == "float64" and col not in MONEY_COLUMNS:
+            s = s.astype("float32")
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+# Per-process memo of mapped frames: name -> {key: frame}, newest last.  Two
+# keys are kept so requests still pinned to the previous snapshot version do
+# not rebuild while new requests move to the current one.
+_shared_frames: dict[str, dict[str, pd.DataFrame]] = {}
+_shared_lock = threading.Lock()
+SHARED_FRAME_VERSIONS = 2
+
+
+def _read_ipc(path) -> pd.DataFrame:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.ipc as ipc  # type: ignore
+
+    table = ipc.open_file(pa.memory_map(str(path))).read_all()
+    # split_blocks keeps numeric columns as zero-copy views of the mapping.
+    return table.to_pandas(split_blocks=True)
+
+
+def _write_ipc(df: pd.DataFrame, path) -> None:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.ipc as ipc  # type: ignore
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def shared_frame(
+    name: str,
+    key: str,
+    build: Callable[[], pd.DataFrame],
+    post: Callable[[pd.DataFrame], pd.DataFrame] | None = None,
+) -> pd.DataFrame:
+    """Return frame ``name`` for data version ``key``, shared across processes.
+
+    The first process to need a version builds it and persists it as an
+    uncompressed Arrow IPC file under ``data_paths.CACHE``; every process then
+    memory-maps that file, so numeric columns of all workers point at the
+    same physical pages and a cold worker skips the build entirely.  ``post``
+    runs once per process on the mapped frame for derived columns that cannot
+    be stored in Arrow.  Without pyarrow the frame is simply built in-process.
+
+    The returned frame may be backed by read-only memory; copy before mutating.
+    """
+
+    memo = _shared_frames.setdefault(name, {})
+    if key in memo:
+        return memo[key]
+    with _shared_lock:
+        if key in memo:
+            return memo[key]
+        path = CACHE / f"{name}-{key}.arrow"
+        try:
+            if path.exists():
+                df = _read_ipc(path)
+            else:
+                _write_ipc(build(), path)
+                df = _read_ipc(path)
+                files = sorted(CACHE.glob(f"{name}-*.arrow"), key=lambda p: p.stat().st_mtime_ns)
+                for stale in files[:-SHARED_FRAME_VERSIONS]:
+                    stale.unlink(missing_ok=True)
+        except ImportError:
+            df = build()
+        if post is not None:
+            df = post(df)
+        memo[key] = df
+        while len(memo) > SHARED_FRAME_VERSIONS:
+            memo.pop(next(iter(memo)))
+    return df
+
+
+def clear_shared_frames() -> None:
+    """Drop this process's references to memory-mapped frames."""
+
+    _shared_frames.clear()
@@ -0,0 +1,234 @@
+"""Immutable, versioned snapshots of the parquet data files.
+
+Every data refresh (synthetic generation, appending weeks, retraining
+elasticities) stages its parquet writes in a new snapshot directory
+``SNAPSHOTS/<version>/`` and publishes it by atomically replacing the
+``CURRENT`` pointer file.  Files carried over from the previous snapshot are
+hard links, and writers always replace files instead of rewriting them, so a
+published snapshot never changes.  Readers resolve a version once and keep
+reading it for the rest of the request, and derived caches are keyed by the
+version so entries for superseded snapshots simply age out.  Caches that only
+depend on a few tables (dimensions, fitted models) are keyed by
+:func:`table_version` instead, so appending weeks does not rebuild them.
+
+Only the newest ``SNAPSHOT_KEEP`` published snapshots are kept on disk.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+from ..data_paths import PARQUET, SNAPSHOTS
+
+CURRENT = SNAPSHOTS / "CURRENT"
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+
+# Held for the whole lifetime of a staged snapshot so concurrent writers
+# cannot both branch from the same parent and lose updates: the thread lock
+# covers this process, a ``flock`` on WRITER_LOCK the other workers.
+WRITER_LOCK = SNAPSHOTS / ".writer.lock"
+_writer_lock = threading.RLock()
+_staging = threading.local()
+
+
+class StaleSnapshotError(RuntimeError):
+    """A writer's base snapshot was superseded before it could publish."""
+
+
+def current_version() -> str | None:
+    """Version of the published snapshot, or ``None`` before the first one."""
+
+    try:
+        return CURRENT.read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def data_version() -> str:
+    """Cache key for the data currently visible to readers.
+
+    Inside :func:`new_snapshot` this is the version being staged so a writer
+    reads its own writes.
+    """
+
+    staged = getattr(_staging, "version", None)
+    return staged or current_version() or "0"
+
+
+def snapshot_root(version: str | None = None) -> Path:
+    """Directory holding the parquet files of ``version`` (default: current).
+
+    Falls back to the flat ``PARQUET`` layout written before snapshots existed.
+    """
+
+    if version is None:
+        version = getattr(_staging, "version", None) or current_version()
+    if version is None or version == "0":
+        return PARQUET
+    return SNAPSHOTS / version
+
+
+def table_version(names, version: str | None = None) -> str:
+    """Token identifying the files behind tables ``names`` in ``version``.
+
+    Files carried over into a new snapshot are hard links and rewritten files
+    are always replaced, so the token stays the same across snapshots until
+    one of the tables is written again.
+    """
+
+    root = snapshot_root(version)
+    parts = []
+    for name in names:
+        for suffix in (".parquet", ".npz", ".csv"):
+            try:
+                st = (root / f"{name}{suffix}").stat()
+            except FileNotFoundError:
+                continue
+            parts.append(f"{name}{suffix}:{st.st_ino}:{st.st_mtime_ns}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def cached_by_tables(*names: str, maxsize: int = 2):
+    """Memoize ``fn(version)`` by :func:`table_version` of ``names``.
+
+    For derived data that only depends on ``names``: snapshots that share
+    those files share one entry.  Like ``lru_cache`` the wrapper exposes
+    ``cache_clear``.
+    """
+
+    def decorate(fn: Callable[[str], object]):
+        memo: OrderedDict[str, object] = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def wrapper(version: str):
+            key = table_version(names, version)
+            with lock:
+                if key in memo:
+                    memo.move_to_end(key)
+                    return memo[key]
+            value = fn(version)
+            with lock:
+                memo[key] = value
+                while len(memo) > maxsize:
+                    memo.popitem(last=False)
+            return value
+
+        wrapper.cache_clear = memo.clear
+        return wrapper
+
+    return decorate
+
+
+def _new_version() -> str:
+    # Fixed-width nanosecond timestamps sort lexicographically by age.
+    return f"{time.time_ns():020d}"
+
+
+def _seed(root: Path, parent: str | None) -> None:
+    """Populate ``root`` with hard links to every file of ``parent``."""
+
+    if parent is not None:
+        shutil.copytree(SNAPSHOTS / parent, root, copy_function=os.link)
+        return
+    root.mkdir(parents=True)
+    # First snapshot: adopt files from the legacy flat layout.
+    for src in PARQUET.iterdir():
+        if src == SNAPSHOTS:
+            continue
+        if src.is_dir():
+            shutil.copytree(src, root / src.name, copy_function=os.link)
+        else:
+            os.link(src, root / src.name)
+
+
+@contextmanager
+def _exclusive():
+    with _writer_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(WRITER_LOCK, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _publish(version: str) -> None:
+    tmp = CURRENT.with_name(f"CURRENT.{os.getpid()}.tmp")
+    tmp.write_text(version)
+    os.replace(tmp, CURRENT)
+
+
+def _collect_garbage(current: str) -> None:
+    """Delete published snapshots older than the newest ``SNAPSHOT_KEEP``.
+
+    Directories newer than ``current`` may still be staged by another process
+    and are left alone.
+    """
+
+    published = sorted(
+        p.name for p in SNAPSHOTS.iterdir() if p.is_dir() and p.name <= current
+    )
+    for old in published[: -max(SNAPSHOT_KEEP, 1)]:
+        shutil.rmtree(SNAPSHOTS / old, ignore_errors=True)
+
+
+@contextmanager
+def new_snapshot(base: str | None = None):
+    """Stage parquet writes in a new snapshot and publish it on success.
+
+    Writes made by this thread through :mod:`app.utils.io` inside the block go
+    to the staged copy; other readers keep seeing the previous version until
+    the block exits, at which point the new version becomes current in one
+    atomic rename.  SQLite writes made in the block share one transaction
+    (see :func:`~app.utils.io.staged_transaction`) that commits just before
+    the snapshot is published.  On error both are discarded.  Nested blocks
+    join the outer snapshot.  Yields the staged version.
+
+    Writers that computed their tables from an earlier :func:`data_version`
+    pass it as ``base``; if another writer has published since, the block
+    raises :class:`StaleSnapshotError` instead of mixing the two.
+    """
+
+    from .io import staged_transaction
+
+    staged = getattr(_staging, "version", None)
+    if staged is not None:
+        yield staged
+        return
+    with _exclusive():
+        parent = current_version()
+        if base is not None and base != (parent or "0"):
+            raise StaleSnapshotError(
+                f"data changed while this job ran (read {base}, now {parent}); run it again"
+            )
+        version = _new_version()
+        root = SNAPSHOTS / version
+        _seed(root, parent)
+        _staging.version = version
+        try:
+            with staged_transaction():
+                yield version
+        except BaseException:
+            shutil.rmtree(root, ignore_errors=True)
+            raise
+        finally:
+            _staging.version = None
+        _publish(version)
+        _collect_garbage(version)
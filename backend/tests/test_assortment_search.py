@@ -0,0 +1,98 @@
+import itertools
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.main import app
+
+
+def _plan_margin(agg, skus):
+    from app.models.assortment import DelistPlan
+
+    plan = DelistPlan(agg)
+    for sku in skus:
+        plan.add(sku)
+    return plan.totals()[2]
+
+
+def test_incremental_updates_match_rebuilt_plans():
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.assortment import DelistPlan, _aggregates
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    agg = _aggregates(data_version())
+    skus = sorted(agg.units)[:8]
+    plan = DelistPlan(agg)
+    for sku in skus[:4]:
+        expected = _plan_margin(agg, sorted(plan.members | {sku}))
+        predicted = plan.totals()[2] + plan.delta_add(sku)[2]
+        assert abs(predicted - expected) < 1e-6
+        plan.add(sku)
+    plan.remove(skus[1])
+    assert abs(plan.totals()[2] - _plan_margin(agg, [skus[0], skus[2], skus[3]])) < 1e-6
+
+
+def test_plan_applies_delist_transfer_floor():
+    from app.models.assortment import DelistPlan, _Aggregates
+
+    agg = _Aggregates.__new__(_Aggregates)
+    agg.units = {1: 100.0, 2: 10.0, 3: 30.0, 4: 60.0}
+    agg.price = {1: 1.0, 2: 2.0, 3: 3.0, 4: 4.0}
+    agg.margin = {1: 0.5, 2: 1.0, 3: 1.0, 4: 2.0}
+    agg.ranked = {2: [(3, 0.6)]}  # SKU 1 has no substitutes
+    agg.totals = (200.0, 450.0, 210.0)
+
+    plan = DelistPlan(agg)
+    plan.add(1)
+    # Nothing routed: 75 units spread over SKUs 2-4 by units.
+    units, revenue, margin = plan.totals()
+    assert abs(units - (75 - 100)) < 1e-9
+    assert abs(revenue - (75 * 350 / 100 - 100)) < 1e-9
+    assert abs(margin - (75 * 160 / 100 - 50)) < 1e-9
+
+    before = plan.totals()
+    predicted = [b + d for b, d in zip(before, plan.delta_add(2))]
+    plan.add(2)
+    # 10 of 110 lost units routed, below the 70% floor: scaled to 82.5.
+    units, revenue, margin = plan.totals()
+    assert abs(units - (82.5 - 110)) < 1e-9
+    assert abs(revenue - (82.5 * 3 - 120)) < 1e-9
+    assert abs(margin - (82.5 * 1 - 60)) < 1e-9
+    assert all(abs(p - t) < 1e-9 for p, t in zip(predicted, plan.totals()))
+
+
+def test_search_respects_constraints_and_finds_best_pair(monkeypatch):
+    from app.bootstrap import bootstrap_if_needed
+    from app.models import assortment
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    agg = assortment._aggregates(data_version())
+    must = sorted(agg.units)[0]
+    monkeypatch.setattr(agg, "must_stock", {must})
+
+    result = assortment.search_delist_sets(max_skus=2, top=3)
+    best = result["best"][0]
+    assert len(best["sku_ids"]) == 2
+    assert all(must not in s["sku_ids"] for s in result["best"] + result["path"])
+    allowed = [s for s in agg.units if s != must]
+    exhaustive = max(_plan_margin(agg, pair) for pair in itertools.combinations(allowed, 2))
+    assert abs(best["margin_change"] - exhaustive) < 1e-6
+
+    cap = 1.5 * max(agg.share(s) for s in allowed)
+    capped = assortment.search_delist_sets(max_skus=4, max_total_share=cap)
+    assert all(s["delisted_share"] <= cap + 1e-9 for s in capped["best"] + capped["path"])
+
+
+def test_assortment_search_endpoint():
+    client = TestClient(app)
+    resp = client.post("/assortment/search", params={"max_skus": 3, "top": 2})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert len(body["path"]) == 3
+    assert [len(p["sku_ids"]) for p in body["path"]] == [1, 2, 3]
+    assert 1 <= len(body["best"]) <= 2
+    assert body["evaluated"] >= body["candidates"]
@@ -11,7 +11,7 @@ client = TestClient(app)
 
 def test_generate_returns_immediately(monkeypatch):
     # Avoid running the heavy generation logic during tests
-    monkeypatch.setattr("app.main.gen_weekly_data", lambda: None)
+    monkeypatch.setattr("app.main.gen_weekly_data", lambda **kwargs: None)
     resp = client.post("/data/generate")
     assert resp.status_code == 200
     data = resp.json()
@@ -21,9 +21,122 @@ def test_generate_returns_immediately(monkeypatch):
 
 def test_train_returns_immediately(monkeypatch):
     # Avoid running the heavy training logic during tests
-    monkeypatch.setattr("app.main.fit_elasticities", lambda: None)
+    monkeypatch.setattr("app.main.fit_elasticities", lambda **kwargs: None)
     resp = client.post("/models/train")
     assert resp.status_code == 200
     data = resp.json()
     assert data["ok"] is True
     assert "started" in data["message"].lower()
+
+
+def test_training_jobs_are_single_flight_and_cancellable(monkeypatch):
+    import threading
+
+    release = threading.Event()
+
+    def slow_fit(progress):
+        for i in range(1000):
+            progress(i, 1000, "skus")
+            release.wait(0.01)
+
+    monkeypatch.setattr("app.main.fit_elasticities", slow_fit)
+    first = client.post("/models/train").json()
+    second = client.post("/models/train").json()
+    assert second["job_id"] == first["job_id"]
+    assert second["deduplicated"] is True
+
+    import time
+    from app.jobs import jobs
+
+    deadline = time.time() + 5
+    while not jobs.get(first["job_id"]).progress and time.time() < deadline:
+        time.sleep(0.01)
+    resp = client.post(f"/jobs/{first['job_id']}/cancel")
+    assert resp.status_code == 200
+
+    assert jobs.get(first["job_id"]).done.wait(5)
+    status = client.get(f"/jobs/{first['job_id']}").json()
+    assert status["status"] == "cancelled"
+    assert status["progress"]["unit"] == "skus"
+    assert any(j["id"] == first["job_id"] for j in client.get("/jobs").json()["jobs"])
+    assert client.get("/jobs/nope").status_code == 404
+
+    third = client.post("/models/train").json()
+    assert third["job_id"] != first["job_id"]
+    jobs.cancel(third["job_id"])
+    jobs.get(third["job_id"]).done.wait(5)
+
+
+def test_cancelled_append_leaves_panel_untouched():
+    import threading
+
+    import pandas as pd
+    import pytest
+
+    from app.jobs import jobs
+    from app.models.elasticities import fit_elasticities
+    from app.synth_data import append_weeks, gen_weekly_data
+    from app.utils.io import engine, read_table, to_parquet, write_table
+    from app.utils.snapshots import current_version, new_snapshot
+
+    def weeks():
+        with engine().connect() as con:
+            return pd.read_sql("select distinct week from price_weekly order by week", con).week.tolist()
+
+    gate = threading.Event()
+
+    def gated_append(progress):
+        def report(*args, **kwargs):
+            progress(*args, **kwargs)
+            gate.wait(5)
+
+        return append_weeks(5, week_block=1, progress=report)
+
+    try:
+        gen_weekly_data(weeks=4, n_per_brand=1, retailers_per_combo=1, week_block=1)
+        version = current_version()
+        job, _created = jobs.submit("append", gated_append, key="data")
+        while not job.progress and not job.done.is_set():
+            job.done.wait(0.01)
+        jobs.cancel(job.id)
+        gate.set()
+        assert job.done.wait(10) and job.status == "cancelled"
+        assert current_version() == version
+        assert weeks() == [1, 2, 3, 4]
+
+        append_weeks(1)
+        assert weeks() == [1, 2, 3, 4, 5]
+
+        # A state that disagrees with the fact tables is refused.
+        state = read_table("synth_state").assign(last_week=9)
+        with new_snapshot():
+            write_table(state, "synth_state")
+            to_parquet(state, "synth_state")
+        with pytest.raises(RuntimeError):
+            append_weeks(1)
+    finally:
+        gate.set()
+        gen_weekly_data()
+        fit_elasticities()
+
+
+def test_bootstrap_stops_when_generation_fails(monkeypatch):
+    import pytest
+
+    from app import bootstrap
+
+    trained = []
+
+    class _Empty:
+        def has_table(self, name):
+            return False
+
+    def broken_generate(progress):
+        raise ValueError("disk full")
+
+    monkeypatch.setattr(bootstrap, "inspect", lambda con: _Empty())
+    monkeypatch.setattr("app.synth_data.gen_weekly_data", broken_generate)
+    monkeypatch.setattr("app.models.elasticities.fit_elasticities", lambda progress: trained.append(1))
+    with pytest.raises(RuntimeError, match="generate job .* failed: disk full"):
+        bootstrap.bootstrap_if_needed()
+    assert not trained
@@ -0,0 +1,137 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.models.elasticities import _attribute_importance, _batched_ols
+
+
+def test_batched_ols_matches_per_group_least_squares():
+    rng = np.random.default_rng(0)
+    groups, rows, k = 20, 40, 4
+    codes = np.repeat(np.arange(groups), rows)
+    X = rng.normal(size=(groups * rows, k))
+    y = X @ rng.normal(size=k) + 0.5 + rng.normal(size=groups * rows)
+    # A constant regressor makes the last group singular.
+    X[codes == groups - 1, 1] = 3.0
+
+    coef, se, n = _batched_ols(codes, X, y, groups)
+
+    assert (n == rows).all()
+    for g in (0, 7):
+        A = np.column_stack([np.ones(rows), X[codes == g]])
+        beta, rss, *_ = np.linalg.lstsq(A, y[codes == g], rcond=None)
+        cov = rss[0] / (rows - k - 1) * np.linalg.inv(A.T @ A)
+        np.testing.assert_allclose(coef[g], beta[1:], atol=1e-10)
+        np.testing.assert_allclose(se[g], np.sqrt(np.diag(cov))[1:], atol=1e-10)
+    assert np.isfinite(coef[-1]).all() and np.isnan(se[-1]).all()
+
+
+def test_pooled_attribute_importance_is_per_sku_and_normalized(monkeypatch):
+    monkeypatch.setenv("ELASTICITY_N_JOBS", "1")
+    rng = np.random.default_rng(1)
+    n_sku, rows = 12, 40
+    sku = pd.DataFrame(
+        {
+            "sku_id": np.arange(n_sku),
+            "brand": rng.choice(["A", "B"], n_sku),
+            "tier": rng.choice(["Core", "Premium"], n_sku),
+            "pack_type": "Can",
+            "flavor": rng.choice(["Cola", "Lime"], n_sku),
+            "pack_size_ml": rng.choice([250, 500], n_sku),
+        }
+    )
+    df = sku.loc[np.repeat(sku.index, rows)].reset_index(drop=True)
+    df["net_price"] = rng.uniform(1.0, 2.0, len(df))
+    df["promo_flag"] = rng.integers(0, 2, len(df))
+    df["units"] = 100 - 40 * df["net_price"] + rng.normal(0, 1, len(df))
+
+    out = _attribute_importance(df)
+
+    assert list(out.columns) == ["sku_id", "importance_json"]
+    assert sorted(out.sku_id) == list(range(n_sku))
+    for js in out.importance_json:
+        imp = json.loads(js)
+        assert abs(sum(imp.values()) - 1.0) < 1e-6
+        assert max(imp, key=imp.get) == "net_price"
+
+
+def test_incremental_refit_matches_full_refit():
+    from app.models.elasticities import CROSS_MATRIX, cross_matrix_from_json, fit_elasticities
+    from app.synth_data import append_weeks, gen_weekly_data
+    from app.utils.io import read_npz, read_table
+
+    try:
+        gen_weekly_data(weeks=32, n_per_brand=1, retailers_per_combo=1, seed=5)
+        fit_elasticities(incremental=False)
+        stats_before = read_table("elasticity_stats").set_index("sku_id")
+        append_weeks(2)
+
+        fit_elasticities(incremental=True)
+        incremental = read_table("elasticities").set_index("sku_id")
+        state = read_table("elasticity_state").iloc[0]
+        assert int(state.last_week) == 34
+        stats_after = read_table("elasticity_stats").set_index("sku_id")
+        assert (stats_after.rows - stats_before.rows > 0).all()
+        matrix = read_npz(CROSS_MATRIX)
+        assert (matrix["sku_id"] == incremental.index.to_numpy()).all()
+        expected = cross_matrix_from_json(incremental, list(matrix["brands"]))
+        np.testing.assert_allclose(matrix["cross"], expected)
+
+        fit_elasticities(incremental=False)
+        full = read_table("elasticities").set_index("sku_id")
+        pd.testing.assert_frame_equal(
+            incremental[["own_elast", "own_se", "stat_sig"]],
+            full[["own_elast", "own_se", "stat_sig"]],
+            check_exact=False,
+            atol=1e-9,
+        )
+    finally:
+        gen_weekly_data()
+        fit_elasticities()
+
+
+def test_incremental_refit_with_newly_fitted_skus_recomputes_importance():
+    from app.models.elasticities import MIN_OBS, fit_elasticities
+    from app.synth_data import append_weeks, gen_weekly_data
+    from app.utils.io import read_table
+
+    try:
+        # 12 retailers: two weeks stay below MIN_OBS rows per SKU, three reach it.
+        gen_weekly_data(weeks=2, n_per_brand=1, retailers_per_combo=1, seed=5)
+        fit_elasticities(incremental=False)
+        assert read_table("price_weekly").groupby("sku_id").size().max() < MIN_OBS
+        assert read_table("elasticities").empty
+        append_weeks(1)
+
+        fit_elasticities(incremental=True)
+        fitted = set(read_table("elasticities").sku_id)
+        assert fitted
+        assert set(read_table("attributes_importance").sku_id) == fitted
+    finally:
+        gen_weekly_data()
+        fit_elasticities()
+
+
+def test_streamed_fit_matches_single_block(monkeypatch):
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.elasticities import fit_elasticities
+    from app.utils.io import read_table
+
+    bootstrap_if_needed()
+    cols = ["sku_id", "own_elast", "own_se", "cross_elast_json"]
+    monkeypatch.setenv("ELASTICITY_WEEK_BLOCK", "1000")
+    fit_elasticities(incremental=False)
+    single = read_table("elasticities", cols)
+    monkeypatch.setenv("ELASTICITY_WEEK_BLOCK", "4")
+    fit_elasticities(incremental=False)
+    streamed = read_table("elasticities", cols)
+
+    pd.testing.assert_frame_equal(
+        single.drop(columns="cross_elast_json"),
+        streamed.drop(columns="cross_elast_json"),
+        check_exact=False,
+        atol=1e-9,
+    )
+    for a, b in zip(single.cross_elast_json, streamed.cross_elast_json):
+        assert json.loads(a).keys() == json.loads(b).keys()
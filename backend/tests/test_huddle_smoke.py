@@ -16,8 +16,7 @@ def test_huddle_smoke():
 
     # Minimal optimizer tables for a single SKU
     tiny_tables = (
-        pd.DataFrame({"sku_id": [1], "week": [1], "net_price": [10.0]}),
-        pd.DataFrame({"sku_id": [1], "week": [1], "units": [100.0]}),
+        pd.DataFrame({"sku_id": [1], "p0": [10.0], "base_units": [100.0]}),
         pd.DataFrame({"sku_id": [1], "cogs_per_unit": [6.0], "logistics_per_unit": [1.0]}),
         pd.DataFrame({"sku_id": [1], "floor": [8.0], "ceiling": [12.0]}),
         pd.DataFrame({"sku_id": [1], "own_elast": [-1.0]}),
@@ -31,7 +30,7 @@ def test_huddle_smoke():
 
     dummy_agg = pd.DataFrame([{"units": 100, "revenue": 1000, "margin": 200}])
 
-    def fake_sim_price(changes):
+    def fake_sim_price(changes, **kwargs):
         return dummy_agg, pd.DataFrame([{"sku_id": 1}])
 
     def fake_sim_delist(ids):
@@ -0,0 +1,189 @@
+import pandas as pd
+import pytest
+
+from app.bootstrap import bootstrap_if_needed
+from app.utils.io import (
+    DB_POOL_SIZE,
+    clear_shared_frames,
+    compact_dtypes,
+    competitor_price_wide,
+    create_indexes,
+    engine,
+    max_week,
+    pool_metrics,
+    read_connection,
+    read_table,
+    recent_sku_means,
+    shared_frame,
+    write_table,
+)
+
+
+def test_read_table_pushes_down_columns_and_weeks():
+    bootstrap_if_needed()
+    last = max_week("price_weekly")
+    cols = ["week", "retailer_id", "sku_id", "net_price"]
+
+    df = read_table("price_weekly", cols, min_week=last - 2)
+
+    with engine().connect() as con:
+        expected = pd.read_sql(
+            f"select {', '.join(cols)} from price_weekly where week >= {last - 2}", con
+        )
+    assert list(df.columns) == cols
+    assert sorted(df.week.unique()) == [last - 2, last - 1, last]
+    keys = ["week", "retailer_id", "sku_id"]
+    got = df.astype({"week": "int64"}).sort_values(keys).reset_index(drop=True)
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_read_table_falls_back_to_sqlite_without_parquet_copy():
+    df = pd.DataFrame({"sku_id": [1, 2, 3, 4], "net_price_sum": [1.0, 2.0, 3.0, 4.0], "x": 0})
+    try:
+        write_table(df, "tmp_sqlite_only")
+        out = read_table("tmp_sqlite_only", ["sku_id", "net_price_sum"], limit=3)
+        assert list(out.columns) == ["sku_id", "net_price_sum"]
+        assert len(out) == 3
+    finally:
+        with engine().begin() as con:
+            con.exec_driver_sql("drop table if exists tmp_sqlite_only")
+
+
+def test_write_table_bulk_loads_and_indexes():
+    df = pd.DataFrame(
+        {"week": [1, 1, 2], "retailer_id": [1, 2, 1], "sku_id": [10, 10, 11], "units": [1.0, None, 3.0]}
+    )
+    try:
+        def indexes():
+            with engine().connect() as con:
+                return set(
+                    pd.read_sql(
+                        "select name from sqlite_master where type='index' and tbl_name='tmp_bulk'",
+                        con,
+                    ).name
+                )
+
+        write_table(df, "tmp_bulk", chunksize=2, index=False)
+        write_table(df.assign(week=3), "tmp_bulk", if_exists="append", index=False)
+        assert indexes() == set()
+        create_indexes("tmp_bulk")
+        with engine().connect() as con:
+            out = pd.read_sql("select * from tmp_bulk", con)
+            mode = con.exec_driver_sql("pragma journal_mode").scalar()
+        assert len(out) == 6 and out.units.isna().sum() == 2
+        assert indexes() == {"ix_tmp_bulk_week", "ix_tmp_bulk_sku"}
+        assert mode == "wal"
+    finally:
+        with engine().begin() as con:
+            con.exec_driver_sql("drop table if exists tmp_bulk")
+
+
+def test_read_connections_are_pooled_and_metered():
+    from concurrent.futures import ThreadPoolExecutor
+
+    bootstrap_if_needed()
+    before = pool_metrics()["read"]["checkouts"]
+
+    def _query(_):
+        with read_connection() as con:
+            return con.exec_driver_sql("select count(*) from sku_master").scalar()
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        counts = list(pool.map(_query, range(64)))
+
+    metrics = pool_metrics()
+    assert len(set(counts)) == 1
+    assert metrics["read"]["checkouts"] - before == 64
+    assert metrics["read"]["checked_out"] == 0
+    assert metrics["read"]["pool_size"] == DB_POOL_SIZE
+    assert metrics["write"]["wait_seconds_avg"] >= 0.0
+
+
+def test_duckdb_aggregates_match_pandas(monkeypatch):
+    pytest.importorskip("duckdb")
+    pytest.importorskip("pyarrow")
+    bootstrap_if_needed()
+
+    monkeypatch.setenv("ANALYTICS_BACKEND", "duckdb")
+    means_db, wide_db = recent_sku_means(8), competitor_price_wide()
+    monkeypatch.setenv("ANALYTICS_BACKEND", "pandas")
+    means_pd, wide_pd = recent_sku_means(8), competitor_price_wide()
+
+    pd.testing.assert_frame_equal(means_db, means_pd, check_dtype=False)
+    pd.testing.assert_frame_equal(wide_db, wide_pd, check_dtype=False)
+
+    # Slices read with a known brand list only touch their own weeks.
+    import app.utils.io as io
+
+    brands = io.competitor_brands()
+    reads = []
+    read_table_ = io.read_table
+    monkeypatch.setattr(
+        io, "read_table", lambda *a, **kw: reads.append(kw) or read_table_(*a, **kw)
+    )
+    sliced = competitor_price_wide(min_week=2, max_week=3, brands=brands)
+    assert len(reads) == 1 and reads[0]["min_week"] == 2
+    monkeypatch.setenv("ANALYTICS_BACKEND", "duckdb")
+    pd.testing.assert_frame_equal(
+        sliced, competitor_price_wide(min_week=2, max_week=3), check_dtype=False
+    )
+
+
+def test_shared_frame_maps_persisted_arrow_file():
+    pytest.importorskip("pyarrow")
+    from app.data_paths import CACHE
+
+    calls = []
+
+    def build():
+        calls.append(1)
+        return pd.DataFrame({"sku_id": [1, 2, 3], "units": [1.5, 2.5, 3.5]})
+
+    first = shared_frame("test_frame", "v1", build)
+    assert (CACHE / "test_frame-v1.arrow").exists()
+    # A fresh process (simulated by dropping the in-memory memo) maps the file
+    # instead of rebuilding.
+    clear_shared_frames()
+    second = shared_frame("test_frame", "v1", build)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+    # Only the newest two versions are kept on disk.
+    shared_frame("test_frame", "v2", build)
+    shared_frame("test_frame", "v3", build)
+    assert not (CACHE / "test_frame-v1.arrow").exists()
+    for key in ("v2", "v3"):
+        (CACHE / f"test_frame-{key}.arrow").unlink()
+    clear_shared_frames()
+
+
+def test_compact_dtypes_shrinks_attributes_and_ids():
+    df = pd.DataFrame(
+        {
+            "sku_id": [1000, 1001, 1002],
+            "brand": ["Aurel", "Novis", "Aurel"],
+            "promo_flag": [0, 1, 0],
+            "net_price": [1.25, 0.99, 1.10],
+            "own_elast": [-1.2, -0.8, -1.0],
+            "cross_elast_json": ["{}", "{}", "{}"],
+        }
+    )
+    out = compact_dtypes(df)
+    assert str(out["brand"].dtype) == "category"
+    assert out["sku_id"].dtype == "int16" and out["promo_flag"].dtype == "int16"
+    assert out["own_elast"].dtype == "float32"
+    # Money stays exact so API rows and totals carry no float32 noise.
+    assert out["net_price"].dtype == "float64"
+    assert out["cross_elast_json"].dtype == object
+    assert compact_dtypes(df, floats=False)["own_elast"].dtype == "float64"
+    assert out["brand"].tolist() == df["brand"].tolist()
+
+
+def test_recent_sku_means_without_price_data(monkeypatch):
+    import app.utils.io as io
+
+    monkeypatch.setattr(io, "max_week", lambda *args, **kwargs: None)
+    out = io.recent_sku_means(8)
+    assert out.empty and list(out.columns) == ["sku_id", "p0", "u0"]
+    assert io.min_week("tmp_missing_weekly") is None
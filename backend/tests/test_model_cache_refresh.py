@@ -35,3 +35,28 @@ def test_simulator_optimizer_use_fresh_data():
         gen_weekly_data()
         fit_elasticities()
 
+
+def test_appending_weeks_keeps_per_sku_caches():
+    """Caches built from dimension/model tables survive appended weeks."""
+
+    from app.models.assortment import _sku_inputs
+    from app.models.simulator import _cross_matrix, _substitutes
+    from app.synth_data import append_weeks
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    before = data_version()
+    cached = (_cross_matrix(before), _substitutes(before), _sku_inputs(before))
+    try:
+        append_weeks(1)
+        after = data_version()
+        assert after != before
+        assert _cross_matrix(after) is cached[0]
+        assert _substitutes(after) is cached[1]
+        assert _sku_inputs(after) is cached[2]
+
+        gen_weekly_data(weeks=3, n_per_brand=1, retailers_per_combo=1)
+        assert _substitutes(data_version()) is not cached[1]
+    finally:
+        gen_weekly_data()
+        fit_elasticities()
@@ -0,0 +1,68 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from app.main import app
+
+
+def _scenario():
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import _simulation_state
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    state = _simulation_state(data_version())
+    return state, {int(s): 0.06 * ((i % 3) - 1) for i, s in enumerate(state.sku_ids)}
+
+
+def test_rollup_matches_row_level_simulation():
+    from app.models.rollup import simulate_price_rollup
+    from app.models.simulator import simulate_price_change
+    from app.utils.io import read_table
+
+    state, changes = _scenario()
+    weeks = [int(w) for w in state.weeks[-2:]]
+    agg, rows = simulate_price_change(changes, weeks=weeks)
+
+    by_week = simulate_price_rollup(changes, by=["week"], weeks=weeks)
+    pd.testing.assert_frame_equal(
+        agg, by_week[agg.columns], check_dtype=False, check_exact=False, atol=1e-6
+    )
+
+    retailer = read_table("retailer")[["retailer_id", "region", "channel"]]
+    detail = rows.merge(retailer, on="retailer_id")
+    detail = detail[detail["channel"] == "eCom"]
+    expected = detail.groupby(["region", detail["brand"].astype(str)])["new_units"].sum()
+    got = simulate_price_rollup(
+        changes, by=["region", "brand"], weeks=weeks, filters={"channel": ["eCom"]}
+    ).set_index(["region", "brand"])["units"]
+    np.testing.assert_allclose(got.sort_index().to_numpy(), expected.sort_index().to_numpy())
+
+
+def test_rollup_endpoint_and_caching():
+    from app.models.rollup import simulate_price_rollup
+
+    _state, changes = _scenario()
+    first = simulate_price_rollup(changes, by=["tier"])
+    assert simulate_price_rollup({str(k): v for k, v in changes.items()}, by=["tier"]) is first
+    assert {"tier", "units", "base_units", "volume_change"} <= set(first.columns)
+
+    client = TestClient(app)
+    resp = client.post(
+        "/simulate/price/rollup",
+        json={"changes": {str(k): v for k, v in changes.items()}, "by": ["region", "channel"]},
+    )
+    assert resp.status_code == 200
+    rows = resp.json()["rows"]
+    assert rows and {"region", "channel", "margin_change"} <= set(rows[0])
+    bad = client.post("/simulate/price/rollup", json={"changes": {}, "by": ["planet"]})
+    assert bad.status_code == 400
+    for filters in ({"channel": "eCom"}, ["channel"]):
+        bad = client.post(
+            "/simulate/price/rollup", json={"changes": {}, "by": ["brand"], "filters": filters}
+        )
+        assert bad.status_code == 400
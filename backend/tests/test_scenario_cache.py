@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from app.models.scenario_cache import ScenarioCache, canonical_changes
+
+
+def test_canonical_changes_normalises_keys_and_noise():
+    a = canonical_changes({"1003": 0.1, 1001: -0.05, 1002: 0.0, "x": 0.2})
+    b = canonical_changes({1001: -0.05 + 1e-12, 1003: 0.1000000001})
+    assert a == b == {1001: -0.05, 1003: 0.1}
+    assert list(a) == [1001, 1003]
+    # JSON numbers and numpy ids parse as floats/ints; fractional ids are not SKUs.
+    assert canonical_changes({1003.0: 0.1, np.int64(1001): -0.05, 1002.5: 0.3}) == a
+
+
+def test_cache_counts_hits_and_evicts_by_size():
+    frame = pd.DataFrame({"x": range(100)})
+    size = int(frame.memory_usage(index=True).sum())
+    cache = ScenarioCache(max_bytes=2 * size)
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        return frame.copy()
+
+    for key in ["a", "a", "b", "c", "a"]:
+        cache.get_or_compute(key, lambda key=key: compute(key))
+    stats = cache.stats()
+    assert calls == ["a", "b", "c", "a"]
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 4, 2)
+    assert stats["entries"] == 2 and stats["bytes"] <= stats["max_bytes"]
+
+
+def test_cache_counts_string_columns_by_content():
+    labels = pd.DataFrame({"brand": ["brand-" + "x" * 200] * 100})
+    shallow = int(labels.memory_usage(index=True).sum())
+    cache = ScenarioCache(max_bytes=4 * shallow)
+    cache.get_or_compute("labels", lambda: labels)
+    # Pointer-sized accounting would fit this frame several times over.
+    assert cache.stats()["entries"] == 0
+
+
+def test_simulations_share_cache_across_equivalent_requests():
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import _simulation_state, simulate_delist, simulate_price_change
+    from app.models.scenario_cache import scenario_cache
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    sku = int(_simulation_state(data_version()).sku_ids[0])
+    first = simulate_price_change({str(sku): 0.1}, return_rows=False)
+    hits = scenario_cache.stats()["hits"]
+    again = simulate_price_change({sku: 0.1 + 1e-12, sku + 10**6: 0.0}, return_rows=False)
+    assert again is first
+    assert scenario_cache.stats()["hits"] == hits + 1
+
+    kept = simulate_delist([sku])
+    assert simulate_delist([str(sku)]) is kept
@@ -41,3 +41,261 @@ def test_optimize_run_smoke(monkeypatch):
     assert data["solution"][0]["sku_id"] == 1
     for key in dummy_kpis:
         assert key in data["kpis"]
+
+
+def test_simulated_rows_keep_exact_prices_and_costs():
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import simulate_price_change
+    from app.utils.io import read_table
+
+    bootstrap_if_needed()
+    _agg, rows = simulate_price_change({})
+    keys = ["week", "retailer_id", "sku_id"]
+    source = (
+        read_table("price_weekly", keys + ["list_price", "net_price"], min_week=int(rows.week.min()))
+        .merge(read_table("costs"), on="sku_id")
+        .merge(rows[keys], on=keys)
+    )
+    got = rows.merge(source, on=keys, suffixes=("", "_source"))
+    for col in ("list_price", "net_price", "cogs_per_unit", "logistics_per_unit"):
+        assert got[col].dtype == "float64"
+        assert (got[col] == got[f"{col}_source"]).all(), col
+
+
+def test_simulated_rows_carry_elasticity_detail_on_shared_columns():
+    import json
+
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import _simulation_state, simulate_price_change
+    from app.utils.io import data_version, read_table
+
+    bootstrap_if_needed()
+    state = _simulation_state(data_version())
+    for name in ("units", "net_price", "cost"):
+        assert not getattr(state, name).flags.owndata, name
+    assert not state.sku_code.flags.owndata
+
+    _agg, rows = simulate_price_change({})
+    assert {"cross_elast_json", "cross_elast", "stat_sig", "own_se"} <= set(rows.columns)
+    elast = read_table("elasticities").set_index("sku_id")
+    sample = rows.drop_duplicates("sku_id")
+    for sku_id, text, parsed in zip(sample.sku_id, sample.cross_elast_json, sample.cross_elast):
+        assert text == elast.loc[sku_id, "cross_elast_json"]
+        assert parsed == json.loads(text)
+    resp = client.post("/simulate/price", json={})
+    assert resp.status_code == 200
+    assert "stat_sig" in resp.json()["rows"][0]
+
+
+def test_simulation_state_reads_only_elasticity_columns(monkeypatch):
+    from app.bootstrap import bootstrap_if_needed
+    from app.models import simulator
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    version = data_version()
+    simulator._price_simulation_frame(version)
+    simulator._simulation_codes(version)
+    simulator._simulation_state.cache_clear()
+
+    def fail(_version):
+        raise AssertionError("_load called for a mapped frame")
+
+    monkeypatch.setattr(simulator, "_load", fail)
+    state = simulator._simulation_state(version)
+    assert state.sku_own_se.any()
+    simulator._simulation_state.cache_clear()
+
+
+def test_simulate_price_with_elasticities_from_older_release():
+    """Tables trained before fit statistics existed still simulate."""
+
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.elasticities import CROSS_MATRIX, fit_elasticities
+    from app.utils.io import read_table, write_table
+    from app.utils.snapshots import new_snapshot, snapshot_root
+
+    bootstrap_if_needed()
+    old = read_table("elasticities", ["sku_id", "own_elast", "cross_elast_json", "stat_sig"])
+    try:
+        with new_snapshot():
+            root = snapshot_root()
+            for path in (root / "elasticities.parquet", root / f"{CROSS_MATRIX}.npz"):
+                path.unlink(missing_ok=True)
+            write_table(old, "elasticities")
+        resp = client.post("/simulate/price", params={"draws": 50}, json={str(old.sku_id[0]): 0.1})
+        assert resp.status_code == 200
+        row = resp.json()["rows"][0]
+        assert "own_se" not in row and "stat_sig" in row
+    finally:
+        # The fit state still matches the panel, so force a full refit.
+        fit_elasticities(incremental=False)
+
+
+def test_cross_matrix_matches_elasticity_json():
+    import json
+
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import _cross_matrix, _load
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    version = data_version()
+    sku_index, brands, matrix = _cross_matrix(version)
+    elast = _load(version)[3]
+    row = elast.iloc[0]
+    expected = json.loads(row["cross_elast_json"])
+    got = matrix[sku_index.get_loc(int(row["sku_id"]))]
+    for brand, value in expected.items():
+        assert abs(got[brands.index(brand)] - value) < 1e-9
+
+
+def test_price_kernel_aggregates_match_rows():
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import _simulation_state, simulate_price_change
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    state = _simulation_state(data_version())
+    sku_a, sku_b = (int(s) for s in state.sku_ids[:2])
+    changes = {str(sku_a): 0.1, sku_b: -0.05, "not-a-sku": 0.5}
+    week = int(state.weeks[-1])
+
+    agg, rows = simulate_price_change(changes, weeks=[week])
+    assert agg["week"].tolist() == [week]
+    assert set(rows["week"]) == {week}
+    assert rows.loc[rows.sku_id == sku_a, "pct_change"].eq(0.1).all()
+    assert rows.loc[rows.sku_id == sku_b, "pct_change"].eq(-0.05).all()
+    assert abs(agg["units"].iloc[0] - rows["new_units"].sum()) < 1e-6
+    assert abs(agg["margin"].iloc[0] - rows["margin"].sum()) < 1e-6
+
+    agg_only, no_rows = simulate_price_change(changes, weeks=[week], return_rows=False)
+    assert no_rows is None
+    pd.testing.assert_frame_equal(agg, agg_only)
+
+    base, _ = simulate_price_change({}, return_rows=False)
+    assert (base["units"] - base["base_units"]).abs().max() < 1e-9
+
+
+def test_price_batch_matches_single_simulations():
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import (
+        _simulation_state,
+        simulate_price_change,
+        simulate_price_changes_batch,
+    )
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    skus = [int(s) for s in _simulation_state(data_version()).sku_ids[:6]]
+    scenarios = [{}, {skus[0]: 0.1}, {str(skus[1]): -0.15, skus[4]: 0.05}, {s: 0.08 for s in skus}]
+
+    agg, summary = simulate_price_changes_batch(scenarios)
+    assert summary["scenario"].tolist() == [0, 1, 2, 3]
+    assert summary.loc[0, "volume_change"] == 0
+    for i, changes in enumerate(scenarios):
+        single, _ = simulate_price_change(changes, return_rows=False)
+        batch = agg[agg.scenario == i].drop(columns="scenario").reset_index(drop=True)
+        pd.testing.assert_frame_equal(single, batch, check_dtype=False, atol=1e-6)
+
+    client = TestClient(app)
+    resp = client.post("/simulate/price/batch", json={"scenarios": scenarios[:2]})
+    assert resp.status_code == 200
+    body = resp.json()["scenarios"]
+    assert len(body) == 2
+    assert body[1]["summary"]["scenario"] == 1
+    assert len(body[1]["agg"]) == len(single)
+    assert client.post("/simulate/price/batch", json={"scenarios": 3}).status_code == 400
+    bad = {"scenarios": scenarios[:2], "weeks": ["x"]}
+    assert client.post("/simulate/price/batch", json=bad).status_code == 400
+    # No matching week: still one zero summary per submitted scenario.
+    resp = client.post("/simulate/price/batch", json={"scenarios": scenarios, "weeks": [10**6]})
+    assert resp.status_code == 200
+    body = resp.json()["scenarios"]
+    assert [s["summary"]["scenario"] for s in body] == [0, 1, 2, 3]
+    assert all(s["agg"] == [] and s["summary"]["volume_change"] == 0 for s in body)
+
+
+def test_delist_substitute_index_matches_exhaustive_fallback(monkeypatch):
+    from app.bootstrap import bootstrap_if_needed
+    from app.models import simulator
+    from app.utils.io import clear_shared_frames, data_version
+
+    bootstrap_if_needed()
+    version = data_version()
+    subs = simulator._substitutes(version)
+    assert (subs["sku_id_lost"] != subs["sku_id_keep"]).all()
+    assert (subs["sim"] > 0).all()
+    assert subs.groupby("sku_id_lost").size().max() <= simulator.SUBSTITUTES_K
+
+    skus = [int(s) for s in simulator._simulation_state(version).sku_ids[::3]]
+    indexed = simulator._simulate_delist(version, skus, [])
+    # With a one-entry candidate list every lost SKU goes through the
+    # exhaustive fallback, which must pick the same substitutes.
+    monkeypatch.setattr(simulator, "SUBSTITUTES_K", 1)
+    clear_shared_frames()
+    try:
+        exhaustive = simulator._simulate_delist(version, skus, [])
+    finally:
+        monkeypatch.undo()
+        clear_shared_frames()
+    pd.testing.assert_frame_equal(indexed, exhaustive)
+    assert not indexed["sku_id"].isin(skus).any()
+    assert indexed["volume_gain"].sum() > 0
+
+
+def test_row_groups_match_mask_filters():
+    import numpy as np
+
+    from app.models.simulator import RowGroups
+
+    rng = np.random.default_rng(3)
+    week = np.repeat(np.arange(1, 9), 30)
+    retailer = np.tile(np.repeat(np.arange(5), 6), 8)
+    for shuffle in (False, True):
+        order = rng.permutation(len(week)) if shuffle else np.arange(len(week))
+        w, r = week[order], retailer[order]
+        groups = RowGroups(w, r)
+        assert (groups.order is None) != shuffle
+        assert groups.rows() is None
+        for weeks, retailers in [([3], None), (None, [0, 4]), ([2, 7, 99], [1]), ([99], None)]:
+            mask = np.ones(len(w), dtype=bool)
+            if weeks:
+                mask &= np.isin(w, weeks)
+            if retailers:
+                mask &= np.isin(r, retailers)
+            np.testing.assert_array_equal(groups.rows(weeks, retailers), np.flatnonzero(mask))
+
+
+def test_price_uncertainty_bands_bracket_point_estimate():
+    from app.bootstrap import bootstrap_if_needed
+    from app.models.simulator import (
+        _simulation_state,
+        simulate_price_change,
+        simulate_price_uncertainty,
+    )
+    from app.utils.io import data_version
+
+    bootstrap_if_needed()
+    state = _simulation_state(data_version())
+    assert (state.sku_own_se >= 0).all() and state.sku_own_se.any()
+    changes = {int(s): 0.1 for s in state.sku_ids[:5]}
+
+    bands = simulate_price_uncertainty(changes, draws=2000, seed=1)
+    agg, _ = simulate_price_change(changes, return_rows=False)
+    point = (agg["units"].sum() / agg["base_units"].sum() - 1) * 100
+    volume = bands.loc["volume_change"]
+    assert volume["p5"] < point < volume["p95"]
+    assert abs(volume["p50"] - point) < 0.25 * (volume["p95"] - volume["p5"])
+
+    # No changed SKU means nothing to sample: the band collapses to zero.
+    flat = simulate_price_uncertainty({}, draws=100)
+    assert (flat.abs() < 1e-9).all().all()
+
+    payload = {str(k): v for k, v in changes.items()}
+    resp = client.post("/simulate/price", params={"draws": 200}, json=payload)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["draws"] == 200
+    assert set(body["bands"]) == {"volume_change", "revenue_change", "margin_change"}
+    assert set(body["bands"]["volume_change"]) == {"p5", "p50", "p95"}
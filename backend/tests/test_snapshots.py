@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from app.bootstrap import bootstrap_if_needed
+from app.utils.io import read_table, to_parquet
+from app.utils.snapshots import (
+    SNAPSHOTS,
+    WRITER_LOCK,
+    StaleSnapshotError,
+    current_version,
+    data_version,
+    new_snapshot,
+    snapshot_root,
+)
+
+
+def test_snapshot_publishes_atomically_and_keeps_old_version_readable():
+    bootstrap_if_needed()
+    before = current_version()
+    old = read_table("costs", version=before)
+
+    with new_snapshot() as staged:
+        to_parquet(old.assign(cogs_per_unit=old.cogs_per_unit + 1.0), "costs")
+        # The writer reads its own writes; everyone else still sees ``before``.
+        assert data_version() == staged
+        assert current_version() == before
+        assert (read_table("costs").cogs_per_unit == old.cogs_per_unit + 1.0).all()
+
+    try:
+        assert current_version() == staged and staged > (before or "")
+        pd.testing.assert_frame_equal(read_table("costs", version=before), old)
+        assert (read_table("costs").cogs_per_unit == old.cogs_per_unit + 1.0).all()
+        # Unchanged tables are carried over as hard links, not copies.
+        src, dst = (snapshot_root(v) / "sku_master.parquet" for v in (before, staged))
+        assert src.stat().st_ino == dst.stat().st_ino
+    finally:
+        to_parquet(old, "costs")
+
+
+def test_failed_snapshot_is_discarded():
+    bootstrap_if_needed()
+    before = current_version()
+    with pytest.raises(RuntimeError):
+        with new_snapshot() as staged:
+            to_parquet(pd.DataFrame({"x": [1]}), "tmp_snapshot")
+            raise RuntimeError("boom")
+    assert current_version() == before
+    assert not (SNAPSHOTS / staged).exists()
+
+
+def test_writer_with_superseded_base_does_not_publish():
+    from app.models.elasticities import fit_elasticities
+
+    bootstrap_if_needed()
+    costs = read_table("costs")
+
+    def publish_new_data(*_args):
+        if current_version() == before:
+            with new_snapshot():
+                to_parquet(costs, "costs")
+
+    before = current_version()
+    # A data refresh lands while the model is being fitted.
+    with pytest.raises(StaleSnapshotError):
+        fit_elasticities(incremental=False, progress=publish_new_data)
+    after = current_version()
+    assert after != before
+
+    with pytest.raises(StaleSnapshotError):
+        with new_snapshot(base=before):
+            pass
+    assert current_version() == after
+    with new_snapshot(base=after) as staged:
+        pass
+    assert current_version() == staged
+
+
+def test_writers_in_other_processes_wait_for_the_file_lock():
+    import fcntl
+    import threading
+
+    bootstrap_if_needed()
+    before = current_version()
+    published = threading.Event()
+
+    def write():
+        with new_snapshot():
+            pass
+        published.set()
+
+    # Another open file description behaves like another worker process.
+    with open(WRITER_LOCK, "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        thread = threading.Thread(target=write)
+        thread.start()
+        assert not published.wait(0.3)
+        assert current_version() == before
+        fcntl.flock(fh, fcntl.LOCK_UN)
+    thread.join(10)
+    assert published.is_set() and current_version() != before
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+
+from app.synth_data import (
+    BRANDS,
+    WEEKLY_TABLES,
+    _simulate_weeks,
+    append_weeks,
+    gen_weekly_data,
+    make_retailers,
+    make_sku_master,
+)
+from app.utils.io import engine
+from app.utils.snapshots import snapshot_root
+
+
+def _latent():
+    brand_own = np.full(len(BRANDS), -1.0)
+    cross_matrix = np.full((len(BRANDS), len(BRANDS)), 0.05)
+    np.fill_diagonal(cross_matrix, -0.2)
+    return brand_own, cross_matrix
+
+
+def test_simulate_weeks_shapes_and_keys():
+    sku = make_sku_master(n_per_brand=2)
+    retailer = make_retailers(retailers_per_combo=1)
+    weeks = np.arange(3, 7)
+    price, demand, comp = _simulate_weeks(
+        weeks, sku, retailer, *_latent(), np.random.default_rng(0)
+    )
+
+    n = len(weeks) * len(retailer) * len(sku)
+    assert len(price) == len(demand) == n
+    assert len(comp) == len(weeks) * len(retailer) * len(BRANDS)
+
+    keys = ["week", "retailer_id", "sku_id"]
+    assert not price.duplicated(keys).any()
+    assert (price[keys].to_numpy() == demand[keys].to_numpy()).all()
+    assert set(price.week) == set(weeks)
+    assert set(comp.brand) == set(BRANDS)
+
+    assert (demand.units >= 0).all()
+    assert (demand.base_units + demand.uplift_units == demand.units).all()
+    assert (price.loc[price.promo_flag == 0, "promo_depth"] == 0).all()
+
+
+def test_streaming_generation_writes_week_partitions():
+    try:
+        gen_weekly_data(weeks=3, n_per_brand=1, retailers_per_combo=1, stream=True, week_block=1)
+
+        with engine().connect() as con:
+            weeks = pd.read_sql("select distinct week from price_weekly order by week", con)
+            guard = pd.read_sql("select * from guardrails", con)
+            indexes = pd.read_sql("select name from sqlite_master where type='index'", con)
+        assert weeks.week.tolist() == [1, 2, 3]
+        assert {f"ix_{name}_week" for name in WEEKLY_TABLES} <= set(indexes.name)
+        assert len(guard) == len(BRANDS)
+        for name in WEEKLY_TABLES:
+            parts = sorted(p.name for p in (snapshot_root() / name).iterdir())
+            assert parts == ["week=1", "week=2", "week=3"]
+    finally:
+        gen_weekly_data()
+
+
+def test_parallel_generation_matches_serial():
+    def _snapshot():
+        with engine().connect() as con:
+            return {
+                name: pd.read_sql(f"select * from {name} order by rowid", con)
+                for name in ("sku_master", "guardrails", *WEEKLY_TABLES)
+            }
+
+    kwargs = dict(weeks=6, n_per_brand=2, retailers_per_combo=1, week_block=2, seed=7)
+    try:
+        gen_weekly_data(**kwargs, workers=1)
+        serial = _snapshot()
+        gen_weekly_data(**kwargs, workers=2)
+        parallel = _snapshot()
+        for name, df in serial.items():
+            pd.testing.assert_frame_equal(df, parallel[name])
+    finally:
+        gen_weekly_data()
+
+
+def test_append_weeks_extends_panel_and_guardrails():
+    try:
+        gen_weekly_data(weeks=4, n_per_brand=1, retailers_per_combo=1, week_block=1, seed=3)
+        with engine().connect() as con:
+            before = pd.read_sql("select * from price_weekly", con)
+
+        append_weeks(2, week_block=1)
+
+        with engine().connect() as con:
+            after = pd.read_sql("select * from price_weekly", con)
+            guard = pd.read_sql("select * from guardrails", con).set_index("sku_id")
+            state = pd.read_sql("select * from synth_state", con)
+        assert sorted(after.week.unique()) == [1, 2, 3, 4, 5, 6]
+        pd.testing.assert_frame_equal(after[after.week <= 4].reset_index(drop=True), before)
+        assert int(state.last_week.iloc[0]) == 6
+        assert sorted(p.name for p in (snapshot_root() / "price_weekly").iterdir())[-1] == "week=6"
+
+        mean_price = after.groupby("sku_id").net_price.mean()
+        expected = (mean_price * 0.85).round(2)
+        pd.testing.assert_series_equal(
+            guard.min_price, expected.rename("min_price"), check_exact=False
+        )
+
+        # With one-week blocks the appended weeks match a full 6-week run.
+        gen_weekly_data(weeks=6, n_per_brand=1, retailers_per_combo=1, week_block=1, seed=3)
+        with engine().connect() as con:
+            full = pd.read_sql("select * from price_weekly", con)
+        pd.testing.assert_frame_equal(full, after)
+    finally:
+        gen_weekly_data()
+
+
+def test_failed_generation_leaves_sqlite_and_snapshot_untouched():
+    from app.utils.io import read_table
+    from app.utils.snapshots import current_version
+
+    def _sqlite():
+        with engine().connect() as con:
+            return {
+                name: pd.read_sql(f"select * from {name} order by rowid", con)
+                for name in ("sku_master", "synth_state", "price_weekly")
+            }
+
+    class Boom(Exception):
+        pass
+
+    def fail_after_two_blocks(done, total, unit, **details):
+        if done >= 2:
+            raise Boom()
+
+    try:
+        gen_weekly_data(weeks=4, n_per_brand=1, retailers_per_combo=1, week_block=1, seed=3)
+        version, before = current_version(), _sqlite()
+        try:
+            gen_weekly_data(
+                weeks=10, n_per_brand=2, retailers_per_combo=1, week_block=1, stream=True,
+                seed=5, progress=fail_after_two_blocks,
+            )
+        except Boom:
+            pass
+        assert current_version() == version
+        for name, df in _sqlite().items():
+            pd.testing.assert_frame_equal(df, before[name])
+        # State tables are versioned with the snapshot they describe.
+        state = read_table("synth_state", version=version)
+        assert int(state.last_week.iloc[0]) == 4
+    finally:
+        gen_weekly_data()